@@ -2,7 +2,7 @@
 Configuration file for environment variables and settings.
 """
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -26,5 +26,59 @@ class Settings(BaseSettings):
         "logs": "logs.csv",
     }
 
+    # Declarative policy rules, compiled into the policy decision table
+    POLICY_RULES_PATH: str = str(
+        Path(__file__).resolve().parent.parent / "policy" / "rules.json"
+    )
+    # Each worker re-checks the rules file's mtime at most this often and
+    # recompiles on change, so an edit reaches every worker; 0 disables it
+    POLICY_RULES_CHECK_SECONDS: float = 2.0
+
+    # Shared secret for admin routes (X-Admin-Token header); unset disables
+    # them
+    ADMIN_TOKEN: Optional[str] = None
+
+    # How /agent/run gets suggested actions when the request doesn't say:
+    #   "inline"     - second LLM call before responding (original behaviour)
+    #   "background" - respond first, extract in the background
+    #   "combined"   - answer + actions from one structured LLM call
+    ACTION_EXTRACTION_MODE: str = "inline"
+
+    # /agent/run scrubs and risk-scans prompts up to this many characters
+    # on the event loop; longer ones in the threadpool, so one huge prompt
+    # doesn't stall every other request of the worker
+    INLINE_SCAN_MAX_CHARS: int = 32_768
+
+    # Exact-match LLM response cache (in-process LRU + llm_cache table)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 24 * 3600
+    LLM_CACHE_MEMORY_SIZE: int = 1024
+    LLM_CACHE_MAX_ROWS: int = 50_000
+    # Concurrent identical prompts share one upstream LLM call
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Large-input (map-reduce) mode of /agent/run
+    LARGE_INPUT_CHUNK_TOKENS: int = 2000
+    LARGE_INPUT_MAX_CHUNKS: int = 64
+    # Chunk-level LLM calls in flight per request
+    LARGE_INPUT_MAX_FANOUT: int = 4
+
+    # /agent/run/stream stops streaming the answer at the first match of
+    # one of these risk flags
+    STREAM_CUTOFF_FLAGS: List[str] = ["destructive_actions"]
+
+    # SQLite connection pragmas (see app/db/database.py)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE_KB: int = 20_000
+    SQLITE_BUSY_TIMEOUT_MS: int = 5_000
+
+    # Group the /agent/run inserts of concurrent requests into one
+    # transaction on a single writer thread. A write waits at most
+    # DB_WRITE_BATCH_MAX_DELAY_MS for others to join its batch.
+    DB_WRITE_BATCHING: bool = False
+    DB_WRITE_BATCH_MAX_SIZE: int = 256
+    DB_WRITE_BATCH_MAX_DELAY_MS: float = 2.0
+
 
 settings = Settings()
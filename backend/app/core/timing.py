@@ -0,0 +1,47 @@
+"""
+Lightweight per-stage timing for request pipelines.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimer:
+    """
+    Collects wall-clock durations (milliseconds) per named stage:
+
+        timer = StageTimer()
+        with timer.stage("scrub"):
+            ...
+        timer.as_dict()  # {"scrub": 0.042}
+    """
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, float] = {}
+        self._running: Dict[str, float] = {}  # stage -> start, while open
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        self._running[name] = start
+        try:
+            yield
+        finally:
+            self._running.pop(name, None)
+            elapsed = (time.perf_counter() - start) * 1000
+            self._stages[name] = round(self._stages.get(name, 0.0) + elapsed, 3)
+
+    def add(self, name: str, ms: float) -> None:
+        self._stages[name] = round(self._stages.get(name, 0.0) + ms, 3)
+
+    def as_dict(self, running: bool = False) -> Dict[str, float]:
+        """
+        Finished stages; with running=True, stages still open are
+        included with their time so far.
+        """
+        stages = dict(self._stages)
+        if running:
+            now = time.perf_counter()
+            for name, start in list(self._running.items()):
+                stages[name] = round(stages.get(name, 0.0) + (now - start) * 1000, 3)
+        return stages
@@ -1,8 +1,11 @@
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, List
 
+from sqlalchemy import event, inspect, text
 from sqlmodel import SQLModel, Session, create_engine
 
+from app.core.config import settings
+
 # Path to your SQLite DB file (relative to backend/ directory)
 DATABASE_URL = "sqlite:///data/control_tower.db"
 
@@ -10,15 +13,55 @@ DATABASE_URL = "sqlite:///data/control_tower.db"
 engine = create_engine(DATABASE_URL, echo=False)
 
 
-def init_db() -> None:
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Per-connection SQLite tuning. WAL lets readers run alongside the
+    writer and turns each commit into an append to the log;
+    synchronous=NORMAL then fsyncs at checkpoints instead of on every
+    commit (a power cut can lose the last transactions, never corrupt).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    # negative cache_size is in KiB
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def init_db() -> List[str]:
     """
-    Import models and create tables if they don't exist.
+    Import models and create tables if they don't exist, then bring an
+    existing database up to date. Returns the migrations it applied.
     This is called on FastAPI startup.
     """
     # Important: import models so SQLModel sees all tables
     from app.db import models  # noqa: F401
+    from app.db.migrations import migrate
 
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    return migrate(engine)
+
+
+def _add_missing_columns() -> None:
+    """
+    create_all() never alters existing tables, so nullable columns added to
+    a model later are appended here with ALTER TABLE ... ADD COLUMN.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}')
+                )
 
 
 def get_session() -> Generator[Session, None, None]:
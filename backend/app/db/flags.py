@@ -0,0 +1,62 @@
+"""
+Queryable copy of each run's risk flags (agentrun_flag).
+
+risk_flags_json stays the source of truth; agentrun_flag holds one row
+per (flag, created_at, run) written in the same transaction as the run
+insert or its re-score, and backfilled from the JSON for older runs.
+"""
+import json
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+from app.db.models import AgentRunFlag
+
+
+def record_flags(session: Session, run_id: int, created_at: datetime, flags: Iterable[str]) -> None:
+    """
+    Store the flags of a new run (caller commits).
+    """
+    values = [
+        {"flag": flag, "created_at": created_at, "agent_run_id": run_id}
+        for flag in dict.fromkeys(flags)
+    ]
+    if values:
+        session.execute(insert(AgentRunFlag).values(values).on_conflict_do_nothing())
+
+
+def replace_flags(session: Session, runs: List[Tuple[int, datetime, str]]) -> None:
+    """
+    Replace the stored flags of re-scored runs: (id, created_at,
+    risk_flags_json) per run.
+    """
+    if not runs:
+        return
+    session.execute(
+        delete(AgentRunFlag).where(AgentRunFlag.agent_run_id.in_([run_id for run_id, _, _ in runs]))
+    )
+    for run_id, created_at, flags_json in runs:
+        record_flags(session, run_id, created_at, json.loads(flags_json or "[]"))
+
+
+def backfill_flags(conn: Connection) -> int:
+    """
+    Rebuild agentrun_flag from every run's risk_flags_json (SQLite
+    json_each, one statement) in the caller's transaction; returns the
+    rows written.
+    """
+    conn.execute(delete(AgentRunFlag))
+    result = conn.execute(
+        text(
+            "INSERT OR IGNORE INTO agentrun_flag (flag, created_at, agent_run_id) "
+            "SELECT j.value, a.created_at, a.id "
+            "FROM agentrun AS a, json_each("
+            "CASE WHEN json_valid(a.risk_flags_json) THEN a.risk_flags_json ELSE '[]' END"
+            ") AS j WHERE j.type = 'text'"
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,158 @@
+"""
+Full-text search over AgentRun prompts and responses (SQLite FTS5).
+
+agentrun_fts is an external-content FTS5 table: it stores only the
+inverted index and reads the text back from agentrun, so the history is
+not duplicated. Triggers on agentrun keep it in sync whatever writes
+the rows (inserts, deletes, edits of the prompt / response).
+
+Created by migration 4; to index history again (e.g. after a bulk
+import with the triggers off, or a DB restored without the index):
+    python -m app.db.fts --rebuild
+"""
+import argparse
+import re
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+# Prompt matches count double in the bm25 score
+PROMPT_WEIGHT = 2.0
+RESPONSE_WEIGHT = 1.0
+# Highlight markers and size (tokens) of the snippets
+SNIPPET_OPEN = "["
+SNIPPET_CLOSE = "]"
+SNIPPET_TOKENS = 16
+
+_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS agentrun_fts USING fts5("
+    "prompt, response, content='agentrun', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS agentrun_fts_ai AFTER INSERT ON agentrun BEGIN "
+    "INSERT INTO agentrun_fts (rowid, prompt, response) "
+    "VALUES (new.id, new.prompt, new.response); END",
+    "CREATE TRIGGER IF NOT EXISTS agentrun_fts_ad AFTER DELETE ON agentrun BEGIN "
+    "INSERT INTO agentrun_fts (agentrun_fts, rowid, prompt, response) "
+    "VALUES ('delete', old.id, old.prompt, old.response); END",
+    "CREATE TRIGGER IF NOT EXISTS agentrun_fts_au AFTER UPDATE OF prompt, response ON agentrun BEGIN "
+    "INSERT INTO agentrun_fts (agentrun_fts, rowid, prompt, response) "
+    "VALUES ('delete', old.id, old.prompt, old.response); "
+    "INSERT INTO agentrun_fts (rowid, prompt, response) "
+    "VALUES (new.id, new.prompt, new.response); END",
+]
+
+
+def create_fts(conn: Connection) -> None:
+    """
+    Create the FTS table and its triggers (idempotent), with bm25 column
+    weights as the table's default rank.
+    """
+    for ddl in _DDL:
+        conn.execute(text(ddl))
+    rank = f"bm25({PROMPT_WEIGHT}, {RESPONSE_WEIGHT})"
+    current = conn.execute(text("SELECT v FROM agentrun_fts_config WHERE k = 'rank'")).scalar()
+    # Only when it changes: a config write makes the next FTS query of
+    # every other open connection fail once while it reloads the config
+    if current != rank:
+        conn.execute(
+            text("INSERT INTO agentrun_fts (agentrun_fts, rank) VALUES ('rank', :rank)"),
+            {"rank": rank},
+        )
+
+
+def rebuild_fts(conn: Connection) -> int:
+    """
+    Re-index every run from agentrun and merge the index segments;
+    returns the number of runs indexed.
+    """
+    create_fts(conn)
+    conn.execute(text("INSERT INTO agentrun_fts (agentrun_fts) VALUES ('rebuild')"))
+    conn.execute(text("INSERT INTO agentrun_fts (agentrun_fts) VALUES ('optimize')"))
+    return conn.execute(text("SELECT count(*) FROM agentrun")).scalar_one()
+
+
+def match_query(q: str, raw: bool = False) -> str:
+    """
+    FTS5 MATCH expression for a search box string: every word must occur
+    (each one quoted, so punctuation and operators are taken literally;
+    a trailing * keeps prefix search). raw=True passes FTS5 query syntax
+    through unchanged.
+    """
+    if raw:
+        return q
+    terms = []
+    for word in re.findall(r"[\w*]+", q):
+        prefix = word.endswith("*")
+        word = word.strip("*")
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search_runs(
+    session: Session,
+    match: str,
+    order: str = "rank",
+    after: Optional[Sequence[Any]] = None,
+    limit: int = 20,
+) -> List[Any]:
+    """
+    Runs matching an FTS5 expression, with score and snippets.
+
+    order="rank": best bm25 first, keyset on (score, id). Ranking has
+    to score every match, so the cost grows with the number of matches.
+    order="recent": newest first, keyset on id, read straight off the
+    index in rowid order, so a page costs the same for any term. It
+    returns no score: bm25 counts every match of each term, which would
+    bring back the cost of ranking.
+    after is the (score, id) / (id,) of the last row of the previous page.
+    Fetches limit + 1 rows so the caller can tell if there is more.
+    """
+    where = ["agentrun_fts MATCH :match"]
+    params: dict = {"match": match, "limit": limit + 1}
+    if order == "rank":
+        score = "f.rank"
+        order_by = "f.rank, f.rowid"
+        if after is not None:
+            where.append("(f.rank > :score OR (f.rank = :score AND f.rowid > :after_id))")
+            params.update(score=float(after[0]), after_id=int(after[1]))
+    else:
+        score = "NULL"
+        order_by = "f.rowid DESC"
+        if after is not None:
+            where.append("f.rowid < :after_id")
+            params["after_id"] = int(after[0])
+
+    snippet = f"'{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS}"
+    sql = (
+        "SELECT a.id, a.created_at, a.model, a.risk_level, a.policy_decision, "
+        f"{score} AS score, "
+        f"snippet(agentrun_fts, 0, {snippet}) AS prompt_snippet, "
+        f"snippet(agentrun_fts, 1, {snippet}) AS response_snippet "
+        "FROM agentrun_fts AS f JOIN agentrun AS a ON a.id = f.rowid "
+        f"WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT :limit"
+    )
+    return list(session.execute(text(sql).columns(created_at=DateTime), params))
+
+
+def main() -> None:
+    from app.db.database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Full-text index of AgentRun prompts / responses")
+    parser.add_argument("--rebuild", action="store_true", help="re-index all runs")
+    args = parser.parse_args()
+
+    init_db()  # migration 4 creates the index
+    if args.rebuild:
+        with engine.begin() as conn:
+            print(f"indexed {rebuild_fts(conn)} runs")
+        return
+    with engine.connect() as conn:
+        indexed = conn.execute(text("SELECT count(*) FROM agentrun_fts_docsize")).scalar_one()
+        print(f"{indexed} runs indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Versioned schema migrations for existing databases.
+
+create_all() only creates missing tables and _add_missing_columns() only
+appends nullable columns; anything else an existing control_tower.db
+needs (indexes, backfills) is a numbered migration here. Each one runs
+once, in its own transaction, and is recorded in schema_migrations.
+
+Apply pending migrations (also done on startup by init_db):
+    python -m app.db.migrations
+List them:
+    python -m app.db.migrations --status
+"""
+import argparse
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Set
+
+from sqlalchemy import Index, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def _model_index(name: str) -> Index:
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f"No index named {name} on the models")
+
+
+def create_indexes(*names: str) -> Callable[[Connection], None]:
+    """
+    Migration step creating indexes declared on the models (so new and
+    migrated databases end up with the same definition).
+    """
+
+    def apply(conn: Connection) -> None:
+        for name in names:
+            _model_index(name).create(conn, checkfirst=True)
+
+    return apply
+
+
+def backfill_rollups(conn: Connection) -> None:
+    """
+    Fill agentrun_rollup from the runs already stored.
+    """
+    from app.db.models import AgentRunRollup
+    from app.db.rollups import rebuild_rollups
+
+    AgentRunRollup.__table__.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+
+def flag_table_and_search_indexes(conn: Connection) -> None:
+    """
+    agentrun_flag filled from risk_flags_json, plus the /logs/search indexes.
+    """
+    from app.db.flags import backfill_flags
+    from app.db.models import AgentRunFlag
+
+    AgentRunFlag.__table__.create(conn, checkfirst=True)
+    backfill_flags(conn)
+    create_indexes(
+        "ix_agentrun_risk_level_created_at",
+        "ix_agentrun_policy_decision_created_at",
+        "ix_agentrun_model_created_at",
+    )(conn)
+
+
+def full_text_index(conn: Connection) -> None:
+    """
+    agentrun_fts with its sync triggers, indexing the runs already stored.
+    """
+    from app.db.fts import rebuild_fts
+
+    rebuild_fts(conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "hot_path_indexes",
+        create_indexes(
+            "ix_agentrun_created_at",
+            "ix_actions_agent_run_id_created_at",
+            "ix_actions_status_created_at",
+            "ix_actions_created_at",
+            "ix_approval_status_created_at",
+            "ix_approval_created_at",
+        ),
+    ),
+    Migration(2, "agentrun_rollup_backfill", backfill_rollups),
+    Migration(3, "agentrun_flags_and_search_indexes", flag_table_and_search_indexes),
+    Migration(4, "agentrun_full_text_index", full_text_index),
+]
+
+
+def _ensure_table(conn: Connection) -> None:
+    conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        )
+    )
+
+
+def applied_versions(engine: Engine) -> Set[int]:
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate(engine: Engine) -> List[str]:
+    """
+    Apply pending migrations in version order; returns their names.
+    A failing migration rolls back on its own and stops the run.
+    """
+    from app.db import models  # noqa: F401  (indexes are looked up on the models)
+
+    done = applied_versions(engine)
+    applied: List[str] = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, name, applied_at) "
+                    "VALUES (:version, :name, :applied_at)"
+                ),
+                {
+                    "version": migration.version,
+                    "name": migration.name,
+                    "applied_at": datetime.utcnow().isoformat(),
+                },
+            )
+        applied.append(migration.name)
+    return applied
+
+
+def main() -> None:
+    from app.db.database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        done = applied_versions(engine)
+        for m in MIGRATIONS:
+            print(f"{m.version:4d}  {m.name:32} {'applied' if m.version in done else 'pending'}")
+        return
+
+    for name in init_db():  # create_all + missing columns + migrations
+        print(f"applied {name}")
+    print("up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 from typing import Optional
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
+# Indexes are declared here for new databases; existing ones get them
+# through app/db/migrations.py.
+
 
 class AgentRun(SQLModel, table=True):
+    __table_args__ = (
+        # /logs/search filters: equality + newest first
+        Index("ix_agentrun_risk_level_created_at", "risk_level", "created_at"),
+        Index("ix_agentrun_policy_decision_created_at", "policy_decision", "created_at"),
+        Index("ix_agentrun_model_created_at", "model", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # /logs/recent: newest first
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     prompt: str
     response: str
@@ -20,11 +32,55 @@ class AgentRun(SQLModel, table=True):
 
     risk_flags_json: str  # JSON-encoded list
     policy_reasons_json: str  # JSON-encoded list
+    # Versioned id of the policy rule that decided ("<rule>@<table version>")
+    policy_rule_id: Optional[str] = None
 
     llm_error: Optional[str] = None
 
+    # Placeholder -> original value for PII redacted before the LLM call
+    redaction_map_json: Optional[str] = None  # JSON-encoded dict
+    # Per-stage wall-clock timings of the run, in milliseconds
+    stage_timings_json: Optional[str] = None  # JSON-encoded dict
+
+    # Action extraction: "pending" | "done" | "failed" (None for older runs)
+    actions_status: Optional[str] = None
+    # Token budget decision for the prompt sent upstream (JSON-encoded dict)
+    budget_json: Optional[str] = None
+    # Backend the router picked for the answer (None: cache hit / older runs)
+    llm_provider: Optional[str] = None
+    # Answer served from the LLM response cache (None for older runs)
+    llm_cached: Optional[bool] = None
+    # Large-input runs: per-chunk report (size, timings, flags, errors)
+    chunks_json: Optional[str] = None  # JSON-encoded list
+
+
+class AgentRunFlag(SQLModel, table=True):
+    """
+    One row per risk flag of a run (the flags of risk_flags_json), so
+    /logs/search finds the runs with a flag through the primary key
+    instead of decoding every run's JSON.
+    """
+
+    __tablename__ = "agentrun_flag"
+    __table_args__ = (
+        # per-run lookups: extra flag filters, re-score replacements
+        Index("ix_agentrun_flag_agent_run_id_flag", "agent_run_id", "flag"),
+    )
+
+    flag: str = Field(primary_key=True)
+    # copy of the run's created_at: flag + time range + newest first in one range
+    created_at: datetime = Field(primary_key=True)
+    agent_run_id: int = Field(primary_key=True, foreign_key="agentrun.id")
+
 
 class Approval(SQLModel, table=True):
+    __table_args__ = (
+        # /approvals/pending, /approvals/all?status=: filter + newest first
+        Index("ix_approval_status_created_at", "status", "created_at"),
+        # /approvals/all
+        Index("ix_approval_created_at", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -41,6 +97,14 @@ class Approval(SQLModel, table=True):
 
 class Action(SQLModel, table=True):
     __tablename__ = "actions"
+    __table_args__ = (
+        # /actions/by-run/{id}: filter + newest first
+        Index("ix_actions_agent_run_id_created_at", "agent_run_id", "created_at"),
+        # /actions/all?status=
+        Index("ix_actions_status_created_at", "status", "created_at"),
+        # /actions/all
+        Index("ix_actions_created_at", "created_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -49,4 +113,51 @@ class Action(SQLModel, table=True):
     payload_json: str  # JSON string of the action details
     status: str = Field(default="pending")  # "pending", "simulated", "executed", "cancelled"
     executed_at: Optional[datetime] = None
-    execution_result_json: Optional[str] = None  # Store results after execution
\ No newline at end of file
+    execution_result_json: Optional[str] = None  # Store results after execution
+
+
+class JobCheckpoint(SQLModel, table=True):
+    """
+    Resume point for long-running maintenance jobs (e.g. AgentRun re-scoring).
+    """
+
+    name: str = Field(primary_key=True)
+    last_id: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class LLMCacheEntry(SQLModel, table=True):
+    """
+    Persistent tier of the LLM response cache (app/llm/cache.py).
+    Keyed on a hash of the normalized redacted prompt, model and temperature.
+    """
+
+    __tablename__ = "llm_cache"
+
+    key: str = Field(primary_key=True)
+    model: str
+    temperature: float
+    response: str
+    actions_json: Optional[str] = None  # JSON-encoded list
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    hits: int = Field(default=0)
+
+
+class AgentRunRollup(SQLModel, table=True):
+    """
+    Run counts per time bucket for /logs/analytics, kept up to date in the
+    same transaction as AgentRun inserts and re-scores (app/db/rollups.py).
+    """
+
+    __tablename__ = "agentrun_rollup"
+
+    # "minute" | "hour" | "day"
+    granularity: str = Field(primary_key=True)
+    # Bucket start, UTC, "YYYY-MM-DDTHH:MM:00"
+    bucket: str = Field(primary_key=True)
+    risk_level: str = Field(primary_key=True)
+    policy_decision: str = Field(primary_key=True)
+    model: str = Field(primary_key=True)
+    count: int = Field(default=0)
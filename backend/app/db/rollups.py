@@ -0,0 +1,208 @@
+"""
+Incrementally maintained run counts for /logs/analytics.
+
+agentrun_rollup holds one row per (granularity, bucket, risk level,
+policy decision, model) with the number of runs in it. Every AgentRun
+insert adds +1 to its minute, hour and day buckets and every re-score
+that moves a run to another risk level / decision moves its counts, in
+the same transaction as the row change, so the analytics read a few
+hundred rollup rows instead of the whole agentrun table.
+
+If the counts ever drift (rows edited by hand, a DB restored without its
+rollups), rebuild them from agentrun:
+    python -m app.db.rollups --rebuild
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from app.db.models import AgentRunRollup
+
+# granularity -> strftime format of the bucket start (same in Python and SQLite)
+GRANULARITIES: Dict[str, str] = {
+    "minute": "%Y-%m-%dT%H:%M:00",
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%dT00:00:00",
+}
+
+# (risk_level, policy_decision, model)
+RollupKey = Tuple[str, str, str]
+
+
+def rollup_key(risk_level: Optional[str], policy_decision: Optional[str], model: Optional[str]) -> RollupKey:
+    """
+    Normalised dimensions of a run, as /logs/analytics has always
+    reported them (lowercased, "unknown" when missing).
+    """
+    return (
+        (risk_level or "unknown").lower(),
+        (policy_decision or "unknown").lower(),
+        model or "unknown",
+    )
+
+
+def naive_utc(ts: datetime) -> datetime:
+    """
+    Timestamps are stored as naive UTC; convert aware query bounds to match.
+    """
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def bucket_of(ts: datetime, granularity: str) -> str:
+    return naive_utc(ts).strftime(GRANULARITIES[granularity])
+
+
+def _apply(session: Session, deltas: Dict[Tuple[str, str, RollupKey], int]) -> None:
+    """
+    Add deltas ((granularity, bucket, key) -> +/-n) to the rollup in one
+    upsert statement.
+    """
+    values = [
+        {
+            "granularity": granularity,
+            "bucket": bucket,
+            "risk_level": key[0],
+            "policy_decision": key[1],
+            "model": key[2],
+            "count": delta,
+        }
+        for (granularity, bucket, key), delta in deltas.items()
+        if delta
+    ]
+    if not values:
+        return
+    stmt = insert(AgentRunRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket", "risk_level", "policy_decision", "model"],
+        set_={"count": AgentRunRollup.count + stmt.excluded["count"]},
+    )
+    session.execute(stmt)
+
+
+def record_run(session: Session, created_at: datetime, key: RollupKey) -> None:
+    """
+    Count one new run (caller commits, together with the AgentRun row).
+    """
+    _apply(session, {(g, bucket_of(created_at, g), key): 1 for g in GRANULARITIES})
+
+
+def record_moves(session: Session, moves: Iterable[Tuple[datetime, RollupKey, RollupKey]]) -> None:
+    """
+    Move re-scored runs between rollup rows: (created_at, old key, new key)
+    per run. Runs whose key did not change are skipped.
+    """
+    deltas: Dict[Tuple[str, str, RollupKey], int] = defaultdict(int)
+    for created_at, old, new in moves:
+        if old == new:
+            continue
+        for g in GRANULARITIES:
+            bucket = bucket_of(created_at, g)
+            deltas[(g, bucket, old)] -= 1
+            deltas[(g, bucket, new)] += 1
+    _apply(session, deltas)
+
+
+def rebuild_rollups(conn: Connection) -> int:
+    """
+    Recompute the whole rollup from agentrun (one GROUP BY per
+    granularity) in the caller's transaction; returns the rows written.
+    """
+    conn.execute(delete(AgentRunRollup))
+    written = 0
+    for granularity, fmt in GRANULARITIES.items():
+        result = conn.execute(
+            text(
+                "INSERT INTO agentrun_rollup "
+                "(granularity, bucket, risk_level, policy_decision, model, count) "
+                "SELECT :granularity, strftime(:fmt, created_at), "
+                "lower(coalesce(nullif(risk_level, ''), 'unknown')), "
+                "lower(coalesce(nullif(policy_decision, ''), 'unknown')), "
+                "coalesce(nullif(model, ''), 'unknown'), count(*) "
+                "FROM agentrun GROUP BY 2, 3, 4, 5"
+            ),
+            {"granularity": granularity, "fmt": fmt},
+        )
+        written += result.rowcount
+    return written
+
+
+def query_rollups(
+    session: Session,
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Totals and a per-bucket series for [start, end), in whole buckets:
+    a bucket is included when it starts at or after start's bucket and
+    before end.
+    """
+    stmt = select(
+        AgentRunRollup.bucket,
+        AgentRunRollup.risk_level,
+        AgentRunRollup.policy_decision,
+        AgentRunRollup.model,
+        AgentRunRollup.count,
+    ).where(AgentRunRollup.granularity == granularity)
+    if start is not None:
+        stmt = stmt.where(AgentRunRollup.bucket >= bucket_of(start, granularity))
+    if end is not None:
+        stmt = stmt.where(AgentRunRollup.bucket < naive_utc(end).strftime("%Y-%m-%dT%H:%M:%S"))
+    stmt = stmt.order_by(AgentRunRollup.bucket)
+
+    def empty() -> Dict[str, Any]:
+        return {"total_runs": 0, "by_risk_level": {}, "by_policy_decision": {}, "by_model": {}}
+
+    def add(counts: Dict[str, Any], risk_level: str, decision: str, model: str, n: int) -> None:
+        counts["total_runs"] += n
+        for name, value in (
+            ("by_risk_level", risk_level),
+            ("by_policy_decision", decision),
+            ("by_model", model),
+        ):
+            counts[name][value] = counts[name].get(value, 0) + n
+
+    totals = empty()
+    series: Dict[str, Dict[str, Any]] = {}
+    for bucket, risk_level, decision, model, n in session.exec(stmt):
+        if n <= 0:  # emptied by re-scores
+            continue
+        add(totals, risk_level, decision, model, n)
+        if bucket not in series:
+            series[bucket] = {"bucket": bucket, **empty()}
+        add(series[bucket], risk_level, decision, model, n)
+
+    series_list: List[Dict[str, Any]] = list(series.values())
+    return {**totals, "granularity": granularity, "series": series_list}
+
+
+def main() -> None:
+    from app.db.database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="Analytics rollups of AgentRun counts")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from agentrun")
+    args = parser.parse_args()
+
+    init_db()
+    if args.rebuild:
+        with engine.begin() as conn:
+            print(f"rebuilt: {rebuild_rollups(conn)} rollup rows")
+        return
+    with Session(engine) as session:
+        for granularity in GRANULARITIES:
+            rows = session.exec(
+                select(AgentRunRollup).where(AgentRunRollup.granularity == granularity)
+            ).all()
+            print(f"{granularity:7} {len(rows):8d} rows {sum(r.count for r in rows):10d} runs")
+
+
+if __name__ == "__main__":
+    main()
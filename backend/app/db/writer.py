@@ -0,0 +1,192 @@
+"""
+Batched writes: one writer thread commits the writes of many concurrent
+requests in a single transaction (group commit).
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[Session], Any]
+
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Queue of write functions, each run as fn(session) by a single writer
+    thread. Everything queued within max_delay_ms of the first write of a
+    batch (up to max_size writes) shares one transaction, so N concurrent
+    requests pay for one commit instead of N, and never wait on each
+    other for the SQLite writer lock.
+
+    submit() returns a Future with fn's result, set once the batch has
+    committed: callers that need the row ids (or durability) wait on it,
+    so the durability window is bounded by max_delay_ms plus one commit.
+    If a batch fails, its writes are retried one transaction each, so
+    one bad write only fails its own Future. A write whose Future was
+    cancelled before the writer dequeued it is dropped; one cancelled
+    while its batch runs still commits, its result is just discarded.
+    submit() after stop() fails with RuntimeError.
+    """
+
+    def __init__(
+        self,
+        bind: Engine,
+        max_size: int = 256,
+        max_delay_ms: float = 2.0,
+    ):
+        self.bind = bind
+        self.max_size = max_size
+        self.max_delay_ms = max_delay_ms
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.batches = 0
+        self.writes = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        with self._lock:
+            self._stopped = False
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="db-batch-writer", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Flush what is queued and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def submit(self, fn: WriteFn) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        with self._lock:
+            # checked under the lock so nothing is queued behind _STOP
+            if self._stopped:
+                raise RuntimeError("batch writer is stopped")
+            self._queue.put((fn, future))
+        return future
+
+    def _run(self) -> None:
+        # nothing may end this thread but _STOP: a dead writer would leave
+        # every later submit() waiting forever
+        while True:
+            try:
+                if self._run_batches():
+                    return
+            except Exception:
+                logger.exception("batch writer loop failed; restarting it")
+
+    def _run_batches(self) -> bool:
+        """
+        Collect and flush batches until _STOP; True once it was seen.
+        """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return True
+            batch: List[Tuple[WriteFn, Future]] = []
+            self._claim(batch, item)
+            deadline = time.monotonic() + self.max_delay_ms / 1000
+            while len(batch) < self.max_size:
+                try:
+                    timeout = deadline - time.monotonic()
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                self._claim(batch, item)
+            if batch:
+                self._flush(batch)
+        return True
+
+    @staticmethod
+    def _claim(batch: List[Tuple[WriteFn, Future]], item: Tuple[WriteFn, Future]) -> None:
+        # marks the future running, so it can no longer be cancelled;
+        # False means its waiter already gave up, so skip the write
+        if item[1].set_running_or_notify_cancel():
+            batch.append(item)
+
+    def _flush(self, batch: List[Tuple[WriteFn, Future]]) -> None:
+        try:
+            with Session(self.bind, expire_on_commit=False) as session:
+                results = [fn(session) for fn, _ in batch]
+                session.commit()
+        except Exception:
+            # find the bad write(s): one transaction each
+            for fn, future in batch:
+                self._flush_one(fn, future)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result)
+
+    def _flush_one(self, fn: WriteFn, future: Future) -> None:
+        try:
+            with Session(self.bind, expire_on_commit=False) as session:
+                result = fn(session)
+                session.commit()
+        except Exception as e:
+            self.failures += 1
+            _resolve(future, error=e)
+            return
+        self.batches += 1
+        self.writes += 1
+        _resolve(future, result)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "failures": self.failures,
+            "avg_batch_size": round(self.writes / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def _resolve(future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """
+    Set a write's outcome, ignoring a future that is already done.
+    """
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+batch_writer = BatchWriter(
+    engine,
+    max_size=settings.DB_WRITE_BATCH_MAX_SIZE,
+    max_delay_ms=settings.DB_WRITE_BATCH_MAX_DELAY_MS,
+)
@@ -0,0 +1,288 @@
+"""
+Re-score stored AgentRun rows with the current trust evaluator and policy
+engine (e.g. after the risk keyword tables or policy rules change).
+
+Rows are streamed in primary-key order, CHUNK_SIZE at a time, evaluated on
+the batch process pool and written back with one bulk UPDATE + checkpoint
+per chunk, so the job can be stopped and resumed at any point.
+
+CLI (run from backend/):
+    python -m app.jobs.rescore --dry-run
+    python -m app.jobs.rescore --chunk-size 2000
+    python -m app.jobs.rescore --reset
+"""
+import argparse
+import json
+import threading
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.db.database import engine, init_db
+from app.db.flags import replace_flags
+from app.db.models import AgentRun, JobCheckpoint
+from app.db.rollups import record_moves, rollup_key
+from app.policy.engine import evaluate_policies
+from app.trust.evaluator import (
+    build_scan_context,
+    evaluate_trust_and_risk,
+    map_batch_chunks,
+)
+
+JOB_NAME = "agentrun_rescore"
+DEFAULT_CHUNK_SIZE = 1000
+# How many example diffs a report keeps
+MAX_SAMPLES = 20
+
+# (id, prompt, response, llm_error)
+RescoreInput = Tuple[int, str, str, Optional[str]]
+
+
+@dataclass
+class RescoreReport:
+    dry_run: bool
+    started_after_id: int = 0
+    last_id: int = 0
+    scanned: int = 0
+    rows_changed: int = 0
+    decisions_changed: int = 0
+    # "old_decision->new_decision" -> count
+    transitions: Dict[str, int] = field(default_factory=dict)
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+    done: bool = False
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _rescore_chunk(rows: List[RescoreInput]) -> List[Dict[str, Any]]:
+    """
+    Evaluate one chunk of runs (executed on the batch process pool).
+    """
+    out: List[Dict[str, Any]] = []
+    for run_id, prompt, response, llm_error in rows:
+        scan = build_scan_context(prompt, response)
+        tr = evaluate_trust_and_risk(prompt, response, llm_error, ctx=scan)
+        policy = evaluate_policies(prompt, response or "", ctx=scan)
+        out.append(
+            {
+                "id": run_id,
+                "trust_score": tr["trust_score"],
+                "risk_level": tr["risk_level"],
+                "risk_flags_json": json.dumps(tr["risk_flags"]),
+                "policy_decision": policy["decision"],
+                "policy_risk_level": policy["risk_level"],
+                "policy_reasons_json": json.dumps(policy["reasons"]),
+                "policy_rule_id": policy["rule_id"],
+            }
+        )
+    return out
+
+
+def _row_changed(old: Any, new: Dict[str, Any]) -> bool:
+    old_flags = set(json.loads(old.risk_flags_json or "[]"))
+    new_flags = set(json.loads(new["risk_flags_json"]))
+    return (
+        old.risk_level != new["risk_level"]
+        or old.policy_decision != new["policy_decision"]
+        or old.policy_risk_level != new["policy_risk_level"]
+        or old.policy_rule_id != new["policy_rule_id"]
+        or abs((old.trust_score or 0.0) - new["trust_score"]) > 1e-9
+        or old_flags != new_flags
+    )
+
+
+def _get_checkpoint(session: Session) -> JobCheckpoint:
+    checkpoint = session.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=JOB_NAME, last_id=0)
+    return checkpoint
+
+
+def rescore_agent_runs(
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+    reset: bool = False,
+    max_rows: Optional[int] = None,
+    report: Optional[RescoreReport] = None,
+) -> RescoreReport:
+    """
+    Re-evaluate AgentRun rows after the stored checkpoint.
+
+    - dry_run: compute the diff only; nothing (not even the checkpoint)
+      is written, and the scan always starts from the beginning.
+    - reset: ignore the checkpoint and start from the first row.
+    - max_rows: stop after roughly this many rows (whole chunks).
+    """
+    if report is None:
+        report = RescoreReport(dry_run=dry_run)
+
+    columns = (
+        AgentRun.id,
+        AgentRun.created_at,
+        AgentRun.model,
+        AgentRun.prompt,
+        AgentRun.response,
+        AgentRun.llm_error,
+        AgentRun.trust_score,
+        AgentRun.risk_level,
+        AgentRun.policy_decision,
+        AgentRun.policy_risk_level,
+        AgentRun.risk_flags_json,
+        AgentRun.policy_rule_id,
+    )
+
+    with Session(engine) as session:
+        checkpoint = _get_checkpoint(session)
+        last_id = 0 if (dry_run or reset) else checkpoint.last_id
+        report.started_after_id = last_id
+        report.last_id = last_id
+
+        while max_rows is None or report.scanned < max_rows:
+            stmt = (
+                select(*columns)
+                .where(AgentRun.id > last_id)
+                .order_by(AgentRun.id)
+                .limit(chunk_size)
+            )
+            rows = session.exec(stmt).all()
+            if not rows:
+                break
+
+            inputs: List[RescoreInput] = [
+                (r.id, r.prompt or "", r.response or "", r.llm_error) for r in rows
+            ]
+            results = map_batch_chunks(_rescore_chunk, inputs)
+
+            updates: List[Dict[str, Any]] = []
+            moves = []
+            reflagged = []
+            for old, new in zip(rows, results):
+                if not _row_changed(old, new):
+                    continue
+                updates.append(new)
+                moves.append(
+                    (
+                        old.created_at,
+                        rollup_key(old.risk_level, old.policy_decision, old.model),
+                        rollup_key(new["risk_level"], new["policy_decision"], old.model),
+                    )
+                )
+                if set(json.loads(old.risk_flags_json or "[]")) != set(json.loads(new["risk_flags_json"])):
+                    reflagged.append((old.id, old.created_at, new["risk_flags_json"]))
+                if old.policy_decision != new["policy_decision"]:
+                    report.decisions_changed += 1
+                    key = f"{old.policy_decision}->{new['policy_decision']}"
+                    report.transitions[key] = report.transitions.get(key, 0) + 1
+                if len(report.samples) < MAX_SAMPLES:
+                    report.samples.append(
+                        {
+                            "id": old.id,
+                            "old": {
+                                "risk_level": old.risk_level,
+                                "policy_decision": old.policy_decision,
+                                "risk_flags": json.loads(old.risk_flags_json or "[]"),
+                            },
+                            "new": {
+                                "risk_level": new["risk_level"],
+                                "policy_decision": new["policy_decision"],
+                                "risk_flags": json.loads(new["risk_flags_json"]),
+                            },
+                        }
+                    )
+
+            last_id = rows[-1].id
+            report.scanned += len(rows)
+            report.rows_changed += len(updates)
+            report.last_id = last_id
+
+            if not dry_run:
+                # One transaction per chunk: row updates, their flag rows,
+                # analytics rollup moves and the checkpoint together
+                if updates:
+                    session.execute(update(AgentRun), updates)
+                    replace_flags(session, reflagged)
+                    record_moves(session, moves)
+                checkpoint.last_id = last_id
+                checkpoint.updated_at = datetime.utcnow()
+                session.add(checkpoint)
+                session.commit()
+
+            # Drop loaded rows before fetching the next chunk
+            session.expunge_all()
+
+    report.done = True
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Background execution (used by the /jobs routes)
+# ---------------------------------------------------------------------------
+
+_job_lock = threading.Lock()
+_current_report: Optional[RescoreReport] = None
+
+
+def get_rescore_status() -> Optional[RescoreReport]:
+    return _current_report
+
+
+def start_rescore_job(
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+    reset: bool = False,
+    max_rows: Optional[int] = None,
+) -> Optional[RescoreReport]:
+    """
+    Run the re-score job in a background thread.
+    Returns the live report, or None if a job is already running.
+    """
+    global _current_report
+    if not _job_lock.acquire(blocking=False):
+        return None
+
+    report = RescoreReport(dry_run=dry_run)
+    _current_report = report
+
+    def _run() -> None:
+        try:
+            rescore_agent_runs(
+                chunk_size=chunk_size,
+                dry_run=dry_run,
+                reset=reset,
+                max_rows=max_rows,
+                report=report,
+            )
+        except Exception as e:
+            report.error = str(e)
+        finally:
+            _job_lock.release()
+
+    threading.Thread(target=_run, name="agentrun-rescore", daemon=True).start()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-score stored AgentRun rows")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--max-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()
+    report = rescore_agent_runs(
+        chunk_size=args.chunk_size,
+        dry_run=args.dry_run,
+        reset=args.reset,
+        max_rows=args.max_rows,
+    )
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.database import engine
+from app.db.models import LLMCacheEntry
+from app.llm import client as llm_client
+from app.llm.singleflight import async_flights, sync_flights
+from app.policy.engine import get_policy_table
+
+# Temperature of the answer call in safe_generate*(); part of the key
+ANSWER_TEMPERATURE = 0.3
+
+# Expired / over-limit rows are pruned from the table every N stores
+PRUNE_EVERY = 100
+
+
+class CachedResponse(NamedTuple):
+    text: str
+    model: str
+    actions: List[Dict[str, Any]]
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Whitespace-only differences (templating, trailing newlines) share an entry
+    return " ".join(prompt.split())
+
+
+def cache_key(
+    prompt: str,
+    backends: str,
+    temperature: float,
+    with_actions: bool,
+    mode: str = "inline",
+) -> str:
+    """
+    Exact-match key. Prompts are the redacted text sent to the LLM, so
+    prompts that differ only in PII values share an entry and no PII is
+    written to the cache. backends is the router's backend signature, so
+    a provider or model change starts from an empty cache. The extraction
+    mode and its system prompts are hashed in as well, so changing them
+    invalidates old entries, and so are the active policy table's version
+    and output token budget: an answer capped at a smaller max_tokens
+    isn't served once the budget or rules change.
+    """
+    policy = get_policy_table()
+    raw = json.dumps(
+        [
+            normalize_prompt(prompt),
+            backends,
+            temperature,
+            with_actions,
+            mode,
+            llm_client.BASE_SYSTEM_PROMPT,
+            llm_client.EXTRACTION_SYSTEM_PROMPT if with_actions else "",
+            llm_client.COMBINED_SYSTEM_PROMPT if mode == "combined" else "",
+            policy.budget.max_output_tokens,
+            policy.version,
+        ]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier exact-match cache of LLM answers (+ extracted actions):
+    a bounded in-process LRU in front of the llm_cache SQLite table, which
+    survives restarts and is shared by worker processes.
+
+    Entries expire after ttl_seconds. The table is kept under max_rows by
+    dropping the least recently used rows; recency is only written to the
+    table on table hits, so memory-tier hits don't cost a write.
+    """
+
+    def __init__(self, memory_size: int, max_rows: int, ttl_seconds: int):
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+        self.evicted = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, CachedResponse)
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, expires_at: datetime, value: CachedResponse) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = datetime.utcnow()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return cached[1]
+                del self._memory[key]
+
+        with Session(engine) as session:
+            entry = session.get(LLMCacheEntry, key)
+            if entry is None or entry.expires_at <= now:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.hits += 1
+            entry.last_used_at = now
+            session.add(entry)
+            session.commit()
+            value = CachedResponse(
+                entry.response,
+                entry.model,
+                json.loads(entry.actions_json or "[]"),
+            )
+            expires_at = entry.expires_at
+
+        with self._lock:
+            self.db_hits += 1
+        self._remember(key, expires_at, value)
+        return value
+
+    def put(
+        self,
+        key: str,
+        value: CachedResponse,
+        temperature: float = ANSWER_TEMPERATURE,
+    ) -> None:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        with Session(engine) as session:
+            session.merge(
+                LLMCacheEntry(
+                    key=key,
+                    model=value.model,
+                    temperature=temperature,
+                    response=value.text,
+                    actions_json=json.dumps(value.actions),
+                    created_at=now,
+                    expires_at=expires_at,
+                    last_used_at=now,
+                )
+            )
+            session.commit()
+        self._remember(key, expires_at, value)
+
+        with self._lock:
+            self.stores += 1
+            prune = self.stores % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete expired rows, then the least recently used rows beyond max_rows.
+        """
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            removed = session.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= now)
+            ).rowcount or 0
+            count = session.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+            excess = count - self.max_rows
+            if excess > 0:
+                oldest = select(LLMCacheEntry.key).order_by(
+                    LLMCacheEntry.last_used_at
+                ).limit(excess)
+                removed += session.execute(
+                    delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest))
+                ).rowcount or 0
+            session.commit()
+        with self._lock:
+            self.evicted += removed
+        return removed
+
+    def note_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+        with Session(engine) as session:
+            removed = session.execute(delete(LLMCacheEntry)).rowcount or 0
+            session.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_size": len(self._memory),
+            "memory_maxsize": self.memory_size,
+            "max_rows": self.max_rows,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+            "evicted": self.evicted,
+        }
+
+
+llm_cache = LLMResponseCache(
+    memory_size=settings.LLM_CACHE_MEMORY_SIZE,
+    max_rows=settings.LLM_CACHE_MAX_ROWS,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+)
+
+
+def _from_cache(value: CachedResponse) -> Dict[str, Any]:
+    return {
+        "text": value.text,
+        "model": value.model,
+        "provider": None,
+        "actions": list(value.actions),
+        "error": None,
+        "cached": True,
+        "coalesced": False,
+    }
+
+
+def _cacheable(result: Dict[str, Any]) -> bool:
+    # Fallback texts (no client / provider error) are never cached
+    return result.get("error") is None
+
+
+def cached_safe_generate(
+    prompt: str, extract_actions: bool = True, bypass: bool = False
+) -> Dict[str, Any]:
+    """
+    safe_generate() behind the response cache and single-flight layer.
+    Same return shape plus "cached" and "coalesced" flags. bypass=True
+    skips the cache lookup but still stores the fresh answer.
+    """
+    key = cache_key(
+        prompt, llm_client.router.backend_signature(), ANSWER_TEMPERATURE, extract_actions
+    )
+    use_cache = settings.LLM_CACHE_ENABLED
+    if use_cache and bypass:
+        llm_cache.note_bypass()
+    elif use_cache:
+        hit = llm_cache.get(key)
+        if hit is not None:
+            return _from_cache(hit)
+
+    def call() -> Dict[str, Any]:
+        result = llm_client.safe_generate(prompt)
+        if not extract_actions:
+            result["actions"] = []
+        if use_cache and _cacheable(result):
+            llm_cache.put(key, CachedResponse(result["text"], result["model"], result["actions"]))
+        return result
+
+    if settings.LLM_SINGLE_FLIGHT_ENABLED:
+        result, shared = sync_flights.do(key, call)
+    else:
+        result, shared = call(), False
+    return {**result, "cached": False, "coalesced": shared}
+
+
+async def cached_generate_async(
+    prompt: str,
+    generate: Callable[[str], Awaitable[Dict[str, Any]]],
+    with_actions: bool,
+    bypass: bool = False,
+    mode: str = "inline",
+) -> Dict[str, Any]:
+    """
+    Run an async generate function (safe_generate_async and friends)
+    behind the response cache and single-flight layer: concurrent callers
+    with the same key share one upstream call. Table reads/writes go to
+    the threadpool. mode is the action extraction mode generate belongs
+    to; each mode has its own entries.
+    """
+    key = cache_key(
+        prompt,
+        llm_client.router.backend_signature(),
+        ANSWER_TEMPERATURE,
+        with_actions,
+        mode,
+    )
+    use_cache = settings.LLM_CACHE_ENABLED
+    if use_cache and bypass:
+        llm_cache.note_bypass()
+    elif use_cache:
+        hit = await run_in_threadpool(llm_cache.get, key)
+        if hit is not None:
+            return _from_cache(hit)
+
+    async def call() -> Dict[str, Any]:
+        result = await generate(prompt)
+        if use_cache and _cacheable(result):
+            await run_in_threadpool(
+                llm_cache.put,
+                key,
+                CachedResponse(result["text"], result["model"], result["actions"]),
+            )
+        return result
+
+    if settings.LLM_SINGLE_FLIGHT_ENABLED:
+        result, shared = await async_flights.do(key, call)
+    else:
+        result, shared = await call(), False
+    return {**result, "cached": False, "coalesced": shared}
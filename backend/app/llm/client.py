@@ -1,17 +1,149 @@
 import os
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from groq import Groq
+
+from app.llm.budget import BudgetDecision, apply_budget
+from app.llm.providers import GroqProvider, LatencyProfile, LLMProvider, StubProvider
+from app.llm.resilience import CircuitBreaker, LLMCallGuard
+from app.llm.router import LLMRouter, RoutedCompletion
+from app.policy.engine import get_policy_table
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Point at a local stand-in (e.g. benchmarks/fake_llm_server.py) if set
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+# Models that accept response_format={"type": "json_object"}, so answer
+# and actions can come back from one call
+JSON_MODE_MODELS = frozenset(
+    m.strip()
+    for m in os.getenv(
+        "LLM_JSON_MODE_MODELS", "llama-3.1-8b-instant,llama-3.3-70b-versatile"
+    ).split(",")
+    if m.strip()
+)
+
+# Connection pool for each backend's async client: one pool per worker
+# process, kept alive between requests so calls skip TCP/TLS setup.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "256"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "128"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Calls allowed in flight per backend and worker; the rest wait on a
+# semaphore. An in-flight call is an idle coroutine, so this is bounded by
+# the provider's concurrency limits rather than by the worker. Keep it at
+# or below LLM_MAX_CONNECTIONS: calls queued inside the httpx pool cost
+# far more than calls waiting on the semaphore.
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "256"))
+
+# Client-side rate limit (token bucket, per worker); 0 disables it.
+# A call that would wait longer than LLM_RATE_LIMIT_MAX_WAIT fails fast.
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "50"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "100"))
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "10"))
+
+# Retries on 429 / 5xx / connection errors, full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.25"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+
+# Circuit breaker: open after N consecutive failed attempts, probe after T
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Backends behind the router, as a JSON list, e.g.
+#   [{"name": "groq-8b", "type": "groq", "model": "llama-3.1-8b-instant"},
+#    {"name": "groq-70b", "type": "groq", "model": "llama-3.3-70b-versatile"},
+#    {"name": "local", "type": "stub", "latency": {"base_ms": 40}}]
+# groq entries may set "api_key_env" / "base_url"; stub entries take
+# "latency" (LatencyProfile fields), "error_rate", "seed", "token_ms"
+# (streaming delay per word) and "actions" (canned extraction result).
+# Unset: a single Groq backend on DEFAULT_MODEL when GROQ_API_KEY is set.
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS")
+
+# Hedge delay: "auto" (primary backend's rolling p95), a number of
+# milliseconds, or "off"
+LLM_HEDGE_DELAY_MS = os.getenv("LLM_HEDGE_DELAY_MS", "auto")
+# Backends whose rolling error rate is above this are ranked last
+LLM_ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+# Routing stats forget calls older than this, so backends ranked last are
+# measured again; 0 keeps the last calls however old
+LLM_ROUTER_STATS_MAX_AGE = float(os.getenv("LLM_ROUTER_STATS_MAX_AGE", "60"))
 
-client: Optional[Groq] = None
-if GROQ_API_KEY:
-    client = Groq(api_key=GROQ_API_KEY)
+
+def _make_guard() -> LLMCallGuard:
+    return LLMCallGuard(
+        max_in_flight=LLM_MAX_IN_FLIGHT,
+        rate=LLM_RATE_LIMIT_RPS,
+        burst=LLM_RATE_LIMIT_BURST,
+        max_rate_wait=LLM_RATE_LIMIT_MAX_WAIT,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=LLM_BACKOFF_MAX_SECONDS,
+        breaker=CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS),
+    )
+
+
+def _build_provider(spec: Dict[str, Any]) -> Optional[LLMProvider]:
+    kind = spec.get("type", "groq")
+    if kind == "stub":
+        return StubProvider(
+            name=spec.get("name", "stub"),
+            guard=_make_guard(),
+            model=spec.get("model", "stub"),
+            latency=LatencyProfile(**(spec.get("latency") or {})),
+            error_rate=float(spec.get("error_rate", 0.0)),
+            seed=int(spec.get("seed", 0)),
+            actions=spec.get("actions"),
+            token_ms=float(spec.get("token_ms", 0.0)),
+        )
+    if kind == "groq":
+        api_key = os.getenv(spec.get("api_key_env", "GROQ_API_KEY"))
+        if not api_key:
+            return None
+        model = spec.get("model", DEFAULT_MODEL)
+        return GroqProvider(
+            name=spec.get("name", model),
+            model=model,
+            guard=_make_guard(),
+            api_key=api_key,
+            base_url=spec.get("base_url", GROQ_BASE_URL),
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive=LLM_MAX_KEEPALIVE,
+            timeout_seconds=LLM_TIMEOUT_SECONDS,
+            json_mode=model in JSON_MODE_MODELS,
+        )
+    raise ValueError(f"Unknown LLM provider type {kind!r}")
+
+
+def build_router() -> LLMRouter:
+    specs = json.loads(LLM_PROVIDERS) if LLM_PROVIDERS else [{"type": "groq"}]
+    providers = [p for p in (_build_provider(spec) for spec in specs) if p is not None]
+
+    hedge = LLM_HEDGE_DELAY_MS.strip().lower()
+    return LLMRouter(
+        providers,
+        hedge_delay_ms=None if hedge in ("auto", "off") else float(hedge),
+        hedging=hedge != "off",
+        max_error_rate=LLM_ROUTER_MAX_ERROR_RATE,
+        stats_max_age=LLM_ROUTER_STATS_MAX_AGE or None,
+    )
+
+
+router = build_router()
+
+
+def llm_configured() -> bool:
+    return bool(router.providers)
+
+
+async def close_async_client() -> None:
+    # Close pooled connections of every backend
+    await router.aclose()
 
 
 def _strip_json_fences(text: str) -> str:
@@ -43,71 +175,196 @@ def _parse_json_safe(raw: str) -> Any:
         return None
 
 
+BASE_SYSTEM_PROMPT = (
+    "You are a secure enterprise assistant. "
+    "You MUST avoid leaking secrets, credentials, or personal data. "
+    "Respond clearly and concisely."
+)
+
+EXTRACTION_SYSTEM_PROMPT = (
+    "You are an AI that extracts structured ACTION suggestions for an "
+    "enterprise control tower.\n\n"
+    "Given the user's prompt and the assistant's answer, return a JSON object "
+    "with this exact schema:\n\n"
+    "{\n"
+    '  "actions": [\n'
+    "    {\n"
+    '      "type": "email_suggestion" | "database_query" | "api_call_external" '
+    '| "notification" | "file_operation" | "other",\n'
+    '      "payload": { ... arbitrary JSON fields ... }\n'
+    "    }\n"
+    "  ]\n"
+    "}\n\n"
+    "- Only include actions that an enterprise system might reasonably execute.\n"
+    "- If there are no clear actions, return {\"actions\": []}.\n"
+    "- ALWAYS return valid JSON. No explanations, no comments."
+)
+
+
+COMBINED_SYSTEM_PROMPT = (
+    BASE_SYSTEM_PROMPT
+    + "\n\nReply with a JSON object with this exact schema:\n\n"
+    "{\n"
+    '  "answer": "<your answer to the user>",\n'
+    '  "actions": [\n'
+    "    {\n"
+    '      "type": "email_suggestion" | "database_query" | "api_call_external" '
+    '| "notification" | "file_operation" | "other",\n'
+    '      "payload": { ... arbitrary JSON fields ... }\n'
+    "    }\n"
+    "  ]\n"
+    "}\n\n"
+    "- ACTIONS are structured suggestions an enterprise system might reasonably execute.\n"
+    "- If there are no clear actions, use \"actions\": [].\n"
+    "- ALWAYS return valid JSON. No explanations outside the object."
+)
+
+
+def _answer_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": BASE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _combined_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _extraction_messages(prompt: str, answer: str) -> List[Dict[str, str]]:
+    user_msg = (
+        "User prompt:\n"
+        f"{prompt}\n\n"
+        "Assistant answer:\n"
+        f"{answer}\n\n"
+        "Now return the JSON object:"
+    )
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_msg},
+    ]
+
+
+def _clean_actions(data: Any) -> List[Dict[str, Any]]:
+    """
+    Validate the extraction JSON into [{"type": str, "payload": dict}, ...].
+    """
+    if not isinstance(data, dict):
+        return []
+    actions = data.get("actions", [])
+    if not isinstance(actions, list):
+        return []
+    # Basic sanity: each action should be dict with type + payload
+    cleaned: List[Dict[str, Any]] = []
+    for a in actions:
+        if not isinstance(a, dict):
+            continue
+        a_type = a.get("type") or "other"
+        payload = a.get("payload") or {}
+        if not isinstance(payload, dict):
+            payload = {}
+        cleaned.append({"type": a_type, "payload": payload})
+    return cleaned
+
+
+def _no_client_result(prompt: str) -> Dict[str, Any]:
+    # No API key, just echo prompt
+    return {
+        "text": f"(LLM not configured) Echo: {prompt}",
+        "model": "none",
+        "provider": None,
+        "actions": [],
+        "error": "GROQ_API_KEY not set",
+    }
+
+
+def _error_result(prompt: str, e: Exception) -> Dict[str, Any]:
+    # Fallback on any error
+    return {
+        "text": f"(Error calling LLM, fallback response for prompt: {prompt})",
+        "model": "unknown",
+        "provider": None,
+        "actions": [],
+        "error": str(e),
+    }
+
+
+def _chat(messages: List[Dict[str, str]], **kwargs: Any) -> RoutedCompletion:
+    """
+    Blocking counterpart of _chat_async().
+    """
+    return router.chat(messages, **kwargs)
+
+
+def _budget(prompt: str) -> Tuple[str, BudgetDecision]:
+    """
+    Fit the prompt into the active policy's token budget (idempotent:
+    callers may already have budgeted it). Raises BudgetExceeded when
+    the policy rejects oversized prompts.
+    """
+    return apply_budget(prompt, get_policy_table().budget)
+
+
+def _max_output_tokens() -> int:
+    return get_policy_table().budget.max_output_tokens
+
+
 def _extract_actions_with_llm(prompt: str, answer: str) -> List[Dict[str, Any]]:
     """
     Optional second LLM pass to extract structured actions from
     (prompt, answer). If anything fails, returns [].
     """
-    if client is None:
+    if not llm_configured():
         return []
 
     try:
-        system_msg = (
-            "You are an AI that extracts structured ACTION suggestions for an "
-            "enterprise control tower.\n\n"
-            "Given the user's prompt and the assistant's answer, return a JSON object "
-            "with this exact schema:\n\n"
-            "{\n"
-            '  "actions": [\n'
-            "    {\n"
-            '      "type": "email_suggestion" | "database_query" | "api_call_external" '
-            '| "notification" | "file_operation" | "other",\n'
-            '      "payload": { ... arbitrary JSON fields ... }\n'
-            "    }\n"
-            "  ]\n"
-            "}\n\n"
-            "- Only include actions that an enterprise system might reasonably execute.\n"
-            "- If there are no clear actions, return {\"actions\": []}.\n"
-            "- ALWAYS return valid JSON. No explanations, no comments."
+        resp = _chat(
+            _extraction_messages(prompt, answer),
+            temperature=0.2,
+            max_tokens=_max_output_tokens(),
         )
+        return _clean_actions(_parse_json_safe(resp.text))
+    except Exception:
+        # If anything fails, just return no actions
+        return []
 
-        user_msg = (
-            "User prompt:\n"
-            f"{prompt}\n\n"
-            "Assistant answer:\n"
-            f"{answer}\n\n"
-            "Now return the JSON object:"
-        )
 
-        resp = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_msg},
-            ],
+async def _chat_async(
+    messages: List[Dict[str, str]], **kwargs: Any
+) -> RoutedCompletion:
+    """
+    One chat completion through the router: fastest healthy backend,
+    hedged when slow, falling back on failure. Each backend call goes
+    through its guard (breaker, rate limit, in-flight bound, retries).
+    Raises when every backend failed.
+    """
+    return await router.chat_async(messages, **kwargs)
+
+
+async def extract_actions_async(
+    prompt: str, answer: str, strict: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Async counterpart of _extract_actions_with_llm(). Returns [] on any
+    failure unless strict=True, in which case the error propagates (used
+    by background extraction to record a failed status).
+    """
+    if not llm_configured():
+        return []
+
+    try:
+        resp = await _chat_async(
+            _extraction_messages(prompt, answer),
             temperature=0.2,
+            max_tokens=_max_output_tokens(),
         )
-
-        content = resp.choices[0].message.content
-        data = _parse_json_safe(content or "")
-        if not isinstance(data, dict):
-            return []
-        actions = data.get("actions", [])
-        if not isinstance(actions, list):
-            return []
-        # Basic sanity: each action should be dict with type + payload
-        cleaned: List[Dict[str, Any]] = []
-        for a in actions:
-            if not isinstance(a, dict):
-                continue
-            a_type = a.get("type") or "other"
-            payload = a.get("payload") or {}
-            if not isinstance(payload, dict):
-                payload = {}
-            cleaned.append({"type": a_type, "payload": payload})
-        return cleaned
+        return _clean_actions(_parse_json_safe(resp.text))
     except Exception:
-        # If anything fails, just return no actions
+        if strict:
+            raise
         return []
 
 
@@ -120,37 +377,28 @@ def safe_generate(prompt: str) -> Dict[str, Any]:
         "text": <answer or fallback>,
         "model": <model_name or "unknown">,
         "actions": [ { "type": str, "payload": dict }, ... ],
-        "error": <error message or None>
+        "error": <error message or None>,
+        "budget": <token budget decision for the prompt>
     }
-    """
-    if client is None:
-        # No API key, just echo prompt
-        return {
-            "text": f"(LLM not configured) Echo: {prompt}",
-            "model": "none",
-            "actions": [],
-            "error": "GROQ_API_KEY not set",
-        }
 
-    base_system = (
-        "You are a secure enterprise assistant. "
-        "You MUST avoid leaking secrets, credentials, or personal data. "
-        "Respond clearly and concisely."
-    )
+    Prompts over the policy's input budget are cut down first (see
+    app.llm.budget); generation is capped at the policy's max_tokens.
+    """
+    if not llm_configured():
+        return _no_client_result(prompt)
 
     try:
+        prompt, budget = _budget(prompt)
+
         # Main answer call
-        resp = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": base_system},
-                {"role": "user", "content": prompt},
-            ],
+        resp = _chat(
+            _answer_messages(prompt),
             temperature=0.3,
+            max_tokens=budget.max_output_tokens,
         )
 
-        model_name = resp.model or "llama-3.1-8b-instant"
-        answer = resp.choices[0].message.content or ""
+        model_name = resp.model
+        answer = resp.text
 
         # Second pass: extract structured actions (best-effort)
         actions = _extract_actions_with_llm(prompt, answer)
@@ -158,15 +406,158 @@ def safe_generate(prompt: str) -> Dict[str, Any]:
         return {
             "text": answer,
             "model": model_name,
+            "provider": resp.provider,
             "actions": actions,
             "error": None,
+            "budget": budget.as_dict(),
         }
 
     except Exception as e:
-        # Fallback on any error
+        return _error_result(prompt, e)
+
+
+async def safe_generate_async(prompt: str, extract_actions: bool = True) -> Dict[str, Any]:
+    """
+    Async counterpart of safe_generate() (same return shape). Runs on the
+    backends' pooled clients without holding a thread per call; at most
+    LLM_MAX_IN_FLIGHT calls per backend are on the wire at once.
+
+    extract_actions=False skips the second pass and returns actions=[],
+    for callers that extract actions later (see extract_actions_async).
+    """
+    if not llm_configured():
+        return _no_client_result(prompt)
+
+    try:
+        prompt, budget = _budget(prompt)
+        resp = await _chat_async(
+            _answer_messages(prompt),
+            temperature=0.3,
+            max_tokens=budget.max_output_tokens,
+        )
+
+        model_name = resp.model
+        answer = resp.text
+
+        actions: List[Dict[str, Any]] = []
+        if extract_actions:
+            actions = await extract_actions_async(prompt, answer)
+
         return {
-            "text": f"(Error calling LLM, fallback response for prompt: {prompt})",
-            "model": "unknown",
+            "text": answer,
+            "model": model_name,
+            "provider": resp.provider,
+            "actions": actions,
+            "error": None,
+            "budget": budget.as_dict(),
+        }
+
+    except Exception as e:
+        return _error_result(prompt, e)
+
+
+async def _one_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def safe_stream_async(prompt: str) -> Dict[str, Any]:
+    """
+    Streaming counterpart of safe_generate_async(extract_actions=False):
+    same keys, but "chunks" (an async iterator of text deltas) instead of
+    "text". If no stream can be opened, the fallback text comes through
+    "chunks" in one piece and "error" is set.
+    """
+    if not llm_configured():
+        result = _no_client_result(prompt)
+    else:
+        try:
+            prompt, budget = _budget(prompt)
+            stream = await router.stream_async(
+                _answer_messages(prompt),
+                temperature=0.3,
+                max_tokens=budget.max_output_tokens,
+            )
+            return {
+                "chunks": stream.chunks,
+                "model": stream.model,
+                "provider": stream.provider,
+                "actions": [],
+                "error": None,
+                "budget": budget.as_dict(),
+            }
+
+        except Exception as e:
+            result = _error_result(prompt, e)
+    return {**result, "chunks": _one_chunk(result.pop("text"))}
+
+
+async def safe_complete_async(
+    system_prompt: str, prompt: str, temperature: float = 0.3
+) -> Dict[str, Any]:
+    """
+    One budgeted completion with a caller-supplied system prompt, no
+    action extraction (map steps of large-input runs). Same return shape
+    as safe_generate() with actions=[].
+    """
+    if not llm_configured():
+        return _no_client_result(prompt)
+
+    try:
+        prompt, budget = _budget(prompt)
+        resp = await _chat_async(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=temperature,
+            max_tokens=budget.max_output_tokens,
+        )
+        return {
+            "text": resp.text,
+            "model": resp.model,
+            "provider": resp.provider,
             "actions": [],
-            "error": str(e),
+            "error": None,
+            "budget": budget.as_dict(),
         }
+
+    except Exception as e:
+        return _error_result(prompt, e)
+
+
+async def safe_generate_combined_async(prompt: str) -> Dict[str, Any]:
+    """
+    Answer and actions from a single structured (JSON mode) call, instead
+    of an answer call followed by an extraction call. Same return shape
+    as safe_generate(). Falls back to the two-call path when the model
+    has no JSON mode or the reply is not the expected object.
+    """
+    if not llm_configured():
+        return _no_client_result(prompt)
+    if not router.supports_json_mode():
+        return await safe_generate_async(prompt)
+
+    try:
+        prompt, budget = _budget(prompt)
+        resp = await _chat_async(
+            _combined_messages(prompt),
+            json_mode=True,
+            temperature=0.3,
+            max_tokens=budget.max_output_tokens,
+            response_format={"type": "json_object"},
+        )
+        data = _parse_json_safe(resp.text)
+        if not isinstance(data, dict) or not isinstance(data.get("answer"), str):
+            return await safe_generate_async(prompt)
+
+        return {
+            "text": data["answer"],
+            "model": resp.model,
+            "provider": resp.provider,
+            "actions": _clean_actions(data),
+            "error": None,
+            "budget": budget.as_dict(),
+        }
+
+    except Exception as e:
+        return _error_result(prompt, e)
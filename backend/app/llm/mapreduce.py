@@ -0,0 +1,458 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.timing import StageTimer
+from app.llm.budget import TokenBudget, apply_budget, estimate_tokens
+from app.llm.client import BASE_SYSTEM_PROMPT, safe_complete_async
+from app.llm.scrubber import (
+    DEFAULT_STREAM_OVERLAP,
+    Redaction,
+    ScrubMatch,
+    apply_placeholders,
+    find_pii,
+)
+from app.trust.evaluator import (
+    RiskMatch,
+    ScanContext,
+    build_scan_context,
+    classify_risk_level,
+    get_risk_matcher,
+    map_batch_chunks,
+    merge_scan_contexts,
+)
+
+# Boundaries tried in order when a piece is over the chunk budget:
+# paragraphs, lines, sentences, then any whitespace.
+_BOUNDARIES = [
+    re.compile(r"\n\s*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?;])\s+"),
+    re.compile(r"\s+"),
+]
+
+# Tokens of the start of the input quoted to every map call as the task
+TASK_TOKENS = 200
+# Slack for estimating a prompt as the sum of its parts
+_FRAME_SLACK_TOKENS = 8
+# A chunk boundary is moved back to the start of a PII value that
+# straddles it, so a chunk may grow by up to DEFAULT_STREAM_OVERLAP
+# characters (the longest PII match); the map prompt keeps room for that
+_SEAM_SLACK_TOKENS = 128
+
+MAP_SYSTEM_PROMPT = (
+    BASE_SYSTEM_PROMPT
+    + " You are reading one part of a long input that was split into parts. "
+    "Write concise notes on everything in this part that is relevant to the "
+    "user's request: facts, figures, names, dates, obligations, errors. "
+    "Keep placeholders such as [EMAIL_1] verbatim. Notes only, no preamble."
+)
+
+COMBINE_SYSTEM_PROMPT = (
+    BASE_SYSTEM_PROMPT
+    + " You are given notes taken on consecutive parts of a long input. "
+    "Merge them into one set of concise notes on everything relevant to the "
+    "user's request, dropping repetition but no facts, figures, names, dates, "
+    "obligations or errors. Keep placeholders such as [EMAIL_1] verbatim. "
+    "Notes only, no preamble."
+)
+
+
+class LargeInputError(Exception):
+    pass
+
+
+class ChunkAnalysis(NamedTuple):
+    pii: List[ScrubMatch]
+    scan: ScanContext
+    elapsed_ms: float
+
+
+@dataclass
+class MapReduceResult:
+    redaction: Redaction  # whole prompt, placeholders numbered across chunks
+    prompt_scan: ScanContext  # merged per-chunk risk scans of the prompt
+    reduce_prompt: str
+    llm_result: Dict[str, Any]  # reduce call, same shape as safe_generate()
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _split_at(text: str, boundary: re.Pattern) -> List[str]:
+    # Delimiters stay on the preceding segment, so "".join() == text
+    segments: List[str] = []
+    pos = 0
+    for m in boundary.finditer(text):
+        if m.end() > pos:
+            segments.append(text[pos:m.end()])
+            pos = m.end()
+    if pos < len(text):
+        segments.append(text[pos:])
+    return segments
+
+
+def _hard_split(text: str, max_tokens: int) -> List[str]:
+    budget = TokenBudget(max_tokens, 1, "truncate_tail")
+    out: List[str] = []
+    while text:
+        head, _ = apply_budget(text, budget)
+        if not head:  # a single piece over the budget
+            head = text[:max_tokens]
+        out.append(head)
+        text = text[len(head):]
+    return out
+
+
+def split_semantic(text: str, max_tokens: int, level: int = 0) -> List[str]:
+    """
+    Split text into chunks of at most ~max_tokens estimated tokens,
+    cutting at the coarsest boundary that works (paragraph, line,
+    sentence, whitespace). Chunks concatenate back to the exact text.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text] if text else []
+    if level >= len(_BOUNDARIES):
+        return _hard_split(text, max_tokens)
+
+    chunks: List[str] = []
+    current = ""
+    current_tokens = 0
+    for segment in _split_at(text, _BOUNDARIES[level]):
+        tokens = estimate_tokens(segment)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(current)
+                current, current_tokens = "", 0
+            chunks.extend(split_semantic(segment, max_tokens, level + 1))
+            continue
+        if current_tokens + tokens > max_tokens and current:
+            chunks.append(current)
+            current, current_tokens = "", 0
+        current += segment
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _analyze_chunks(chunks: List[str]) -> List[ChunkAnalysis]:
+    """
+    PII + risk scan of each chunk. Module-level so the batch process pool
+    can run it (one chunk per task on multi-core hosts).
+    """
+    results = []
+    for chunk in chunks:
+        start = time.perf_counter()
+        pii = find_pii(chunk)
+        scan = build_scan_context(chunk, None)
+        results.append(ChunkAnalysis(pii, scan, (time.perf_counter() - start) * 1000))
+    return results
+
+
+def _fix_seams(
+    chunks: List[str], analyses: List[ChunkAnalysis]
+) -> Tuple[List[str], List[ChunkAnalysis], List[RiskMatch]]:
+    """
+    Chunks are scanned on their own, so a PII value or risk keyword cut in
+    two by a chunk boundary would be missed. Rescan a window around each
+    boundary: a PII value that straddles it moves the boundary back to
+    its start (both chunks are rescanned, so it is redacted whole), and
+    risk keywords that straddle it are returned with offsets into the
+    merged chunk scans (each chunk's scan text ends in one extra space).
+    """
+    chunks = list(chunks)
+    analyses = list(analyses)
+    keep = max(0, get_risk_matcher().max_keyword_len - 1)
+    seam_matches: List[RiskMatch] = []
+    offset = 0  # start of chunks[i] in the merged scan text
+    for i in range(len(chunks) - 1):
+        left, right = chunks[i], chunks[i + 1]
+        head = left[-DEFAULT_STREAM_OVERLAP:]
+        window = head + right[:DEFAULT_STREAM_OVERLAP]
+        straddling = [m.start for m in find_pii(window) if m.start < len(head) < m.end]
+        if straddling:
+            cut = len(left) - (len(head) - min(straddling))
+            chunks[i], chunks[i + 1] = left[:cut], left[cut:] + right
+            analyses[i : i + 2] = _analyze_chunks(chunks[i : i + 2])
+            left, right = chunks[i], chunks[i + 1]
+
+        tail = left[-keep:] if keep else ""
+        seam = len(tail)
+        base = offset + len(left) - seam
+        for m in get_risk_matcher().iter_matches((tail + right[:keep]).lower()):
+            if m.start < seam < m.end:
+                # the part in the next chunk sits one space further on
+                seam_matches.append(m._replace(start=m.start + base, end=m.end + base + 1))
+        offset += len(analyses[i].scan.text_l)
+
+    pairs = [(c, a) for c, a in zip(chunks, analyses) if c]
+    return [c for c, _ in pairs], [a for _, a in pairs], seam_matches
+
+
+def _with_seam_matches(scan: ScanContext, seam_matches: List[RiskMatch]) -> ScanContext:
+    if not seam_matches:
+        return scan
+    seen = set(scan.flags) | {m.flag for m in seam_matches}
+    flags = [f for f in get_risk_matcher().flag_order if f in seen]
+    return ScanContext(
+        text_l=scan.text_l,
+        matches=sorted(scan.matches + seam_matches),
+        flags=flags,
+        risk_level=classify_risk_level(flags),
+    )
+
+
+def _merge_redactions(
+    chunks: List[str], analyses: List[ChunkAnalysis]
+) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Placeholders numbered across the whole input, as if the prompt had been
+    redacted in one piece: the same value gets the same placeholder in
+    every chunk.
+    """
+    by_value: Dict[str, str] = {}
+    redacted = [
+        apply_placeholders(chunk, analysis.pii, by_value)
+        for chunk, analysis in zip(chunks, analyses)
+    ]
+    return redacted, {ph: value for value, ph in by_value.items()}
+
+
+def _chunk_report(
+    index: int, chunk: str, analysis: ChunkAnalysis, llm_ms: float, result: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "chars": len(chunk),
+        "tokens": estimate_tokens(chunk),
+        "scrub_risk_ms": round(analysis.elapsed_ms, 3),
+        "llm_ms": round(llm_ms, 3),
+        "redactions": len(analysis.pii),
+        "risk_flags": list(analysis.scan.flags),
+        "provider": result.get("provider"),
+        "error": result.get("error"),
+    }
+
+
+def _task_of(redacted_chunks: List[str]) -> str:
+    # The request is usually stated up front; quote the start of the input
+    first = _split_at(redacted_chunks[0], _BOUNDARIES[0])[0]
+    task, _ = apply_budget(first.strip(), TokenBudget(TASK_TOKENS, 1, "truncate_tail"))
+    return task
+
+
+class Notes(NamedTuple):
+    first: int  # 0-based index of the first chunk covered
+    last: int
+    text: str
+
+
+def _notes_label(notes: Notes, total: int) -> str:
+    if notes.first == notes.last:
+        return f"[Part {notes.first + 1}/{total}]"
+    return f"[Parts {notes.first + 1}-{notes.last + 1}/{total}]"
+
+
+def _notes_body(notes: List[Notes], total: int) -> str:
+    return "\n\n".join(f"{_notes_label(n, total)}\n{n.text.strip()}" for n in notes)
+
+
+def _map_prompt(task: str, index: int, total: int, chunk: str) -> str:
+    return f"User's request: {task}\n\nPart {index + 1}/{total}:\n{chunk}"
+
+
+def _combine_prompt(task: str, notes: List[Notes], total: int) -> str:
+    return f"User's request: {task}\n\nNotes:\n{_notes_body(notes, total)}"
+
+
+def _reduce_prompt(task: str, notes: List[Notes], total: int) -> str:
+    return (
+        f"The user sent a long input, processed in {total} parts.\n\n"
+        f"The user's request (start of the input):\n{task}\n\n"
+        f"Notes from each part:\n{_notes_body(notes, total)}\n\n"
+        "Using these notes, answer the user's request."
+    )
+
+
+def map_chunk_tokens(chunk_tokens: int, max_input_tokens: int) -> int:
+    """
+    Largest chunk size <= chunk_tokens whose map prompt (task quote and
+    framing included) fits the input budget; 0 when nothing fits.
+    """
+    frame = (
+        estimate_tokens(_map_prompt("", 999, 999, ""))
+        + TASK_TOKENS
+        + _FRAME_SLACK_TOKENS
+        + _SEAM_SLACK_TOKENS
+    )
+    return max(0, min(chunk_tokens, max_input_tokens - frame))
+
+
+def check_large_input_budget(chunk_tokens: int, budget: TokenBudget) -> None:
+    """
+    Startup check: LARGE_INPUT_CHUNK_TOKENS plus the task quote must fit
+    the policy's input budget, or every map prompt would be cut down.
+    """
+    fits = map_chunk_tokens(chunk_tokens, budget.max_input_tokens)
+    if fits < chunk_tokens:
+        raise LargeInputError(
+            f"LARGE_INPUT_CHUNK_TOKENS={chunk_tokens} plus the task quote "
+            f"({TASK_TOKENS} tokens) does not fit the policy's input budget of "
+            f"{budget.max_input_tokens} tokens; lower it to {fits} or less"
+        )
+
+
+def _group_notes(
+    task: str, notes: List[Notes], total: int, max_input_tokens: int
+) -> Optional[List[List[Notes]]]:
+    """
+    Split notes into consecutive groups whose combine prompt fits the
+    input budget, at least two notes per group (notes are cut to half the
+    room first). None when not even that fits.
+    """
+    frame = estimate_tokens(_combine_prompt(task, [], total)) + _FRAME_SLACK_TOKENS
+    room = max_input_tokens - frame
+    per_note = room // 2
+
+    groups: List[List[Notes]] = [[]]
+    used = 0
+    for n in notes:
+        overhead = estimate_tokens(_notes_label(n, total)) + 2  # label + blank lines
+        if per_note <= overhead:
+            return None
+        text, _ = apply_budget(
+            n.text.strip(), TokenBudget(per_note - overhead, 1, "truncate_tail")
+        )
+        n = n._replace(text=text)
+        cost = overhead + estimate_tokens(text)
+        if groups[-1] and used + cost > room:
+            groups.append([])
+            used = 0
+        groups[-1].append(n)
+        used += cost
+    return groups
+
+
+async def run_map_reduce(
+    prompt: str,
+    reduce: Callable[[str], Awaitable[Dict[str, Any]]],
+    chunk_tokens: int,
+    max_chunks: int,
+    max_fanout: int,
+    budget: TokenBudget,
+    timer: Optional[StageTimer] = None,
+) -> MapReduceResult:
+    """
+    Large-input mode: split the prompt on semantic boundaries, scrub and
+    risk-scan the chunks in parallel (batch pool, off the event loop),
+    then rescan around each chunk boundary (see _fix_seams),
+    run one LLM call per chunk with at most max_fanout in flight, then
+    reduce the per-chunk notes with one final call (reduce, e.g.
+    safe_generate_async, so the answer comes with actions as usual).
+
+    Every prompt is kept within budget.max_input_tokens: chunks shrink so
+    a map prompt fits, and while the notes are too long for one reduce
+    prompt, groups of them are merged by extra calls first (a reduce
+    tree), so no notes are cut and the "reject" strategy never trips.
+    """
+    timer = timer or StageTimer()
+    chunk_tokens = map_chunk_tokens(chunk_tokens, budget.max_input_tokens) or chunk_tokens
+
+    with timer.stage("split"):
+        chunks = await run_in_threadpool(split_semantic, prompt, chunk_tokens)
+    if len(chunks) > max_chunks:
+        raise LargeInputError(
+            f"Input splits into {len(chunks)} chunks of ~{chunk_tokens} tokens "
+            f"(max {max_chunks})"
+        )
+
+    with timer.stage("scrub_risk"):
+        analyses = await run_in_threadpool(map_batch_chunks, _analyze_chunks, chunks, 1)
+        chunks, analyses, seam_matches = await run_in_threadpool(
+            _fix_seams, chunks, analyses
+        )
+        redacted, mapping = _merge_redactions(chunks, analyses)
+
+    if len(chunks) == 1:
+        # Fits in one chunk: a single plain call, no map step
+        with timer.stage("reduce"):
+            llm_result = await reduce(redacted[0])
+        return MapReduceResult(
+            redaction=Redaction(redacted[0], mapping),
+            prompt_scan=analyses[0].scan,
+            reduce_prompt=redacted[0],
+            llm_result=llm_result,
+            chunks=[_chunk_report(0, chunks[0], analyses[0], 0.0, llm_result)],
+        )
+
+    task = _task_of(redacted)
+    fanout = asyncio.Semaphore(max_fanout)
+    map_ms: List[float] = [0.0] * len(chunks)
+
+    total = len(chunks)
+
+    async def map_one(i: int) -> Dict[str, Any]:
+        async with fanout:
+            start = time.perf_counter()
+            result = await safe_complete_async(
+                MAP_SYSTEM_PROMPT, _map_prompt(task, i, total, redacted[i])
+            )
+            map_ms[i] = (time.perf_counter() - start) * 1000
+            return result
+
+    async def combine(group: List[Notes]) -> Notes:
+        if len(group) == 1:
+            return group[0]
+        async with fanout:
+            result = await safe_complete_async(
+                COMBINE_SYSTEM_PROMPT, _combine_prompt(task, group, total)
+            )
+        if result["error"] is not None:
+            combine_errors.append(result["error"])
+            text = "(these parts could not be processed)"
+        else:
+            text = result["text"]
+        return Notes(group[0].first, group[-1].last, text)
+
+    with timer.stage("map"):
+        mapped = await asyncio.gather(*(map_one(i) for i in range(total)))
+
+    notes = [
+        Notes(i, i, r["text"] if r["error"] is None else "(this part could not be processed)")
+        for i, r in enumerate(mapped)
+    ]
+    combine_errors: List[str] = []
+    reduce_prompt = _reduce_prompt(task, notes, total)
+    with timer.stage("combine"):
+        while len(notes) > 1 and estimate_tokens(reduce_prompt) > budget.max_input_tokens:
+            groups = _group_notes(task, notes, total, budget.max_input_tokens)
+            if groups is None:
+                break  # budget too small to merge; the reduce call cuts it down
+            notes = list(await asyncio.gather(*(combine(g) for g in groups)))
+            reduce_prompt = _reduce_prompt(task, notes, total)
+    with timer.stage("reduce"):
+        llm_result = await reduce(reduce_prompt)
+
+    failed = [i for i, r in enumerate(mapped) if r["error"] is not None]
+    if failed and llm_result.get("error") is None:
+        llm_result["error"] = f"{len(failed)} of {total} chunks failed: {mapped[failed[0]]['error']}"
+    elif combine_errors and llm_result.get("error") is None:
+        llm_result["error"] = f"{len(combine_errors)} note merges failed: {combine_errors[0]}"
+
+    chunk_reports = [
+        _chunk_report(i, chunk, analysis, map_ms[i], mapped[i])
+        for i, (chunk, analysis) in enumerate(zip(chunks, analyses))
+    ]
+
+    return MapReduceResult(
+        redaction=Redaction("".join(redacted), mapping),
+        prompt_scan=_with_seam_matches(
+            merge_scan_contexts([a.scan for a in analyses]), seam_matches
+        ),
+        reduce_prompt=reduce_prompt,
+        llm_result=llm_result,
+        chunks=chunk_reports,
+    )
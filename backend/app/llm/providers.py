@@ -0,0 +1,350 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+from groq import AsyncGroq, Groq
+
+from app.llm.resilience import LLMCallGuard, RetryableError
+
+
+class Completion(NamedTuple):
+    text: str
+    model: str  # model that actually answered
+
+
+class LatencyProfile(NamedTuple):
+    """
+    Latency of a stub provider: base_ms +/- jitter_ms, and with probability
+    slow_ratio an extra slow_ms (a long tail, e.g. queueing upstream).
+    """
+
+    base_ms: float = 50.0
+    jitter_ms: float = 0.0
+    slow_ratio: float = 0.0
+    slow_ms: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        ms = self.base_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.slow_ratio and rng.random() < self.slow_ratio:
+            ms += self.slow_ms
+        return max(0.0, ms)
+
+
+class ProviderStats:
+    """
+    Rolling window of the last `window` calls of one backend: latency
+    percentiles over successful calls, error rate over all of them.
+    Samples older than max_age seconds drop out, so a backend that gets
+    no traffic (ranked last as failing or slow) is measured afresh
+    instead of being judged on old calls forever. None keeps them.
+    """
+
+    def __init__(self, window: int = 200, max_age: Optional[float] = 60.0):
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=window)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _expire(self) -> None:
+        # caller holds the lock
+        if self.max_age is None:
+            return
+        cutoff = time.monotonic() - self.max_age
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), latency_ms, ok))
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def _latencies(self) -> List[float]:
+        with self._lock:
+            self._expire()
+            return sorted(ms for _, ms, ok in self._samples if ok)
+
+    def percentile(self, q: float) -> Optional[float]:
+        latencies = self._latencies()
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            self._expire()
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, _, ok in self._samples if not ok) / len(self._samples)
+
+    def sample_count(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "window_samples": self.sample_count(),
+            "p50_ms": None if p50 is None else round(p50, 3),
+            "p95_ms": None if p95 is None else round(p95, 3),
+            "error_rate": round(self.error_rate(), 4),
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class LLMProvider:
+    """
+    One chat-completion backend (a provider + model). Subclasses implement
+    _complete / _complete_async; calls go through the provider's own
+    guard, so each backend has its own breaker, rate limit and retries.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        guard: LLMCallGuard,
+        json_mode: bool = False,
+        stats_window: int = 200,
+    ):
+        self.name = name
+        self.model = model
+        self.guard = guard
+        self.json_mode = json_mode
+        self.stats = ProviderStats(stats_window)
+
+    def _complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> Completion:
+        raise NotImplementedError
+
+    async def _complete_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> Completion:
+        raise NotImplementedError
+
+    def chat(self, messages: List[Dict[str, str]], **kwargs: Any) -> Completion:
+        return self.guard.call(lambda: self._complete(messages, **kwargs))
+
+    async def chat_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> Completion:
+        return await self.guard.call_async(
+            lambda: self._complete_async(messages, **kwargs)
+        )
+
+    async def _open_stream_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def stream_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """
+        Open a streamed completion and return its text deltas. Only the
+        opening (up to the response headers) goes through the guard, so it
+        is retried and counted by the breaker; a failure mid-stream is
+        raised to the reader.
+        """
+        return await self.guard.call_async(
+            lambda: self._open_stream_async(messages, **kwargs)
+        )
+
+    async def aclose(self) -> None:
+        self.guard.reset_async()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "type": type(self).__name__,
+            "model": self.model,
+            "json_mode": self.json_mode,
+            **self.stats.snapshot(),
+            "guard": self.guard.snapshot(),
+        }
+
+
+class GroqProvider(LLMProvider):
+    """
+    Groq chat completions (or anything serving the same API at base_url).
+    SDK retries are off: the guard owns retrying.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        guard: LLMCallGuard,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_connections: int = 64,
+        max_keepalive: int = 64,
+        timeout_seconds: float = 60.0,
+        json_mode: bool = False,
+    ):
+        super().__init__(name, model, guard, json_mode=json_mode)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout_seconds = timeout_seconds
+        self.client = Groq(api_key=api_key, base_url=base_url, max_retries=0)
+        self._async_client: Optional[AsyncGroq] = None
+
+    def get_async_client(self) -> AsyncGroq:
+        """
+        AsyncGroq on a pooled keep-alive httpx.AsyncClient. Created lazily
+        so it binds to the running event loop.
+        """
+        if self._async_client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+                timeout=httpx.Timeout(self.timeout_seconds, connect=5.0),
+            )
+            self._async_client = AsyncGroq(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                max_retries=0,
+            )
+        return self._async_client
+
+    def _complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> Completion:
+        resp = self.client.chat.completions.create(
+            model=self.model, messages=messages, **kwargs
+        )
+        return Completion(resp.choices[0].message.content or "", resp.model or self.model)
+
+    async def _complete_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> Completion:
+        resp = await self.get_async_client().chat.completions.create(
+            model=self.model, messages=messages, **kwargs
+        )
+        return Completion(resp.choices[0].message.content or "", resp.model or self.model)
+
+    async def _open_stream_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> AsyncIterator[str]:
+        stream = await self.get_async_client().chat.completions.create(
+            model=self.model, messages=messages, stream=True, **kwargs
+        )
+
+        async def deltas() -> AsyncIterator[str]:
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+
+        return deltas()
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        await super().aclose()
+
+
+class StubProviderError(RetryableError):
+    pass
+
+
+STUB_ACTIONS = [
+    {
+        "type": "email_suggestion",
+        "payload": {"to": "ops@example.com", "subject": "Follow-up"},
+    }
+]
+
+
+class StubProvider(LLMProvider):
+    """
+    In-process stand-in with a configurable latency profile and error
+    rate, for routing tests, load tests and local runs without a provider.
+    Seeded, so a given call sequence always sees the same latencies and
+    errors. actions are the canned extraction result; streamed answers
+    come word by word, token_ms apart, after the sampled latency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        guard: LLMCallGuard,
+        model: str = "stub",
+        latency: LatencyProfile = LatencyProfile(),
+        error_rate: float = 0.0,
+        seed: int = 0,
+        json_mode: bool = True,
+        actions: Optional[List[Dict[str, Any]]] = None,
+        token_ms: float = 0.0,
+    ):
+        super().__init__(name, model, guard, json_mode=json_mode)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.actions = STUB_ACTIONS if actions is None else actions
+        self.token_ms = token_ms
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._rng_lock:
+            return self.latency.sample(self._rng), self._rng.random() < self.error_rate
+
+    def _reply(self, messages: List[Dict[str, str]], **kwargs: Any) -> Completion:
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+        answer = f"Stub answer from {self.name} to: {user[:200]}"
+        json_mode = (kwargs.get("response_format") or {}).get("type") == "json_object"
+        if json_mode and '"answer"' in system:
+            return Completion(json.dumps({"answer": answer, "actions": self.actions}), self.model)
+        if "ACTION" in system:
+            return Completion(json.dumps({"actions": self.actions}), self.model)
+        return Completion(answer, self.model)
+
+    def _complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> Completion:
+        delay_ms, fail = self._draw()
+        time.sleep(delay_ms / 1000)
+        if fail:
+            raise StubProviderError(f"stub {self.name}: injected failure")
+        return self._reply(messages, **kwargs)
+
+    async def _complete_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> Completion:
+        delay_ms, fail = self._draw()
+        await asyncio.sleep(delay_ms / 1000)
+        if fail:
+            raise StubProviderError(f"stub {self.name}: injected failure")
+        return self._reply(messages, **kwargs)
+
+    async def _open_stream_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> AsyncIterator[str]:
+        # the sampled latency is the time to first token; the rest of the
+        # answer follows word by word
+        delay_ms, fail = self._draw()
+        await asyncio.sleep(delay_ms / 1000)
+        if fail:
+            raise StubProviderError(f"stub {self.name}: injected failure")
+        text = self._reply(messages, **kwargs).text
+
+        async def deltas() -> AsyncIterator[str]:
+            for word in re.findall(r"\S+\s*|\s+", text):
+                yield word
+                await asyncio.sleep(self.token_ms / 1000)
+
+        return deltas()
@@ -0,0 +1,348 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from groq import (
+    APIConnectionError,
+    APIStatusError,
+    InternalServerError,
+    RateLimitError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """
+    The call was not sent: the provider is considered down or we are over
+    our own rate limit. safe_generate*() turn this into the fallback text.
+    """
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+class LocalRateLimitError(LLMUnavailableError):
+    pass
+
+
+class RetryableError(Exception):
+    """
+    Transient provider failure raised by non-Groq backends (e.g. stubs).
+    """
+
+
+class TokenBucket:
+    """
+    Client-side rate limit: `rate` calls per second with bursts of up to
+    `burst`. reserve() takes a token (the balance may go negative) and
+    returns how long the caller must wait before sending, so waiting
+    callers are served in arrival order. rate <= 0 means unlimited.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                raise LocalRateLimitError(
+                    f"LLM rate limit ({self.rate:g}/s) exceeded; would wait {wait:.1f}s"
+                )
+            self._tokens -= 1
+            return wait
+
+    def available(self) -> float:
+        if self.rate <= 0:
+            return float("inf")
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failed attempts;
+    open fails fast for `reset_timeout` seconds, then half_open lets a
+    single probe through: success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError if the call can't go out; True if it was
+        let through as the half-open probe (the caller then owns it).
+        """
+        with self._lock:
+            if self.state == "open":
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"LLM circuit open (retry in {remaining:.1f}s): {self.last_error}"
+                    )
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    raise CircuitOpenError("LLM circuit half-open, probe in flight")
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def allows_call(self) -> bool:
+        """
+        Whether before_call() would let a call through now: an open
+        circuit does once its reset timeout has passed (as the probe).
+        Doesn't claim the probe.
+        """
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() >= self.opened_at + self.reset_timeout
+            if self.state == "half_open":
+                return not self._probe_in_flight
+            return True
+
+    def release_probe(self) -> None:
+        # the probe never reached the provider (rate limited / cancelled)
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self.state == "half_open" or (
+                self.state == "closed"
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = round(
+                    max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 3
+                )
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout,
+                "times_opened": self.times_opened,
+                "retry_in_seconds": retry_in,
+                "last_error": self.last_error,
+            }
+
+
+def is_retryable(error: BaseException) -> bool:
+    # 429, 5xx, timeouts and connection errors; other 4xx would fail again
+    if isinstance(
+        error, (RetryableError, RateLimitError, InternalServerError, APIConnectionError)
+    ):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMCallGuard:
+    """
+    Wraps every provider call: circuit breaker check, token bucket, bounded
+    concurrency, then retries with full-jitter exponential backoff on
+    retryable errors (a provider Retry-After is honoured as a minimum).
+    A slot is only held while a request is on the wire, not while backing off.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        rate: float,
+        burst: int,
+        max_rate_wait: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        breaker: CircuitBreaker,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_rate_wait = max_rate_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = breaker
+        self._sync_slots = threading.BoundedSemaphore(max_in_flight)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _admit(self) -> Tuple[float, bool]:
+        """
+        Breaker + rate limit check for one attempt; returns the wait and
+        whether this attempt holds the half-open probe.
+        """
+        try:
+            probe = self.breaker.before_call()
+        except LLMUnavailableError:
+            self._count("rejected")
+            raise
+        try:
+            return self.bucket.reserve(self.max_rate_wait), probe
+        except LLMUnavailableError:
+            if probe:
+                self.breaker.release_probe()
+            self._count("rejected")
+            raise
+
+    def _failed(self, error: BaseException) -> bool:
+        """
+        Record a failed attempt; True if it is worth retrying.
+        """
+        if not is_retryable(error):
+            # the provider answered, it just didn't like the request
+            self.breaker.record_success()
+            return False
+        self.breaker.record_failure(error)
+        return True
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        self._count("calls")
+        attempt = 0
+        while True:
+            wait, _ = self._admit()
+            if wait:
+                time.sleep(wait)
+            try:
+                with self._sync_slots:
+                    self._count("attempts")
+                    self._count("in_flight")
+                    try:
+                        result = fn()
+                    finally:
+                        self._count("in_flight", -1)
+            except Exception as e:
+                if not self._failed(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff(attempt, e))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _get_async_slots(self) -> asyncio.Semaphore:
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_in_flight)
+        return self._async_slots
+
+    def reset_async(self) -> None:
+        # The semaphore binds to an event loop; drop it with the async client
+        self._async_slots = None
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._count("calls")
+        attempt = 0
+        while True:
+            wait, probe = self._admit()
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                async with self._get_async_slots():
+                    self._count("attempts")
+                    self._count("in_flight")
+                    try:
+                        result = await fn()
+                    finally:
+                        self._count("in_flight", -1)
+            except asyncio.CancelledError:
+                # cancelled before the provider answered: hand the probe back
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not self._failed(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self.backoff(attempt, e))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        tokens = self.bucket.available()
+        return {
+            "circuit": self.breaker.snapshot(),
+            "rate_limit": {
+                "rate_per_second": self.bucket.rate,
+                "burst": self.bucket.burst,
+                "tokens_available": None if tokens == float("inf") else round(tokens, 2),
+            },
+            "concurrency": {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+            },
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
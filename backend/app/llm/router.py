@@ -0,0 +1,266 @@
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional
+
+from app.llm.providers import Completion, LLMProvider
+from app.llm.resilience import LLMUnavailableError
+
+
+class NoProviderError(LLMUnavailableError):
+    pass
+
+
+class RoutedCompletion(NamedTuple):
+    text: str
+    model: str
+    provider: str
+    hedged: bool  # answered by the hedge request, not the primary
+
+
+class RoutedStream(NamedTuple):
+    chunks: AsyncIterator[str]  # text deltas
+    model: str
+    provider: str
+
+
+class LLMRouter:
+    """
+    Sends each call to the fastest healthy backend and falls back to the
+    next one when it fails.
+
+    - Ranking: healthy backends (circuit letting calls through, rolling
+      error rate under max_error_rate) by rolling p50 latency; backends
+      with no samples yet rank first so they get measured. Unhealthy
+      backends are kept at the end as a last resort.
+    - Recovery: samples expire after stats_max_age seconds, so a backend
+      ranked last (failing or slow) drops back to unmeasured and gets
+      traffic again, and an open circuit counts as healthy once its reset
+      timeout has passed, so that traffic reaches it as the probe.
+    - Hedging (async only): if the primary hasn't answered after the hedge
+      delay, the same request goes to the next backend too and the first
+      success wins; the loser is cancelled. The delay is fixed
+      (hedge_delay_ms) or, with hedge_delay_ms=None, the primary's rolling
+      p95 once it has min_samples.
+    - Fallback: when a request fails on every backend in flight, the next
+      ranked backend is tried, until the list runs out.
+    """
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        hedge_delay_ms: Optional[float] = None,
+        hedging: bool = True,
+        max_error_rate: float = 0.5,
+        min_samples: int = 20,
+        stats_max_age: Optional[float] = 60.0,
+    ):
+        self.providers = list(providers)
+        self.hedge_delay_ms = hedge_delay_ms
+        self.hedging = hedging
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        for provider in self.providers:
+            provider.stats.max_age = stats_max_age
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.wins: Dict[str, int] = {p.name: 0 for p in self.providers}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _won(self, provider: LLMProvider) -> None:
+        with self._lock:
+            self.wins[provider.name] = self.wins.get(provider.name, 0) + 1
+
+    def is_healthy(self, provider: LLMProvider) -> bool:
+        if not provider.guard.breaker.allows_call():
+            return False
+        stats = provider.stats
+        return (
+            stats.sample_count() < self.min_samples
+            or stats.error_rate() < self.max_error_rate
+        )
+
+    def ranked(self, json_mode: bool = False) -> List[LLMProvider]:
+        candidates = [p for p in self.providers if p.json_mode or not json_mode]
+        healthy = [p for p in candidates if self.is_healthy(p)]
+        healthy.sort(key=lambda p: p.stats.percentile(0.5) or 0.0)
+        return healthy + [p for p in candidates if p not in healthy]
+
+    def supports_json_mode(self) -> bool:
+        return any(p.json_mode for p in self.providers)
+
+    def backend_signature(self) -> str:
+        """
+        The configured backends as "name=model" pairs in a fixed order,
+        so anything keyed on it changes with the provider set.
+        """
+        return ",".join(sorted(f"{p.name}={p.model}" for p in self.providers))
+
+    def hedge_delay(self, primary: LLMProvider) -> Optional[float]:
+        """
+        Seconds to wait on the primary before hedging, or None for no hedge.
+        """
+        if not self.hedging:
+            return None
+        if self.hedge_delay_ms is not None:
+            return self.hedge_delay_ms / 1000
+        if primary.stats.sample_count() < self.min_samples:
+            return None
+        return primary.stats.percentile(0.95) / 1000
+
+    def chat(
+        self, messages: List[Dict[str, str]], json_mode: bool = False, **kwargs: Any
+    ) -> RoutedCompletion:
+        """
+        Blocking call with fallback (no hedging: a blocked thread can't be
+        cancelled, so a hedge would only add load).
+        """
+        candidates = self.ranked(json_mode)
+        if not candidates:
+            raise NoProviderError("No LLM provider configured")
+        last_error: Optional[Exception] = None
+        for i, provider in enumerate(candidates):
+            if i:
+                self._count("fallbacks")
+            start = time.perf_counter()
+            try:
+                completion = provider.chat(messages, **kwargs)
+            except LLMUnavailableError as e:
+                last_error = e
+                continue
+            except Exception as e:
+                provider.stats.record((time.perf_counter() - start) * 1000, False)
+                last_error = e
+                continue
+            provider.stats.record((time.perf_counter() - start) * 1000, True)
+            self._won(provider)
+            return RoutedCompletion(completion.text, completion.model, provider.name, False)
+        raise last_error
+
+    async def _timed(
+        self, provider: LLMProvider, messages: List[Dict[str, str]], kwargs: Dict[str, Any]
+    ) -> Completion:
+        start = time.perf_counter()
+        try:
+            completion = await provider.chat_async(messages, **kwargs)
+        except (asyncio.CancelledError, LLMUnavailableError):
+            # hedge loser, or never sent (circuit open, probe taken, local
+            # rate limit): says nothing about the backend
+            raise
+        except Exception:
+            provider.stats.record((time.perf_counter() - start) * 1000, False)
+            raise
+        provider.stats.record((time.perf_counter() - start) * 1000, True)
+        return completion
+
+    async def chat_async(
+        self, messages: List[Dict[str, str]], json_mode: bool = False, **kwargs: Any
+    ) -> RoutedCompletion:
+        queue = self.ranked(json_mode)
+        if not queue:
+            raise NoProviderError("No LLM provider configured")
+
+        delay = self.hedge_delay(queue[0])
+        pending: Dict[asyncio.Task, LLMProvider] = {}
+        hedge_task: Optional[asyncio.Task] = None
+        last_error: Optional[Exception] = None
+
+        def launch() -> asyncio.Task:
+            provider = queue.pop(0)
+            task = asyncio.ensure_future(self._timed(provider, messages, kwargs))
+            pending[task] = provider
+            return task
+
+        launch()
+        try:
+            while pending:
+                can_hedge = delay is not None and hedge_task is None and queue
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    self._count("hedges")
+                    hedge_task = launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        completion = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    hedged = task is hedge_task
+                    if hedged:
+                        self._count("hedge_wins")
+                    self._won(provider)
+                    return RoutedCompletion(
+                        completion.text, completion.model, provider.name, hedged
+                    )
+
+                if not pending and queue:
+                    self._count("fallbacks")
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_async(
+        self, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> RoutedStream:
+        """
+        Open a streamed completion on the fastest healthy backend, falling
+        back while no token has been sent yet. Not hedged: a second stream
+        would double the tokens paid for on every slow start. Latency
+        stats record the time to open the stream.
+        """
+        candidates = self.ranked()
+        if not candidates:
+            raise NoProviderError("No LLM provider configured")
+        last_error: Optional[Exception] = None
+        for i, provider in enumerate(candidates):
+            if i:
+                self._count("fallbacks")
+            start = time.perf_counter()
+            try:
+                chunks = await provider.stream_async(messages, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except LLMUnavailableError as e:
+                last_error = e
+                continue
+            except Exception as e:
+                provider.stats.record((time.perf_counter() - start) * 1000, False)
+                last_error = e
+                continue
+            provider.stats.record((time.perf_counter() - start) * 1000, True)
+            self._won(provider)
+            return RoutedStream(chunks, provider.model, provider.name)
+        raise last_error
+
+    async def aclose(self) -> None:
+        for provider in self.providers:
+            await provider.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        ranked = self.ranked()
+        return {
+            "order": [p.name for p in ranked],
+            "hedging": self.hedging,
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "wins": dict(self.wins),
+            "providers": [
+                {**p.snapshot(), "healthy": self.is_healthy(p)} for p in self.providers
+            ],
+        }
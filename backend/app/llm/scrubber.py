@@ -1,28 +1,394 @@
+import hashlib
 import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
-# Very simple regex-based PII scrubber
+# Very simple regex-based PII scrubber.
+#
+# Patterns start with a character class rather than \b so the regex engine
+# can reject most positions on the first character: "\d(?<!\w\d)" is
+# "\b\d" and "[A-Z](?<!\w[A-Z])" is "\b[A-Z]". The email local part may
+# only start where a run of local-part characters starts, so a long run
+# without an "@" is tried once instead of once per character (the effect
+# of a possessive quantifier, which needs Python 3.11).
 SENSITIVE_PATTERNS = [
     # Aadhaar-like 12 digit numbers
-    r"\b\d{4}\s?\d{4}\s?\d{4}\b",
+    r"\d(?<!\w\d)\d{3}\s?\d{4}\s?\d{4}\b",
     # 10-digit phone numbers
-    r"\b\d{10}\b",
+    r"\d(?<!\w\d)\d{9}\b",
     # Email addresses
-    r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    r"(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
     # PAN-like pattern (ABCDE1234F)
-    r"\b[A-Z]{5}\d{4}[A-Z]\b",
+    r"[A-Z](?<!\w[A-Z])[A-Z]{4}\d{4}[A-Z]\b",
 ]
 
+# Names reported in ScrubMatch.kind, same order as SENSITIVE_PATTERNS
+PATTERN_NAMES = ["aadhaar", "phone", "email", "pan"]
+
+# Something each pattern cannot match without. Texts that lack it skip the
+# pattern entirely, which is most prompts for most patterns.
+PATTERN_PREFILTERS = [r"\d", r"\d", r"@", r"\d"]
+
+REDACTION = "[REDACTED]"
+
+# Characters held back between stream chunks. A match longer than this
+# that straddles a chunk boundary can't be recognised (emails max out at
+# 254 characters, the other patterns are much shorter).
+DEFAULT_STREAM_OVERLAP = 256
+
+
+class ScrubMatch(NamedTuple):
+    start: int
+    end: int  # exclusive
+    kind: str  # one of PATTERN_NAMES
+    value: str
+
+
+class ScrubResult(NamedTuple):
+    text: str
+    matches: List[ScrubMatch]
+
+
+class Redaction(NamedTuple):
+    """
+    Prompt with each PII value replaced by a numbered placeholder such as
+    [EMAIL_1], plus placeholder -> original value so the LLM's answer can
+    be restored locally.
+    """
+
+    text: str
+    mapping: Dict[str, str]
+
+
+class Scrubber:
+    """
+    All PII patterns compiled into one alternation, so a text is scanned
+    and copied once instead of once per pattern, and every hit can be
+    reported with its kind and span.
+
+    At a given position the earlier pattern in the list wins, and matches
+    never overlap. Unlike the old pattern-by-pattern re.sub chain, a later
+    pattern can no longer match inside text an earlier one already
+    redacted (e.g. the digits inside "john.9876543210@corp.com" are now
+    part of the email match instead of being redacted on their own).
+
+    The alternation has no capture groups (they make CPython's re markedly
+    slower); the kind is worked out per hit instead. Patterns whose
+    prefilter does not occur in the text are left out of the alternation.
+    """
+
+    def __init__(self, patterns: List[Tuple[str, str, Optional[str]]]):
+        self.patterns = list(patterns)
+        self._singles = [re.compile(pattern) for _, pattern, _ in self.patterns]
+        self._prefilters: List[Tuple[Optional[re.Pattern], Tuple[int, ...]]] = []
+        by_prefilter: dict = {}
+        for i, (_, _, prefilter) in enumerate(self.patterns):
+            by_prefilter.setdefault(prefilter, []).append(i)
+        for prefilter, indexes in by_prefilter.items():
+            compiled = re.compile(prefilter) if prefilter else None
+            self._prefilters.append((compiled, tuple(indexes)))
+        # enabled pattern indexes -> compiled alternation (at most 2^prefilters)
+        self._alternations: dict = {}
+
+    def _alternation(self, enabled: Tuple[int, ...]) -> Optional[re.Pattern]:
+        if not enabled:
+            return None
+        regex = self._alternations.get(enabled)
+        if regex is None:
+            regex = re.compile("|".join(self.patterns[i][1] for i in enabled))
+            self._alternations[enabled] = regex
+        return regex
+
+    def _regex_for(self, text: str) -> Optional[re.Pattern]:
+        enabled: List[int] = []
+        for prefilter, indexes in self._prefilters:
+            if prefilter is None or prefilter.search(text):
+                enabled.extend(indexes)
+        return self._alternation(tuple(sorted(enabled)))
+
+    def _kind(self, text: str, start: int) -> str:
+        # the alternation picks the first pattern that matches at start
+        for (name, _, _), single in zip(self.patterns, self._singles):
+            if single.match(text, start):
+                return name
+        return ""
+
+    def find(self, text: str) -> List[ScrubMatch]:
+        """
+        Return every PII hit in text, in order.
+        """
+        regex = self._regex_for(text)
+        if regex is None:
+            return []
+        return [
+            ScrubMatch(m.start(), m.end(), self._kind(text, m.start()), m.group())
+            for m in regex.finditer(text)
+        ]
+
+    def scrub(self, text: str, replacement: str = REDACTION) -> str:
+        if not text:
+            return text
+        regex = self._regex_for(text)
+        if regex is None:
+            return text
+        return regex.sub(replacement, text)
+
+    def scrub_with_matches(
+        self, text: str, replacement: str = REDACTION
+    ) -> ScrubResult:
+        """
+        Scrub text and also return what was redacted where (spans refer
+        to the original text).
+        """
+        regex = self._regex_for(text) if text else None
+        if regex is None:
+            return ScrubResult(text, [])
+
+        matches: List[ScrubMatch] = []
+        parts: List[str] = []
+        pos = 0
+        for m in regex.finditer(text):
+            matches.append(
+                ScrubMatch(m.start(), m.end(), self._kind(text, m.start()), m.group())
+            )
+            parts.append(text[pos:m.start()])
+            parts.append(replacement)
+            pos = m.end()
+        if not matches:
+            return ScrubResult(text, matches)
+        parts.append(text[pos:])
+        return ScrubResult("".join(parts), matches)
+
+    def _drain(
+        self,
+        context: str,
+        pending: str,
+        final: bool,
+        overlap: int,
+        replacement: str,
+    ) -> Tuple[str, str, str]:
+        """
+        Scrub as much of pending as is safe to emit.
+        context is the last already-emitted character, kept so \\b
+        boundaries at the start of pending see the real previous char.
+        Returns (emitted_text, new_context, new_pending).
+        """
+        text = context + pending
+        start = len(context)
+        # matches ending after this point may still grow with the next chunk
+        safe_end = len(text) if final else len(text) - overlap
+        cut = safe_end
+
+        parts: List[str] = []
+        pos = start
+        regex = self._regex_for(text)
+        for m in regex.finditer(text, start) if regex is not None else ():
+            if m.end() > safe_end:
+                cut = max(pos, min(m.start(), safe_end))
+                break
+            parts.append(text[pos:m.start()])
+            parts.append(replacement)
+            pos = m.end()
+        cut = max(cut, pos)
+        parts.append(text[pos:cut])
+
+        new_context = text[cut - 1:cut] if cut > 0 else ""
+        return "".join(parts), new_context, text[cut:]
+
+    def scrub_stream(
+        self,
+        chunks: Iterable[str],
+        overlap: int = DEFAULT_STREAM_OVERLAP,
+        replacement: str = REDACTION,
+    ) -> Iterator[str]:
+        """
+        Scrub an iterable of text chunks (a large file read piecewise, or
+        LLM tokens as they arrive) and yield scrubbed text.
+
+        The last `overlap` characters are held back until more input
+        arrives, so PII split across chunk boundaries is still caught.
+        Concatenating the output equals scrub() of the full text as long
+        as no single match is longer than `overlap`.
+        """
+        context = ""
+        pending = ""
+        for chunk in chunks:
+            if not chunk:
+                continue
+            pending += chunk
+            if len(pending) <= overlap:
+                continue
+            out, context, pending = self._drain(
+                context, pending, False, overlap, replacement
+            )
+            if out:
+                yield out
+
+        if pending:
+            out, _, _ = self._drain(context, pending, True, overlap, replacement)
+            if out:
+                yield out
+
+
+_default_scrubber = Scrubber(
+    list(zip(PATTERN_NAMES, SENSITIVE_PATTERNS, PATTERN_PREFILTERS))
+)
+
+
+def get_scrubber() -> Scrubber:
+    return _default_scrubber
+
 
 def scrub_text(text: str) -> str:
     """
     Replace obvious PII patterns with [REDACTED].
     This keeps us safe when using external LLMs.
     """
-    if not text:
+    return _default_scrubber.scrub(text)
+
+
+def find_pii(text: str) -> List[ScrubMatch]:
+    """
+    Return every PII match (kind + span) without modifying the text.
+    """
+    return _default_scrubber.find(text) if text else []
+
+
+def scrub_text_with_matches(text: str) -> ScrubResult:
+    """
+    Like scrub_text(), but also returns the matches that were redacted.
+    """
+    return _default_scrubber.scrub_with_matches(text)
+
+
+def scrub_stream(
+    chunks: Iterable[str],
+    overlap: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Streaming variant of scrub_text() for multi-MB inputs and token streams.
+    """
+    return _default_scrubber.scrub_stream(
+        chunks, overlap=DEFAULT_STREAM_OVERLAP if overlap is None else overlap
+    )
+
+
+def redact_with_map(text: str) -> Redaction:
+    """
+    Replace each distinct PII value with a numbered placeholder
+    ([EMAIL_1], [PHONE_2], ...). Repeated values reuse their placeholder.
+    """
+    result = _default_scrubber.scrub_with_matches(text)
+    if not result.matches:
+        return Redaction(text, {})
+
+    by_value: Dict[str, str] = {}
+    redacted = apply_placeholders(text, result.matches, by_value)
+    return Redaction(redacted, {ph: value for value, ph in by_value.items()})
+
+
+def apply_placeholders(
+    text: str, matches: List[ScrubMatch], by_value: Dict[str, str]
+) -> str:
+    """
+    Replace matches with numbered placeholders. by_value (value ->
+    placeholder) is updated in place, so sharing it across several texts
+    numbers their placeholders as one.
+    """
+    parts: List[str] = []
+    pos = 0
+    for m in matches:
+        placeholder = by_value.get(m.value)
+        if placeholder is None:
+            placeholder = f"[{m.kind.upper()}_{len(by_value) + 1}]"
+            by_value[m.value] = placeholder
+        parts.append(text[pos:m.start])
+        parts.append(placeholder)
+        pos = m.end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def unredact(text: Optional[str], mapping: Dict[str, str]) -> Optional[str]:
+    """
+    Put the original values back into text produced from a redacted prompt.
+    """
+    if not text or not mapping:
         return text
+    pattern = re.compile("|".join(re.escape(ph) for ph in mapping))
+    return pattern.sub(lambda m: mapping[m.group()], text)
+
+
+class StreamUnredactor:
+    """
+    unredact() for text that arrives in pieces (a token stream): a trailing
+    "[..." that may still become a placeholder is held back until it is
+    complete or too long to be one.
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping = mapping
+        self._longest = max((len(p) for p in mapping), default=0)
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        if not self.mapping:
+            return text
+        self._pending += text
+        cut = self._pending.rfind("[")
+        if (
+            cut == -1
+            or "]" in self._pending[cut:]
+            or len(self._pending) - cut >= self._longest
+        ):
+            cut = len(self._pending)
+        out, self._pending = self._pending[:cut], self._pending[cut:]
+        return unredact(out, self.mapping) or ""
+
+    def flush(self) -> str:
+        out, self._pending = self._pending, ""
+        return unredact(out, self.mapping) or ""
+
+
+class RedactionCache:
+    """
+    Bounded LRU of prompt hash -> Redaction, for templated prompts that
+    are sent over and over.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Redaction]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def redact(self, text: str) -> Redaction:
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        redaction = redact_with_map(text)
+        with self._lock:
+            self.misses += 1
+            self._data[key] = redaction
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return redaction
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
 
-    scrubbed = text
-    for pattern in SENSITIVE_PATTERNS:
-        scrubbed = re.sub(pattern, "[REDACTED]", scrubbed)
 
-    return scrubbed
+redaction_cache = RedactionCache()
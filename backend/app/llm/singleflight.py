@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+def _copy_result(result: Any) -> Any:
+    # Each caller gets its own dict (callers add / mutate keys)
+    if isinstance(result, dict):
+        return {
+            k: list(v) if isinstance(v, list) else v for k, v in result.items()
+        }
+    return result
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls from threads: the first caller for
+    a key runs fn, callers arriving while it is in flight block on its
+    result instead of making their own call. Nothing is remembered once
+    the call finishes (that is the response cache's job).
+
+    do() returns (result, shared); shared is True for callers that were
+    merged into another caller's call.
+    """
+
+    def __init__(self) -> None:
+        self.leaders = 0
+        self.merged = 0
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+                self.leaders += 1
+            else:
+                self.merged += 1
+
+        if not leader:
+            return _copy_result(fut.result()), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[Any]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop. The shared call runs as
+    its own task that every caller (leader included) awaits through
+    asyncio.shield, so a caller that is cancelled (client went away) only
+    stops waiting; the call itself is cancelled once nobody waits for it.
+    """
+
+    def __init__(self) -> None:
+        self.leaders = 0
+        self.merged = 0
+        self._calls: Dict[str, _Flight] = {}
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        flight = self._calls.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(partial(self._finished, key, flight))
+            self.leaders += 1
+        else:
+            self.merged += 1
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # every caller gave up: stop the upstream call, and let the
+                # next caller start a fresh one instead of joining this
+                if self._calls.get(key) is flight:
+                    del self._calls[key]
+                flight.task.cancel()
+        return (_copy_result(result) if shared else result), shared
+
+    def _finished(self, key: str, flight: _Flight, task: "asyncio.Future[Any]") -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when nobody was waiting
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+sync_flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+
+
+def coalescing_stats() -> Dict[str, int]:
+    leaders = sync_flights.leaders + async_flights.leaders
+    merged = sync_flights.merged + async_flights.merged
+    return {
+        "upstream_calls": leaders,
+        "merged_calls": merged,
+        "in_flight": sync_flights.in_flight() + async_flights.in_flight(),
+        "sync_merged": sync_flights.merged,
+        "async_merged": async_flights.merged,
+    }
@@ -1,12 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.config import settings
 from app.db.database import init_db
+from app.db.writer import batch_writer
+from app.llm.client import close_async_client
+from app.llm.mapreduce import check_large_input_budget
+from app.policy.engine import get_policy_table
 from app.routes.agent import router as agent_router
 from app.routes.logs import router as logs_router
 from app.routes.actions import router as actions_router
 from app.routes.approvals import router as approvals_router
 from app.routes.data import router as data_router
+from app.routes.trust import router as trust_router
+from app.routes.jobs import router as jobs_router
+from app.routes.policy import router as policy_router
+from app.routes.llm import router as llm_router
+from app.routes.pagination import NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER
+from app.trust.evaluator import shutdown_batch_pool
 
 
 app = FastAPI(title="AI Control Tower")
@@ -24,13 +35,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # pagination cursors of the list routes, readable by the dashboard
+    expose_headers=[NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER],
 )
 
 
 @app.on_event("startup")
 def on_startup():
+    # Fail fast if large-input map prompts can't fit the policy's budget
+    check_large_input_budget(
+        settings.LARGE_INPUT_CHUNK_TOKENS, get_policy_table().budget
+    )
     # Create tables if not exist
     init_db()
+    if settings.DB_WRITE_BATCHING:
+        batch_writer.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Flush batched DB writes
+    batch_writer.stop()
+    # Stop batch evaluation worker processes
+    shutdown_batch_pool()
+    # Close pooled LLM connections
+    await close_async_client()
 
 
 # ROUTERS
@@ -39,6 +68,10 @@ app.include_router(logs_router)
 app.include_router(actions_router)
 app.include_router(approvals_router)
 app.include_router(data_router)
+app.include_router(trust_router)
+app.include_router(jobs_router)
+app.include_router(policy_router)
+app.include_router(llm_router)
 
 
 @app.get("/")
@@ -1,96 +1,287 @@
-from typing import List, Literal, Dict
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, List, Literal, Dict, NamedTuple, Optional, Tuple
 
-from ..trust.evaluator import find_risk_flags, classify_risk_level
+from ..core.config import settings
+from ..llm.budget import BUDGET_STRATEGIES, TokenBudget
+from ..trust.evaluator import (
+    ScanContext,
+    build_scan_context,
+    classify_risk_level,
+    find_risk_flags,
+    get_risk_matcher,
+    shutdown_batch_pool,
+)
+
+logger = logging.getLogger(__name__)
 
 PolicyDecision = Literal["allow", "needs_approval", "block"]
 
+VALID_DECISIONS = ("allow", "needs_approval", "block")
+
 
 class PolicyConfig:
     """
     Simple global policy config v1.
-    Later this can come from DB / UI.
+    Decision rules live in the rules file (settings.POLICY_RULES_PATH);
+    its optional "budget" block overrides the token budget defaults below.
     """
 
-    # Max allowed tokens for responses (we don't enforce at LLM yet, just for info)
+    # Max tokens the LLM may generate per call (passed upstream as max_tokens)
     max_tokens: int = 512
+    # Max estimated prompt tokens sent upstream
+    max_input_tokens: int = 3000
+    # What to do with longer prompts (see app.llm.budget.BUDGET_STRATEGIES)
+    input_overflow_strategy: str = "truncate_middle"
 
-    # Whether high-risk prompts require human approval
-    require_approval_for_high_risk: bool = True
 
-    # Whether destructive actions are completely blocked
-    block_destructive_actions: bool = True
+class PolicyError(Exception):
+    pass
 
-    # Whether security-sensitive operations require approval
-    require_approval_for_security_sensitive: bool = True
 
-    # Whether accessing personal / financial data requires approval
-    require_approval_for_sensitive_data: bool = True
+class PolicyOutcome(NamedTuple):
+    decision: str
+    reasons: Tuple[str, ...]
+    rule_id: str  # "<rule id>@<table version>"
+    risk_level: str
 
 
-def evaluate_policies(prompt: str, response: str) -> Dict:
-    """
-    Run simple policy logic on the prompt/response.
-    Returns a dict with:
-      - decision: "allow" | "needs_approval" | "block"
-      - reasons: list of strings
-      - flags: risk flags (reuse from trust layer)
+class PolicyTable:
     """
+    Policy rules compiled into a decision table.
 
-    flags = find_risk_flags(prompt + " " + (response or ""))
-    risk_level = classify_risk_level(flags)
-    reasons: List[str] = []
-    decision: PolicyDecision = "allow"
-
-    # If destructive actions and policy says block -> BLOCK
-    if "destructive_actions" in flags and PolicyConfig.block_destructive_actions:
-        decision = "block"
-        reasons.append(
-            "Prompt/response appears to contain destructive actions, "
-            "and policy is configured to block such requests."
-        )
+    Flags come from a fixed set (the risk keyword categories) and the risk
+    level is a function of the flags, so every possible outcome can be
+    precomputed: entry i is the outcome for the flag set whose bitmask is i.
+    Evaluating a request is then a single list index.
+    """
 
-    # If security-sensitive and not already blocked -> NEEDS APPROVAL
-    if (
-        decision == "allow"
-        and "security_sensitive" in flags
-        and PolicyConfig.require_approval_for_security_sensitive
+    def __init__(
+        self,
+        spec: Dict[str, Any],
+        source: str = "<memory>",
+        mtime: Optional[int] = None,
     ):
-        decision = "needs_approval"
-        reasons.append(
-            "Security-sensitive patterns detected (e.g., passwords, tokens). "
-            "Policy requires human approval."
-        )
+        self.spec = spec
+        self.source = source
+        # st_mtime_ns of the rules file the spec was read from
+        self.mtime = mtime
+        self.flag_order: Tuple[str, ...] = get_risk_matcher().flag_order
+        # risk categories the spec failed to recompile against
+        self.rejected_flag_order: Optional[Tuple[str, ...]] = None
+        self.flag_bits: Dict[str, int] = {
+            flag: 1 << i for i, flag in enumerate(self.flag_order)
+        }
 
-    # If privacy/financial-sensitive and not already decided -> NEEDS APPROVAL
-    sensitive_data_rules = {"privacy_sensitive", "financial_sensitive"}
-    if (
-        decision == "allow"
-        and PolicyConfig.require_approval_for_sensitive_data
-        and any(rule in sensitive_data_rules for rule in flags)
-    ):
-        decision = "needs_approval"
-        reasons.append(
-            "Access to personal or financial data detected. "
-            "Policy requires human approval before proceeding."
+        digest = hashlib.sha256(
+            json.dumps(spec, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:8]
+        self.version = f"v{spec.get('version', 0)}-{digest}"
+
+        rules = [r for r in spec.get("rules", []) if r.get("enabled", True)]
+        default = spec.get("default") or {
+            "id": "default_allow",
+            "decision": "allow",
+            "reason": "No policy violations detected. Request is allowed.",
+        }
+        for rule in rules + [default]:
+            if rule.get("decision") not in VALID_DECISIONS:
+                raise PolicyError(
+                    f"Rule {rule.get('id')!r} has invalid decision {rule.get('decision')!r}"
+                )
+            unknown = set(rule.get("when_any_flag", [])) - set(self.flag_order)
+            if unknown:
+                raise PolicyError(
+                    f"Rule {rule.get('id')!r} references unknown flags: {sorted(unknown)}"
+                )
+
+        self.budget = self._parse_budget(spec.get("budget") or {})
+
+        self.entries: List[PolicyOutcome] = [
+            self._decide(mask, rules, default)
+            for mask in range(1 << len(self.flag_order))
+        ]
+
+    @staticmethod
+    def _parse_budget(block: Dict[str, Any]) -> TokenBudget:
+        budget = TokenBudget(
+            max_input_tokens=int(block.get("max_input_tokens", PolicyConfig.max_input_tokens)),
+            max_output_tokens=int(block.get("max_output_tokens", PolicyConfig.max_tokens)),
+            strategy=block.get("strategy", PolicyConfig.input_overflow_strategy),
         )
+        if budget.strategy not in BUDGET_STRATEGIES:
+            raise PolicyError(
+                f"Unknown budget strategy {budget.strategy!r} "
+                f"(expected one of {', '.join(BUDGET_STRATEGIES)})"
+            )
+        if budget.max_input_tokens <= 0 or budget.max_output_tokens <= 0:
+            raise PolicyError("Token budgets must be positive")
+        return budget
 
-    # If still allow but overall risk is high -> NEEDS APPROVAL
-    if (
-        decision == "allow"
-        and risk_level == "high"
-        and PolicyConfig.require_approval_for_high_risk
-    ):
-        decision = "needs_approval"
-        reasons.append(
-            "Overall risk level assessed as HIGH. Policy requires human approval."
+    def _decide(
+        self, mask: int, rules: List[Dict[str, Any]], default: Dict[str, Any]
+    ) -> PolicyOutcome:
+        flags = {f for f, bit in self.flag_bits.items() if mask & bit}
+        risk_level = classify_risk_level(list(flags))
+
+        # First matching rule wins
+        for rule in rules:
+            any_flags = rule.get("when_any_flag")
+            levels = rule.get("when_risk_level")
+            if any_flags is not None and not flags & set(any_flags):
+                continue
+            if levels is not None and risk_level not in levels:
+                continue
+            return PolicyOutcome(
+                rule["decision"],
+                (rule["reason"],),
+                f"{rule['id']}@{self.version}",
+                risk_level,
+            )
+        return PolicyOutcome(
+            default["decision"],
+            (default["reason"],),
+            f"{default['id']}@{self.version}",
+            risk_level,
         )
 
-    if decision == "allow" and not reasons:
-        reasons.append("No policy violations detected. Request is allowed.")
+    def mask_for(self, flags: List[str]) -> int:
+        mask = 0
+        for f in flags:
+            mask |= self.flag_bits.get(f, 0)
+        return mask
+
+    def lookup(self, flags: List[str]) -> PolicyOutcome:
+        return self.entries[self.mask_for(flags)]
+
+
+def load_policy_table(path: Optional[str] = None) -> PolicyTable:
+    rules_path = Path(path or settings.POLICY_RULES_PATH)
+    try:
+        mtime = rules_path.stat().st_mtime_ns
+        spec = json.loads(rules_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise PolicyError(f"Cannot load policy rules from {rules_path}: {e}")
+    return PolicyTable(spec, source=str(rules_path), mtime=mtime)
+
+
+_active_table: PolicyTable = load_policy_table()
+_next_file_check = 0.0
+
+
+def _check_rules_file(table: PolicyTable) -> PolicyTable:
+    """
+    Recompile when the rules file changed on disk. A reload only swaps the
+    table of the process that ran it; this is how the other workers catch
+    up (within POLICY_RULES_CHECK_SECONDS).
+    """
+    global _next_file_check
+    interval = settings.POLICY_RULES_CHECK_SECONDS
+    if interval <= 0 or table.mtime is None:
+        return table
+    now = time.monotonic()
+    if now < _next_file_check:
+        return table
+    _next_file_check = now + interval
+    try:
+        mtime = Path(table.source).stat().st_mtime_ns
+    except OSError:
+        return table
+    if mtime == table.mtime:
+        return table
+    try:
+        return reload_policy_rules(table.source)
+    except PolicyError as e:
+        logger.warning("Keeping policy %s: %s", table.version, e)
+        # don't retry until the file changes again
+        table.mtime = mtime
+        return table
+
+
+def get_policy_table() -> PolicyTable:
+    table = _check_rules_file(_active_table)
+    # Keyword categories changed since the table was compiled
+    flag_order = get_risk_matcher().flag_order
+    if table.flag_order != flag_order and table.rejected_flag_order != flag_order:
+        try:
+            table = activate_policy_table(
+                PolicyTable(table.spec, source=table.source, mtime=table.mtime)
+            )
+        except PolicyError as e:
+            # rules no longer fit the categories; keep serving the old table
+            logger.warning(
+                "Keeping policy %s for risk categories %s: %s",
+                table.version, ", ".join(flag_order), e,
+            )
+            # don't retry until the categories change again
+            table.rejected_flag_order = flag_order
+    return table
+
+
+def activate_policy_table(table: PolicyTable) -> PolicyTable:
+    """
+    Swap in an already compiled table. Readers never lock: they pick up
+    either the old or the new table reference.
+    """
+    global _active_table
+    _active_table = table
+    # batch workers hold a copy of the old table
+    shutdown_batch_pool()
+    return table
+
+
+def reload_policy_rules(path: Optional[str] = None) -> PolicyTable:
+    """
+    Compile the rules file into a new table and swap it in.
+    On error (PolicyError) the current table stays active.
+    """
+    return activate_policy_table(load_policy_table(path))
+
+
+def evaluate_policies(
+    prompt: str,
+    response: str,
+    ctx: Optional[ScanContext] = None,
+) -> Dict:
+    """
+    Run the policy decision table on the prompt/response.
+    Returns a dict with:
+      - decision: "allow" | "needs_approval" | "block"
+      - reasons: list of strings
+      - flags: risk flags (reuse from trust layer)
+      - rule_id: versioned id of the rule that decided ("<rule>@<version>")
+
+    Pass the request's ScanContext to avoid scanning the text again.
+    """
+
+    if ctx is None:
+        ctx = build_scan_context(prompt, response)
+    outcome = get_policy_table().lookup(ctx.flags)
 
     return {
-        "decision": decision,
-        "reasons": reasons,
+        "decision": outcome.decision,
+        "reasons": list(outcome.reasons),
+        "risk_flags": list(ctx.flags),
+        "risk_level": ctx.risk_level,
+        "rule_id": outcome.rule_id,
+    }
+
+
+def check_policy_fast(prompt: str, response: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Dry-run policy check for pre-screening: flags only (the matcher stops
+    as soon as every category is seen, no spans), then one table lookup.
+    Same decision as evaluate_policies(); no LLM call, no DB access.
+    """
+    flags = find_risk_flags((prompt or "") + " " + (response or ""))
+    outcome = get_policy_table().lookup(flags)
+    return {
+        "decision": outcome.decision,
+        "reasons": list(outcome.reasons),
         "risk_flags": flags,
-        "risk_level": risk_level,
+        "risk_level": outcome.risk_level,
+        "rule_id": outcome.rule_id,
     }
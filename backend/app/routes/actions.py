@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
 from sqlmodel import Session, select
 from typing import List, Optional
@@ -7,6 +7,7 @@ import json
 
 from app.db.database import get_session
 from app.db.models import Action, AgentRun, Approval
+from app.routes.pagination import decode_cursor, page, paginate
 
 router = APIRouter(prefix="/actions", tags=["actions"])
 
@@ -76,36 +77,45 @@ def simulate_action(
 @router.get("/by-run/{agent_run_id}", response_model=List[ActionResponse])
 def get_actions_by_run(
     agent_run_id: int,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
     """
-    Get all actions associated with a given AgentRun.
+    Get the actions associated with a given AgentRun, newest first
+    (all of them unless limit is given; cursors as for /actions/all).
     """
-    statement = (
-        select(Action)
-        .where(Action.agent_run_id == agent_run_id)
-        .order_by(Action.created_at.desc())
+    key = decode_cursor(cursor) if cursor else None
+    statement = paginate(
+        select(Action).where(Action.agent_run_id == agent_run_id),
+        Action.created_at, Action.id, key, limit,
     )
-    actions = session.exec(statement).all()
+    actions = page(response, session.exec(statement).all(), key, limit)
     return [ActionResponse.from_action(a) for a in actions]
 
 
 @router.get("/all", response_model=List[ActionResponse])
 def get_all_actions(
+    response: Response,
     status: Optional[str] = None,
     limit: int = 100,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
     """
-    Get all actions, optionally filtered by status.
+    Get all actions, optionally filtered by status, newest first.
+    Page through older / newer actions with the X-Next-Cursor /
+    X-Prev-Cursor headers (see app/routes/pagination.py).
     """
     statement = select(Action)
 
     if status:
         statement = statement.where(Action.status == status)
 
-    statement = statement.order_by(Action.created_at.desc()).limit(limit)
-    actions = session.exec(statement).all()
+    key = decode_cursor(cursor) if cursor else None
+    statement = paginate(statement, Action.created_at, Action.id, key, limit)
+    actions = page(response, session.exec(statement).all(), key, limit)
     return [ActionResponse.from_action(a) for a in actions]
 
 
@@ -1,13 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, AsyncIterator, Callable, Dict, Literal, Optional, List, Tuple, TypeVar
+import anyio
+import asyncio
 import json
-from sqlmodel import Session
+import time
+from functools import partial
+from sqlmodel import Session, select
 
-from app.db.database import get_session
+from app.core.config import settings
+from app.core.timing import StageTimer
+from app.db.database import engine, get_session
+from app.db.flags import record_flags
 from app.db.models import AgentRun, Approval, Action
-from app.llm.client import safe_generate
-from app.trust.evaluator import evaluate_trust_and_risk
+from app.db.rollups import record_run, rollup_key
+from app.db.writer import batch_writer
+from app.llm.budget import BudgetExceeded, apply_budget
+from app.llm.cache import cached_generate_async
+from app.llm.client import (
+    extract_actions_async,
+    safe_generate_async,
+    safe_generate_combined_async,
+    safe_stream_async,
+)
+from app.llm.mapreduce import LargeInputError, run_map_reduce
+from app.llm.scrubber import Redaction, StreamUnredactor, redaction_cache, unredact
+from app.policy.engine import evaluate_policies, get_policy_table
+from app.routes.actions import ActionResponse
+from app.trust.evaluator import (
+    IncrementalRiskScanner,
+    RiskMatch,
+    ScanContext,
+    build_scan_context,
+    evaluate_trust_and_risk,
+    merge_scan_contexts,
+)
 
 router = APIRouter(
     prefix="/agent",
@@ -15,16 +44,36 @@ router = APIRouter(
 )
 
 
+ExtractionMode = Literal["inline", "background", "combined"]
+
+T = TypeVar("T")
+
+# Longest a client may block on GET /agent/run/{id}/actions?wait=...
+MAX_EXTRACTION_WAIT_SECONDS = 30.0
+
+# run id -> set when its background extraction finishes (this process only)
+_extraction_events: Dict[int, asyncio.Event] = {}
+
+
 class AgentRequest(BaseModel):
     prompt: str
+    # Defaults to settings.ACTION_EXTRACTION_MODE
+    action_extraction: Optional[ExtractionMode] = None
+    # Skip the LLM response cache lookup (the fresh answer is still cached)
+    bypass_cache: bool = False
+    # Map-reduce mode for inputs far over the token budget: chunk-level LLM
+    # calls, then one reducing call (not cached)
+    large_input: bool = False
 
 
 class AgentResponse(BaseModel):
     status: str
+    run_id: Optional[int] = None
     message: str
     prompt_sent: str
     response: Optional[str]
     model: Optional[str]
+    provider: Optional[str] = None
     trust_score: float
     risk_level: str
     risk_flags: List[str]
@@ -32,66 +81,357 @@ class AgentResponse(BaseModel):
     policy_reasons: List[str]
     policy_risk_level: str
     policy_risk_flags: List[str]
+    policy_rule_id: Optional[str] = None
     explainability: str
+    redactions: int = 0
+    # Token budget decision (estimated tokens, limits, truncation applied)
+    budget: Optional[Dict[str, Any]] = None
+    stage_timings_ms: Dict[str, float] = {}
+    # "done" once the run's actions are stored; "pending" while a background
+    # extraction is running (poll GET /agent/run/{run_id}/actions)
+    actions_status: str = "done"
+    cached: bool = False
+    # Shared the upstream LLM call of a concurrent identical request
+    coalesced: bool = False
+    # Large-input runs: one entry per chunk
+    chunks: Optional[List[Dict[str, Any]]] = None
+
+
+class ExtractionStatusResponse(BaseModel):
+    run_id: int
+    actions_status: Optional[str]
+    actions: List[ActionResponse]
+
+
+def _unredact_payload(value: Any, mapping: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return unredact(value, mapping)
+    if isinstance(value, dict):
+        return {k: _unredact_payload(v, mapping) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unredact_payload(v, mapping) for v in value]
+    return value
+
+
+def _store_actions(
+    session: Session,
+    run_id: int,
+    suggested_actions: List[Dict[str, Any]],
+    mapping: Dict[str, str],
+) -> int:
+    """
+    Add the LLM's suggested actions to the session (caller commits).
+    These are "pending" by default so a human / policy layer can approve or simulate.
+    """
+    added = 0
+    for act in suggested_actions:
+        if not isinstance(act, dict):
+            continue
+        a_type = act.get("type") or "other"
+        payload = act.get("payload") or {}
+        if not isinstance(payload, dict):
+            payload = {}
+        payload = _unredact_payload(payload, mapping)
+
+        action = Action(
+            agent_run_id=run_id,
+            type=a_type,
+            payload_json=json.dumps(payload),
+            status="pending",  # can be 'pending' until sandbox / approval
+        )
+        session.add(action)
+        added += 1
+    return added
+
+
+def _attach_actions(
+    run_id: int,
+    suggested_actions: List[Dict[str, Any]],
+    mapping: Dict[str, str],
+    status: str,
+    elapsed_ms: float,
+) -> None:
+    """
+    Store the result of a background extraction on its run.
+    """
+    with Session(engine) as session:
+        _store_actions(session, run_id, suggested_actions, mapping)
+        run = session.get(AgentRun, run_id)
+        if run is not None:
+            run.actions_status = status
+            timings = json.loads(run.stage_timings_json or "{}")
+            timings["extract_actions"] = round(elapsed_ms, 3)
+            run.stage_timings_json = json.dumps(timings)
+            session.add(run)
+        session.commit()
+
+
+async def _extract_actions_background(
+    run_id: int, prompt: str, answer: str, mapping: Dict[str, str]
+) -> None:
+    """
+    Runs after /agent/run has responded. prompt/answer are the redacted
+    texts the LLM saw; payloads are restored before they are stored.
+    """
+    status = "done"
+    start = time.perf_counter()
+    try:
+        actions = await extract_actions_async(prompt, answer, strict=True)
+    except Exception:
+        actions, status = [], "failed"
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    try:
+        await run_in_threadpool(
+            _attach_actions, run_id, actions, mapping, status, elapsed_ms
+        )
+    finally:
+        event = _extraction_events.pop(run_id, None)
+        if event is not None:
+            event.set()
+
+
+def _write_run(
+    session: Session,
+    run: AgentRun,
+    needs_approval: bool,
+    suggested_actions: List[Dict[str, Any]],
+    mapping: Dict[str, str],
+    timer: Optional[StageTimer] = None,
+) -> int:
+    """
+    Add one run with its Approval / Actions to the session (caller
+    commits, so the request is one transaction) and return the run id.
+    With a timer, its stage timings are stored on the run last, so the
+    open "persist" stage is recorded up to the commit.
+
+    A copy of run is inserted, never run itself: if the transaction is
+    rolled back (the batch writer then retries each write on its own),
+    the retry inserts a fresh row instead of an object that still holds
+    the rolled-back id.
+    """
+    # 4) Store AgentRun (flush to get its id), its searchable flags and
+    #    its count in the analytics rollup
+    run = AgentRun(**run.model_dump(exclude={"id"}))
+    session.add(run)
+    session.flush()
+    record_flags(session, run.id, run.created_at, json.loads(run.risk_flags_json or "[]"))
+    record_run(session, run.created_at, rollup_key(run.risk_level, run.policy_decision, run.model))
+
+    # 5) If risky or blocked, create an Approval entry
+    if needs_approval:
+        approval = Approval(
+            agent_run_id=run.id,
+            status="pending",
+        )
+        session.add(approval)
+
+    # 6) Store any suggested actions from the LLM
+    _store_actions(session, run.id, suggested_actions, mapping)
+
+    if timer is not None:
+        # an UPDATE in the same transaction, once the writes are done
+        run.stage_timings_json = json.dumps(timer.as_dict(running=True))
+    return run.id
+
+
+def _persist_run(
+    session: Optional[Session],
+    run: AgentRun,
+    needs_approval: bool,
+    suggested_actions: List[Dict[str, Any]],
+    mapping: Dict[str, str],
+    timer: Optional[StageTimer] = None,
+) -> int:
+    """
+    Blocking DB writes for one run, in a single commit; called from the
+    threadpool so the event loop keeps serving other requests meanwhile.
+    Without a session (the request's is gone once a stream ends) a
+    fresh one is used.
+    """
+    if session is None:
+        with Session(engine) as own_session:
+            return _persist_run(
+                own_session, run, needs_approval, suggested_actions, mapping, timer
+            )
+    run_id = _write_run(session, run, needs_approval, suggested_actions, mapping, timer)
+    session.commit()
+    return run_id
+
+
+async def _save_run(
+    session: Optional[Session],
+    run: AgentRun,
+    needs_approval: bool,
+    suggested_actions: List[Dict[str, Any]],
+    mapping: Dict[str, str],
+    timer: Optional[StageTimer] = None,
+) -> int:
+    """
+    Persist a run and return its id: through the batch writer (shared
+    transaction with concurrent requests) when DB_WRITE_BATCHING is on,
+    otherwise in the threadpool. Call it inside the timer's "persist"
+    stage: the stored timings include that stage up to the commit.
+    """
+    if batch_writer.running:
+        try:
+            future = batch_writer.submit(
+                partial(
+                    _write_run,
+                    run=run,
+                    needs_approval=needs_approval,
+                    suggested_actions=suggested_actions,
+                    mapping=mapping,
+                    timer=timer,
+                )
+            )
+        except RuntimeError:
+            future = None  # writer stopped meanwhile (shutdown)
+        if future is not None:
+            return await asyncio.wrap_future(future)
+    return await run_in_threadpool(
+        _persist_run, session, run, needs_approval, suggested_actions, mapping, timer
+    )
+
+
+async def _scan_work(size: int, fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run a scrub / scan step inline for inputs up to INLINE_SCAN_MAX_CHARS
+    (cheaper than a threadpool hop), in the threadpool above that.
+    """
+    if size <= settings.INLINE_SCAN_MAX_CHARS:
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+
+def _evaluate(
+    prompt: str,
+    llm_text: Optional[str],
+    llm_error: Optional[str],
+    prompt_scan: Optional[ScanContext] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Trust & risk, then policy, on one scan of the prompt / answer
+    (prompt_scan: an existing scan of the prompt, e.g. per-chunk scans).
+    """
+    if prompt_scan is None:
+        scan = build_scan_context(prompt, llm_text)
+    else:
+        scan = merge_scan_contexts([prompt_scan, build_scan_context(None, llm_text)])
+    tr = evaluate_trust_and_risk(prompt, llm_text, llm_error, ctx=scan)
+    policy = evaluate_policies(prompt, llm_text or "", ctx=scan)
+    return tr, policy
 
 
 @router.post("/run", response_model=AgentResponse)
-def run_agent(req: AgentRequest, session: Session = Depends(get_session)):
+async def run_agent(
+    req: AgentRequest,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+):
     """
-    Main agent entrypoint:
-      1) Call LLM via safe_generate
+    Main agent entrypoint (async end to end):
+      0) Redact PII from the prompt (cached per prompt hash), then fit it
+         into the policy's token budget (413 if the policy rejects it)
+      1) Call LLM via safe_generate_async (behind the response cache), then
+         restore redacted values locally
       2) Evaluate trust & risk
-      3) Apply simple policy logic
-      4) Store AgentRun (+ Approval if needed)
+      3) Apply policy engine
+      4) Store AgentRun (+ Approval / Actions) in the threadpool
+
+    With large_input, steps 0-1 become a map-reduce: the prompt is split on
+    paragraph/sentence boundaries, chunks are scrubbed and risk-scanned in
+    parallel, summarised by bounded concurrent LLM calls and reduced by one
+    final call; the chunk scans are merged for step 2.
+
+    Suggested actions depend on action_extraction:
+      - inline: second LLM call before responding
+      - background: respond first; actions are attached to the run later
+        (actions_status "pending" until then)
+      - combined: one structured LLM call returns answer + actions
     """
     prompt = req.prompt.strip()
     if not prompt:
         raise HTTPException(status_code=400, detail="Prompt cannot be empty")
 
-    # 1) Call LLM
-    llm_result = safe_generate(prompt)
-    llm_text = llm_result.get("text")
+    mode = req.action_extraction or settings.ACTION_EXTRACTION_MODE
+    timer = StageTimer()
+
+    if mode == "combined":
+        generate = safe_generate_combined_async
+    elif mode == "background":
+        generate = partial(safe_generate_async, extract_actions=False)
+    else:
+        generate = safe_generate_async
+
+    chunks: Optional[List[Dict[str, Any]]] = None
+    prompt_scan = None
+    if req.large_input:
+        try:
+            mr = await run_map_reduce(
+                prompt,
+                generate,
+                chunk_tokens=settings.LARGE_INPUT_CHUNK_TOKENS,
+                max_chunks=settings.LARGE_INPUT_MAX_CHUNKS,
+                max_fanout=settings.LARGE_INPUT_MAX_FANOUT,
+                budget=get_policy_table().budget,
+                timer=timer,
+            )
+        except LargeInputError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        redaction = mr.redaction
+        prompt_sent = redaction.text
+        prompt_scan = mr.prompt_scan
+        chunks = mr.chunks
+        llm_result = {**mr.llm_result, "cached": False, "coalesced": False}
+        budget_dict = llm_result.get("budget")
+    else:
+        # 0) Scrub PII before anything leaves the process
+        with timer.stage("scrub"):
+            redaction = await _scan_work(len(prompt), redaction_cache.redact, prompt)
+
+        with timer.stage("budget"):
+            try:
+                prompt_sent, budget = await _scan_work(
+                    len(redaction.text), apply_budget,
+                    redaction.text, get_policy_table().budget,
+                )
+            except BudgetExceeded as e:
+                raise HTTPException(status_code=413, detail=str(e))
+        budget_dict = budget.as_dict()
+
+        # 1) Call LLM (router picks the backend; awaits, no thread held)
+        with timer.stage("llm"):
+            llm_result = await cached_generate_async(
+                prompt_sent,
+                generate,
+                with_actions=mode != "background",
+                bypass=req.bypass_cache,
+                mode=mode,
+            )
+    llm_text = unredact(llm_result.get("text"), redaction.mapping)
     llm_error = llm_result.get("error")
     model_name = llm_result.get("model", "unknown")
+    provider_name = llm_result.get("provider")
     suggested_actions = llm_result.get("actions", []) or []
 
-    # 2) Evaluate trust & risk
-    tr = evaluate_trust_and_risk(prompt, llm_text, llm_error)
-    trust_score: float = tr["trust_score"]
-    risk_level: str = tr["risk_level"]
-    risk_flags: list[str] = tr["risk_flags"]
-    explainability: str = tr["explanation"]
-
-    # 3) Very simple policy logic (inline)
-    policy_decision = "allow"
-    policy_reasons: list[str] = []
-    policy_risk_level = risk_level
-    policy_risk_flags = risk_flags.copy()
-
-    flags_set = set(risk_flags)
-
-    if "destructive_actions" in flags_set:
-        policy_decision = "block"
-        policy_reasons.append(
-            "Prompt/response appears to contain destructive actions, policy blocks such requests."
-        )
-    elif "security_sensitive" in flags_set or risk_level == "high":
-        policy_decision = "needs_approval"
-        policy_reasons.append(
-            "Prompt/response appears security-sensitive or high-risk, requires human approval."
-        )
-    elif "privacy_sensitive" in flags_set or "financial_sensitive" in flags_set:
-        policy_decision = "needs_approval"
-        policy_reasons.append(
-            "Prompt/response touches sensitive personal or financial data, requires human approval."
-        )
-    else:
-        policy_decision = "allow"
-        policy_reasons.append(
-            "No high-risk patterns detected, allowed by default policy."
+    with timer.stage("evaluate"):
+        # 2) Evaluate trust & risk, 3) apply the policy engine (one scan
+        # shared by both; a chunked prompt was already scanned per chunk)
+        tr, policy = await _scan_work(
+            len(llm_text or "") + (len(prompt) if prompt_scan is None else 0),
+            _evaluate, prompt, llm_text, llm_error, prompt_scan,
         )
+        trust_score: float = tr["trust_score"]
+        risk_level: str = tr["risk_level"]
+        risk_flags: list[str] = tr["risk_flags"]
+        explainability: str = tr["explanation"]
+
+        policy_decision: str = policy["decision"]
+        policy_reasons: list[str] = policy["reasons"]
+        policy_risk_level: str = policy["risk_level"]
+        policy_risk_flags: list[str] = policy["risk_flags"]
+        policy_rule_id: str = policy["rule_id"]
 
-    # 4) Store AgentRun
     run = AgentRun(
         prompt=prompt,
         response=llm_text or "",
@@ -102,53 +442,51 @@ def run_agent(req: AgentRequest, session: Session = Depends(get_session)):
         policy_risk_level=policy_risk_level,
         risk_flags_json=json.dumps(risk_flags),
         policy_reasons_json=json.dumps(policy_reasons),
+        policy_rule_id=policy_rule_id,
         llm_error=llm_error,
+        llm_provider=provider_name,
+        budget_json=json.dumps(budget_dict) if budget_dict else None,
+        llm_cached=llm_result["cached"],
+        redaction_map_json=json.dumps(redaction.mapping) if redaction.mapping else None,
+        chunks_json=json.dumps(chunks) if chunks is not None else None,
     )
-    session.add(run)
-    session.commit()
-    session.refresh(run)
-
-    # 5) If risky or blocked, create an Approval entry
     needs_approval = (
         risk_level in ("medium", "high") or policy_decision in ("block", "needs_approval")
     )
+    # Nothing to extract from a fallback answer
+    extract_later = mode == "background" and llm_error is None
+    actions_status = "pending" if extract_later else "done"
+    run.actions_status = actions_status
 
-    if needs_approval:
-        approval = Approval(
-            agent_run_id=run.id,
-            status="pending",
+    with timer.stage("persist"):
+        run_id = await _save_run(
+            session,
+            run,
+            needs_approval,
+            suggested_actions,
+            redaction.mapping,
+            timer,
         )
-        session.add(approval)
-        session.commit()
-
-    # 6) Store any suggested actions from the LLM
-    #    These are "pending" by default so a human / policy layer can approve or simulate.
-    for act in suggested_actions:
-        if not isinstance(act, dict):
-            continue
-        a_type = act.get("type") or "other"
-        payload = act.get("payload") or {}
-        if not isinstance(payload, dict):
-            payload = {}
 
-        action = Action(
-            agent_run_id=run.id,
-            type=a_type,
-            payload_json=json.dumps(payload),
-            status="pending",  # can be 'pending' until sandbox / approval
+    if extract_later:
+        _extraction_events[run_id] = asyncio.Event()
+        background_tasks.add_task(
+            _extract_actions_background,
+            run_id,
+            prompt_sent,
+            llm_result.get("text") or "",
+            redaction.mapping,
         )
-        session.add(action)
-
-    if suggested_actions:
-        session.commit()
 
     # 7) Build response
     return AgentResponse(
         status="ok",
+        run_id=run_id,
         message="Agent runner live!",
-        prompt_sent=prompt,
+        prompt_sent=prompt_sent,
         response=llm_text,
         model=model_name,
+        provider=provider_name,
         trust_score=trust_score,
         risk_level=risk_level,
         risk_flags=risk_flags,
@@ -156,5 +494,321 @@ def run_agent(req: AgentRequest, session: Session = Depends(get_session)):
         policy_reasons=policy_reasons,
         policy_risk_level=policy_risk_level,
         policy_risk_flags=policy_risk_flags,
+        policy_rule_id=policy_rule_id,
         explainability=explainability,
+        redactions=len(redaction.mapping),
+        budget=budget_dict,
+        stage_timings_ms=timer.as_dict(),
+        actions_status=actions_status,
+        cached=llm_result["cached"],
+        coalesced=llm_result["coalesced"],
+        chunks=chunks,
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _finish_stream(
+    prompt: str,
+    prompt_sent: str,
+    redaction: Redaction,
+    budget: Optional[Dict[str, Any]],
+    mode: str,
+    llm_result: Dict[str, Any],
+    raw_text: str,
+    sent_text: str,
+    llm_error: Optional[str],
+    extract: bool,
+    timer: StageTimer,
+    background_tasks: BackgroundTasks,
+) -> AgentResponse:
+    """
+    Steps 2-4 of /agent/run once the stream is over: actions, trust & risk,
+    policy, then the AgentRun / Approval / Action rows.
+
+    The recorded and returned answer is sent_text, what the client was
+    actually sent. Trust, risk and policy are evaluated on everything the
+    LLM generated (raw_text, restored), so a cut-off answer is still
+    flagged and sent for approval for what it was about to say; raw_text
+    also feeds action extraction, which runs only when the stream ended
+    cleanly.
+    """
+    llm_text = sent_text or None
+    generated = unredact(raw_text, redaction.mapping) or None
+
+    suggested_actions: List[Dict[str, Any]] = []
+    if extract and mode == "inline":
+        with timer.stage("extract_actions"):
+            suggested_actions = await extract_actions_async(prompt_sent, raw_text)
+
+    with timer.stage("evaluate"):
+        tr, policy = await _scan_work(
+            len(prompt) + len(generated or ""), _evaluate, prompt, generated, llm_error
+        )
+
+    run = AgentRun(
+        prompt=prompt,
+        response=llm_text or "",
+        model=llm_result["model"],
+        trust_score=tr["trust_score"],
+        risk_level=tr["risk_level"],
+        policy_decision=policy["decision"],
+        policy_risk_level=policy["risk_level"],
+        risk_flags_json=json.dumps(tr["risk_flags"]),
+        policy_reasons_json=json.dumps(policy["reasons"]),
+        policy_rule_id=policy["rule_id"],
+        llm_error=llm_error,
+        llm_provider=llm_result["provider"],
+        budget_json=json.dumps(budget) if budget else None,
+        llm_cached=False,
+        redaction_map_json=json.dumps(redaction.mapping) if redaction.mapping else None,
+    )
+    needs_approval = (
+        tr["risk_level"] in ("medium", "high")
+        or policy["decision"] in ("block", "needs_approval")
     )
+    extract_later = extract and mode == "background"
+    actions_status = "pending" if extract_later else "done"
+    run.actions_status = actions_status
+
+    with timer.stage("persist"):
+        # the request's session is gone by the time a stream ends
+        run_id = await _save_run(
+            None, run, needs_approval, suggested_actions, redaction.mapping, timer
+        )
+
+    if extract_later:
+        _extraction_events[run_id] = asyncio.Event()
+        background_tasks.add_task(
+            _extract_actions_background, run_id, prompt_sent, raw_text, redaction.mapping
+        )
+
+    return AgentResponse(
+        status="ok",
+        run_id=run_id,
+        message="Agent runner live!",
+        prompt_sent=prompt_sent,
+        response=llm_text,
+        model=llm_result["model"],
+        provider=llm_result["provider"],
+        trust_score=tr["trust_score"],
+        risk_level=tr["risk_level"],
+        risk_flags=tr["risk_flags"],
+        policy_decision=policy["decision"],
+        policy_reasons=policy["reasons"],
+        policy_risk_level=policy["risk_level"],
+        policy_risk_flags=policy["risk_flags"],
+        policy_rule_id=policy["rule_id"],
+        explainability=tr["explanation"],
+        redactions=len(redaction.mapping),
+        budget=budget,
+        stage_timings_ms=timer.as_dict(),
+        actions_status=actions_status,
+    )
+
+
+async def _stream_events(
+    prompt: str,
+    prompt_sent: str,
+    redaction: Redaction,
+    budget: Dict[str, Any],
+    mode: str,
+    timer: StageTimer,
+    background_tasks: BackgroundTasks,
+) -> AsyncIterator[str]:
+    """
+    Body of /agent/run/stream: relay the answer as it is generated,
+    restoring redacted values and risk-scanning it on the way, then
+    record the run and send the full result.
+    """
+    start = time.perf_counter()
+    with timer.stage("llm_open"):
+        llm_result = await safe_stream_async(prompt_sent)
+    llm_error: Optional[str] = llm_result["error"]
+    yield _sse(
+        "start",
+        {
+            "model": llm_result["model"],
+            "provider": llm_result["provider"],
+            "redactions": len(redaction.mapping),
+            "budget": budget,
+        },
+    )
+
+    chunks: AsyncIterator[str] = llm_result["chunks"]
+    scanner = IncrementalRiskScanner()
+    unredactor = StreamUnredactor(redaction.mapping)
+    cutoff_flags = set(settings.STREAM_CUTOFF_FLAGS)
+    # a keyword may still complete in the last max_keyword_len - 1
+    # characters, so those are held back until the next piece
+    hold = max(0, scanner.matcher.max_keyword_len - 1)
+    raw: List[str] = []  # as the LLM wrote it (redacted)
+    sent: List[str] = []  # restored text yielded to the client
+    held = ""  # restored text scanned but not sent yet
+    sent_len = 0  # position of held[0] in the restored text
+    cutoff: Optional[RiskMatch] = None
+
+    def gate(text: str, final: bool = False) -> str:
+        """
+        Scan the next piece of restored text; return the part that may
+        be sent: everything before a cut-off match, and never the last
+        characters a keyword could still end in (unless final).
+        """
+        nonlocal cutoff, held, sent_len
+        held += text
+        for m in scanner.feed(text):
+            if m.flag in cutoff_flags:
+                cutoff = m
+                out, held = held[:max(0, m.start - sent_len)], ""
+                break
+        else:
+            cut = len(held) if final else max(0, len(held) - hold)
+            out, held = held[:cut], held[cut:]
+        sent_len += len(out)
+        if out:
+            sent.append(out)
+        return out
+
+    finished = False
+    try:
+        with timer.stage("stream"):
+            try:
+                async for delta in chunks:
+                    if not raw:
+                        timer.add("first_token", (time.perf_counter() - start) * 1000)
+                    raw.append(delta)
+                    text = gate(unredactor.feed(delta))
+                    if text:
+                        yield _sse("token", {"text": text})
+                    if cutoff is not None:
+                        break
+                else:
+                    text = gate(unredactor.flush(), final=True)
+                    if text:
+                        yield _sse("token", {"text": text})
+            except Exception as e:
+                llm_error = llm_error or f"Stream interrupted: {e}"
+                # the held-back tail was already scanned: send it
+                text = gate(unredactor.flush(), final=True)
+                if text:
+                    yield _sse("token", {"text": text})
+            finally:
+                with anyio.CancelScope(shield=True):
+                    await chunks.aclose()
+        finished = True
+    finally:
+        if not finished:
+            # Client went away mid-stream: still record what was generated
+            with anyio.CancelScope(shield=True):
+                await _finish_stream(
+                    prompt, prompt_sent, redaction, budget, mode, llm_result,
+                    "".join(raw), "".join(sent),
+                    llm_error or "Client disconnected mid-stream",
+                    False, timer, background_tasks,
+                )
+
+    if cutoff is not None:
+        llm_error = f"Stream cut off: '{cutoff.keyword}' ({cutoff.flag})"
+        yield _sse("cutoff", {"flag": cutoff.flag, "keyword": cutoff.keyword})
+
+    result = await _finish_stream(
+        prompt, prompt_sent, redaction, budget, mode, llm_result,
+        "".join(raw), "".join(sent), llm_error, llm_error is None, timer,
+        background_tasks,
+    )
+    yield _sse("done", result.model_dump())
+
+
+@router.post("/run/stream")
+async def run_agent_stream(req: AgentRequest, background_tasks: BackgroundTasks):
+    """
+    /agent/run as server-sent events, so the answer shows up as it is
+    generated instead of after the whole pipeline:
+
+      event: start   {model, provider, redactions, budget}
+      event: token   {text}             restored answer text, repeated
+      event: cutoff  {flag, keyword}    answer stopped on a risky match
+      event: done    AgentResponse      once the run is recorded
+
+    The answer is risk-scanned as it streams; the first match of a flag in
+    STREAM_CUTOFF_FLAGS ends the stream (the upstream call is closed) and
+    the run is recorded with the answer up to that point. Tokens trail the
+    model by up to max_keyword_len - 1 characters, so no part of a cut-off
+    keyword is ever sent, and the recorded answer is exactly the text the
+    client received. Rows are written
+    when the stream ends, also if the client disconnects. Streams bypass
+    the response cache; "combined" extraction streams like "inline".
+    """
+    prompt = req.prompt.strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+    if req.large_input:
+        raise HTTPException(
+            status_code=400, detail="large_input is not supported by /agent/run/stream"
+        )
+
+    mode = req.action_extraction or settings.ACTION_EXTRACTION_MODE
+    if mode == "combined":
+        # a JSON answer can't be streamed as text
+        mode = "inline"
+    timer = StageTimer()
+
+    with timer.stage("scrub"):
+        redaction = await _scan_work(len(prompt), redaction_cache.redact, prompt)
+
+    with timer.stage("budget"):
+        try:
+            prompt_sent, budget = await _scan_work(
+                len(redaction.text), apply_budget,
+                redaction.text, get_policy_table().budget,
+            )
+        except BudgetExceeded as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    return StreamingResponse(
+        _stream_events(
+            prompt, prompt_sent, redaction, budget.as_dict(), mode, timer, background_tasks
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _extraction_status(run_id: int) -> Optional[ExtractionStatusResponse]:
+    with Session(engine) as session:
+        run = session.get(AgentRun, run_id)
+        if run is None:
+            return None
+        actions = session.exec(
+            select(Action).where(Action.agent_run_id == run_id).order_by(Action.id)
+        ).all()
+        return ExtractionStatusResponse(
+            run_id=run_id,
+            actions_status=run.actions_status,
+            actions=[ActionResponse.from_action(a) for a in actions],
+        )
+
+
+@router.get("/run/{run_id}/actions", response_model=ExtractionStatusResponse)
+async def get_run_actions(
+    run_id: int,
+    wait: float = Query(0.0, ge=0.0, le=MAX_EXTRACTION_WAIT_SECONDS),
+):
+    """
+    Extraction status and stored actions of a run. With wait > 0 the call
+    blocks (long-poll) until a pending background extraction finishes or
+    the wait runs out, instead of the client polling in a loop.
+    """
+    event = _extraction_events.get(run_id)
+    if event is not None and wait > 0:
+        try:
+            await asyncio.wait_for(event.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+
+    status = await run_in_threadpool(_extraction_status, run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="AgentRun not found")
+    return status
@@ -1,12 +1,14 @@
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel
+from sqlalchemy import Row, update
 from sqlmodel import Session, select
 
 from app.db.database import get_session
 from app.db.models import Approval, AgentRun
+from app.routes.pagination import decode_cursor, page, paginate
 
 router = APIRouter(prefix="/approvals", tags=["approvals"])
 
@@ -24,18 +26,22 @@ class ApprovalResponse(BaseModel):
     prompt: Optional[str] = None
 
     @classmethod
-    def from_model(cls, approval: Approval, prompt: Optional[str] = None):
+    def from_row(cls, row: Row) -> "ApprovalResponse":
+        """
+        Build from one row of _approval_query(): approval columns plus the
+        run's prompt, risk level and policy decision.
+        """
         return cls(
-            id=approval.id,
-            created_at=approval.created_at,
-            updated_at=approval.decided_at,  # Map decided_at to updated_at in response
-            agent_run_id=approval.agent_run_id,
-            status=approval.status,
-            risk_level=getattr(approval, "risk_level", None),
-            policy_decision=getattr(approval, "policy_decision", None),
-            reviewer=approval.decided_by,  # Map decided_by to reviewer in response
-            notes=approval.decision_reason,  # Map decision_reason to notes in response
-            prompt=prompt,
+            id=row.id,
+            created_at=row.created_at,
+            updated_at=row.decided_at,  # Map decided_at to updated_at in response
+            agent_run_id=row.agent_run_id,
+            status=row.status,
+            risk_level=row.risk_level,
+            policy_decision=row.policy_decision,
+            reviewer=row.decided_by,  # Map decided_by to reviewer in response
+            notes=row.decision_reason,  # Map decision_reason to notes in response
+            prompt=row.prompt,
         )
 
 
@@ -44,65 +50,95 @@ class ApprovalUpdateRequest(BaseModel):
     notes: Optional[str] = None
 
 
+def _approval_query():
+    """
+    Approvals joined to their run in one query, selecting only the
+    columns the response needs (not the run's response text).
+    """
+    return select(
+        Approval.id,
+        Approval.created_at,
+        Approval.decided_at,
+        Approval.agent_run_id,
+        Approval.status,
+        Approval.decided_by,
+        Approval.decision_reason,
+        AgentRun.prompt,
+        AgentRun.risk_level,
+        AgentRun.policy_decision,
+    ).outerjoin(AgentRun, AgentRun.id == Approval.agent_run_id)
+
+
+def _list_approvals(
+    session: Session,
+    response: Response,
+    status: Optional[str],
+    limit: int,
+    cursor: Optional[str],
+) -> List[ApprovalResponse]:
+    stmt = _approval_query()
+    if status:
+        stmt = stmt.where(Approval.status == status)
+    key = decode_cursor(cursor) if cursor else None
+    stmt = paginate(stmt, Approval.created_at, Approval.id, key, limit)
+    rows = page(response, session.exec(stmt).all(), key, limit)
+    return [ApprovalResponse.from_row(row) for row in rows]
+
+
 @router.get("/pending", response_model=List[ApprovalResponse])
 def get_pending_approvals(
+    response: Response,
     session: Session = Depends(get_session),
     limit: int = 100,
+    cursor: Optional[str] = None,
 ):
     """
     List approvals that are currently pending.
     """
-    stmt = (
-        select(Approval)
-        .where(Approval.status == "pending")
-        .order_by(Approval.created_at.desc())
-        .limit(limit)
-    )
-    approvals = session.exec(stmt).all()
-
-    # join with AgentRun to get prompt
-    responses: List[ApprovalResponse] = []
-    for a in approvals:
-        run = session.get(AgentRun, a.agent_run_id)
-        responses.append(
-            ApprovalResponse.from_model(a, prompt=run.prompt if run else None)
-        )
-
-    return responses
+    return _list_approvals(session, response, "pending", limit, cursor)
 
 
 @router.get("/all", response_model=List[ApprovalResponse])
 def get_all_approvals(
+    response: Response,
     status: Optional[str] = None,
     limit: int = 200,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
     """
-    List approvals, optionally filtered by status.
+    List approvals, optionally filtered by status, newest first.
+    Page through older / newer approvals with the X-Next-Cursor /
+    X-Prev-Cursor headers (see app/routes/pagination.py).
     """
-    stmt = select(Approval)
+    return _list_approvals(session, response, status, limit, cursor)
 
-    if status:
-        stmt = stmt.where(Approval.status == status)
-
-    stmt = stmt.order_by(Approval.created_at.desc()).limit(limit)
-    approvals = session.exec(stmt).all()
-
-    responses: List[ApprovalResponse] = []
-    for a in approvals:
-        run = session.get(AgentRun, a.agent_run_id)
-        responses.append(
-            ApprovalResponse.from_model(a, prompt=run.prompt if run else None)
-        )
-
-    return responses
 
+def _decide(
+    approval_id: int,
+    status: str,
+    payload: ApprovalUpdateRequest,
+    session: Session,
+) -> ApprovalResponse:
+    """
+    Record a decision with one UPDATE and read the result back with the
+    joined projection (no ORM load / refresh round trips).
+    """
+    values = {"status": status, "decided_at": datetime.utcnow()}
+    if payload.reviewer is not None:
+        values["decided_by"] = payload.reviewer
+    if payload.notes is not None:
+        values["decision_reason"] = payload.notes
 
-def _get_approval_or_404(approval_id: int, session: Session) -> Approval:
-    approval = session.get(Approval, approval_id)
-    if not approval:
+    result = session.execute(
+        update(Approval).where(Approval.id == approval_id).values(**values)
+    )
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Approval not found")
-    return approval
+    session.commit()
+
+    row = session.exec(_approval_query().where(Approval.id == approval_id)).one()
+    return ApprovalResponse.from_row(row)
 
 
 @router.post("/{approval_id}/approve", response_model=ApprovalResponse)
@@ -114,21 +150,7 @@ def approve(
     """
     Mark an approval as approved.
     """
-    approval = _get_approval_or_404(approval_id, session)
-
-    approval.status = "approved"
-    approval.decided_at = datetime.utcnow()
-    if payload.reviewer is not None:
-        approval.decided_by = payload.reviewer
-    if payload.notes is not None:
-        approval.decision_reason = payload.notes
-
-    session.add(approval)
-    session.commit()
-    session.refresh(approval)
-
-    run = session.get(AgentRun, approval.agent_run_id)
-    return ApprovalResponse.from_model(approval, prompt=run.prompt if run else None)
+    return _decide(approval_id, "approved", payload, session)
 
 
 @router.post("/{approval_id}/reject", response_model=ApprovalResponse)
@@ -140,18 +162,4 @@ def reject(
     """
     Mark an approval as rejected.
     """
-    approval = _get_approval_or_404(approval_id, session)
-
-    approval.status = "rejected"
-    approval.decided_at = datetime.utcnow()
-    if payload.reviewer is not None:
-        approval.decided_by = payload.reviewer
-    if payload.notes is not None:
-        approval.decision_reason = payload.notes
-
-    session.add(approval)
-    session.commit()
-    session.refresh(approval)
-
-    run = session.get(AgentRun, approval.agent_run_id)
-    return ApprovalResponse.from_model(approval, prompt=run.prompt if run else None)
+    return _decide(approval_id, "rejected", payload, session)
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.db.database import engine
+from app.db.fts import rebuild_fts
+from app.db.rollups import rebuild_rollups
+from app.jobs.rescore import (
+    DEFAULT_CHUNK_SIZE,
+    get_rescore_status,
+    start_rescore_job,
+)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class RescoreRequest(BaseModel):
+    dry_run: bool = True
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    reset: bool = False
+    max_rows: Optional[int] = None
+
+
+@router.post("/rescore")
+def start_rescore(payload: RescoreRequest) -> Dict[str, Any]:
+    """
+    Start re-scoring stored AgentRuns with the current evaluator and
+    policy engine. Defaults to a dry run that only reports the diff.
+    Poll GET /jobs/rescore for progress.
+    """
+    if payload.chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+
+    report = start_rescore_job(
+        chunk_size=payload.chunk_size,
+        dry_run=payload.dry_run,
+        reset=payload.reset,
+        max_rows=payload.max_rows,
+    )
+    if report is None:
+        raise HTTPException(status_code=409, detail="Re-score job already running")
+    return report.to_dict()
+
+
+@router.get("/rescore")
+def rescore_status() -> Dict[str, Any]:
+    """
+    Progress / result of the most recent re-score job in this process.
+    """
+    report = get_rescore_status()
+    if report is None:
+        raise HTTPException(status_code=404, detail="No re-score job has run yet")
+    return report.to_dict()
+
+
+@router.post("/rollups/rebuild")
+def rebuild_analytics_rollups() -> Dict[str, Any]:
+    """
+    Recompute the /logs/analytics rollups from the stored runs (fixes
+    drift). Runs in one transaction, so writers wait until it is done.
+    """
+    with engine.begin() as conn:
+        rows = rebuild_rollups(conn)
+    return {"rollup_rows": rows}
+
+
+@router.post("/fts/rebuild")
+def rebuild_full_text_index() -> Dict[str, Any]:
+    """
+    Re-index every run's prompt / response for /logs/fulltext. Runs in
+    one transaction, so writers wait until it is done.
+    """
+    with engine.begin() as conn:
+        runs = rebuild_fts(conn)
+    return {"runs_indexed": runs}
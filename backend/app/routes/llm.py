@@ -0,0 +1,61 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from app.llm.cache import llm_cache
+from app.llm.client import router as llm_router
+from app.llm.singleflight import coalescing_stats
+
+router = APIRouter(
+    prefix="/llm",
+    tags=["llm"],
+)
+
+
+@router.get("/health")
+def get_llm_health() -> Dict[str, Any]:
+    """
+    LLM backend health as seen by this worker: routing order, hedge and
+    fallback counters, and per backend the rolling p50/p95 latency, error
+    rate, circuit breaker state, rate limiter tokens and in-flight calls.
+    status is "ok" when every backend is healthy, "degraded" when some
+    are, "down" when none are (or none is configured).
+    """
+    snapshot = llm_router.snapshot()
+    healthy = sum(p["healthy"] for p in snapshot["providers"])
+    if healthy and healthy == len(snapshot["providers"]):
+        status = "ok"
+    elif healthy:
+        status = "degraded"
+    else:
+        status = "down"
+    return {"status": status, **snapshot}
+
+
+@router.get("/cache/stats")
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters of the LLM response cache (this worker process).
+    """
+    return llm_cache.stats()
+
+
+@router.post("/cache/prune")
+def prune_cache() -> Dict[str, Any]:
+    """
+    Drop expired entries and trim the table to its size limit now.
+    """
+    return {"status": "ok", "removed": llm_cache.prune()}
+
+
+@router.delete("/cache")
+def clear_cache() -> Dict[str, Any]:
+    return {"status": "ok", "removed": llm_cache.clear()}
+
+
+@router.get("/coalescing/stats")
+def get_coalescing_stats() -> Dict[str, Any]:
+    """
+    Upstream LLM calls made vs. calls merged into one already in flight.
+    """
+    return coalescing_stats()
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
+from sqlalchemy import exists
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
 
 from app.db.database import get_session
-from app.db.models import AgentRun
+from app.db.fts import match_query, search_runs
+from app.db.models import AgentRun, AgentRunFlag
+from app.db.rollups import naive_utc, query_rollups
+from app.routes.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    decode_token,
+    encode_token,
+    page,
+    paginate,
+)
 
 router = APIRouter(
     prefix="/logs",
@@ -22,6 +37,7 @@ class AgentRunLog(BaseModel):
     risk_level: str
     policy_decision: str
     policy_risk_level: str
+    risk_flags: List[str] = []
 
     @classmethod
     def from_model(cls, run: AgentRun) -> "AgentRunLog":
@@ -35,52 +51,166 @@ class AgentRunLog(BaseModel):
             risk_level=run.risk_level or "unknown",
             policy_decision=run.policy_decision or "unknown",
             policy_risk_level=run.policy_risk_level or run.risk_level or "unknown",
+            risk_flags=json.loads(run.risk_flags_json or "[]"),
         )
 
 
 @router.get("/recent", response_model=List[AgentRunLog])
 def recent_logs(
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Return most recent agent runs for dashboard logs, newest first.
+    Page through older / newer runs with the X-Next-Cursor /
+    X-Prev-Cursor headers (see app/routes/pagination.py).
+    """
+    key = decode_cursor(cursor) if cursor else None
+    statement = paginate(select(AgentRun), AgentRun.created_at, AgentRun.id, key, limit)
+    runs = page(response, session.exec(statement).all(), key, limit)
+    return [AgentRunLog.from_model(r) for r in runs]
+
+
+@router.get("/search", response_model=List[AgentRunLog])
+def search_logs(
+    response: Response,
+    flag: List[str] = Query(default=[]),
+    risk_level: Optional[str] = None,
+    policy_decision: Optional[str] = None,
+    model: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     limit: int = 50,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
     """
-    Return most recent agent runs for dashboard logs.
+    Agent runs matching every given filter, newest first, paged like
+    /logs/recent. flag may be repeated (runs having all of them);
+    start / end are UTC, end exclusive.
+
+    With flags, the first one drives the query through agentrun_flag
+    (put the rarest first) and the others are per-run lookups; without,
+    the risk level / decision / model indexes do. Either way each page
+    reads matching rows only.
     """
-    statement = (
-        select(AgentRun)
-        .order_by(AgentRun.created_at.desc())
-        .limit(limit)
-    )
-    runs = session.exec(statement).all()
+    statement = select(AgentRun)
+    if flag:
+        statement = statement.join(AgentRunFlag, AgentRunFlag.agent_run_id == AgentRun.id).where(
+            AgentRunFlag.flag == flag[0]
+        )
+        created_col, id_col = AgentRunFlag.created_at, AgentRunFlag.agent_run_id
+        for other in flag[1:]:
+            also = aliased(AgentRunFlag)
+            statement = statement.where(
+                exists().where(also.agent_run_id == AgentRun.id, also.flag == other)
+            )
+    else:
+        created_col, id_col = AgentRun.created_at, AgentRun.id
+
+    if risk_level:
+        statement = statement.where(AgentRun.risk_level == risk_level.lower())
+    if policy_decision:
+        statement = statement.where(AgentRun.policy_decision == policy_decision.lower())
+    if model:
+        statement = statement.where(AgentRun.model == model)
+    if start is not None:
+        statement = statement.where(created_col >= naive_utc(start))
+    if end is not None:
+        statement = statement.where(created_col < naive_utc(end))
+
+    key = decode_cursor(cursor) if cursor else None
+    statement = paginate(statement, created_col, id_col, key, limit)
+    runs = page(response, session.exec(statement).all(), key, limit)
     return [AgentRunLog.from_model(r) for r in runs]
 
 
+class FullTextHit(BaseModel):
+    id: int
+    created_at: str
+    model: str
+    risk_level: str
+    policy_decision: str
+    score: Optional[float] = None  # bm25, lower is better (order=rank only)
+    prompt_snippet: str
+    response_snippet: str
+
+
+@router.get("/fulltext", response_model=List[FullTextHit])
+def fulltext_logs(
+    response: Response,
+    q: str,
+    order: Literal["rank", "recent"] = "rank",
+    raw: bool = False,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Full-text search over run prompts and responses (agentrun_fts).
+
+    q: words that must all occur (prefix search with a trailing *), or
+    FTS5 query syntax with raw=true. order=rank is best match first
+    (cost grows with the number of matches), order=recent newest first
+    (same cost for every page, no score). Snippets mark hits as [word].
+    Next page: pass the X-Next-Cursor header back as ?cursor=.
+    """
+    match = match_query(q, raw)
+    if not match:
+        raise HTTPException(status_code=400, detail="Empty search query")
+
+    after = None
+    if cursor:
+        token = decode_token(cursor)
+        if not token or token[0] != order:
+            raise HTTPException(status_code=400, detail="Cursor does not match order")
+        after = token[1:]
+
+    try:
+        rows = search_runs(session, match, order, after, limit)
+    except OperationalError:
+        raise HTTPException(status_code=400, detail="Invalid full-text query")
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key = [last.score, last.id] if order == "rank" else [last.id]
+        response.headers[NEXT_CURSOR_HEADER] = encode_token([order, *key])
+
+    return [
+        FullTextHit(
+            id=r.id,
+            created_at=r.created_at.isoformat() if r.created_at else "",
+            model=r.model or "",
+            risk_level=r.risk_level or "unknown",
+            policy_decision=r.policy_decision or "unknown",
+            score=r.score,
+            prompt_snippet=r.prompt_snippet or "",
+            response_snippet=r.response_snippet or "",
+        )
+        for r in rows
+    ]
+
+
 @router.get("/analytics")
 def logs_analytics(
+    granularity: Literal["minute", "hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     session: Session = Depends(get_session),
 ) -> Dict[str, Any]:
     """
-    Simple analytics for dashboard cards:
+    Analytics for dashboard cards, read from the agentrun_rollup buckets
+    (not the runs themselves):
       - total_runs
       - by_risk_level
       - by_policy_decision
-    """
-    statement = select(AgentRun)
-    runs = session.exec(statement).all()
+      - by_model
+      - series: the same counts per bucket of the given granularity
 
-    total = len(runs)
-    by_risk_level: Dict[str, int] = {}
-    by_policy_decision: Dict[str, int] = {}
-
-    for r in runs:
-        rl = (r.risk_level or "unknown").lower()
-        by_risk_level[rl] = by_risk_level.get(rl, 0) + 1
-
-        pd = (r.policy_decision or "unknown").lower()
-        by_policy_decision[pd] = by_policy_decision.get(pd, 0) + 1
-
-    return {
-        "total_runs": total,
-        "by_risk_level": by_risk_level,
-        "by_policy_decision": by_policy_decision,
-    }
+    start / end (UTC) limit the range in whole buckets; without them all
+    runs are counted.
+    """
+    return query_rollups(session, granularity, start, end)
@@ -0,0 +1,113 @@
+"""
+Keyset (cursor) pagination for the newest-first listings.
+
+Pages are ordered by (created_at, id) descending and a page continues
+from the last row seen rather than skipping OFFSET rows, so every page
+is one index range read whatever its depth, and rows inserted meanwhile
+do not shift the pages.
+
+The response body stays a plain list (what the dashboard reads); the
+cursors travel in headers:
+  X-Next-Cursor   older rows (absent on the last page)
+  X-Prev-Cursor   newer rows (absent on the first page)
+Pass either one back as ?cursor= to get that page. Cursors are opaque:
+base64 of the direction and the (created_at, id) of the boundary row.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+T = TypeVar("T")
+
+
+class Cursor(NamedTuple):
+    # "next": older than the key, "prev": newer than the key
+    direction: str
+    created_at: datetime
+    id: int
+
+
+def encode_token(values: List[Any]) -> str:
+    """
+    Opaque, URL-safe cursor for a list of JSON values.
+    """
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def encode_cursor(direction: str, created_at: datetime, row_id: int) -> str:
+    return encode_token([direction, created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    values = decode_token(cursor)
+    try:
+        direction, created_at, row_id = values
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return Cursor(direction, datetime.fromisoformat(created_at), int(row_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(stmt: Any, created_col: Any, id_col: Any, cursor: Optional[Cursor], limit: Optional[int]) -> Any:
+    """
+    Apply the keyset condition, order and limit to a select. One extra
+    row is fetched to tell whether there is a further page.
+    """
+    key = tuple_(created_col, id_col)
+    if cursor is not None:
+        bound = tuple_(literal(cursor.created_at, created_col.type), literal(cursor.id, id_col.type))
+        if cursor.direction == "prev":
+            stmt = stmt.where(key > bound).order_by(created_col.asc(), id_col.asc())
+        else:
+            stmt = stmt.where(key < bound).order_by(created_col.desc(), id_col.desc())
+    else:
+        stmt = stmt.order_by(created_col.desc(), id_col.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def page(response: Response, rows: Sequence[T], cursor: Optional[Cursor], limit: Optional[int]) -> List[T]:
+    """
+    Trim the extra row of a paginate() query, put the rows back in
+    newest-first order and set the cursor headers.
+    """
+    items = list(rows)
+    more = limit is not None and len(items) > limit
+    if more:
+        items = items[:limit]
+    backwards = cursor is not None and cursor.direction == "prev"
+    if backwards:
+        items.reverse()
+    if not items:
+        return items
+
+    # Older rows exist if the page was cut short, or if we came from them
+    if backwards or more:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor("next", last.created_at, last.id)
+    # Newer rows exist if we came from them, or if the backward page was cut short
+    if (cursor is not None and not backwards) or (backwards and more):
+        first = items[0]
+        response.headers[PREV_CURSOR_HEADER] = encode_cursor("prev", first.created_at, first.id)
+    return items
@@ -1,7 +1,144 @@
-from fastapi import APIRouter
+import json
+from typing import Any, Dict, List
 
-router = APIRouter()
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import NotRequired, TypedDict
 
-@router.post("/check")
-def check_policy(data: dict):
-    return {"status": "ok", "policy_check": "not implemented yet"}
+from app.core.security import require_admin
+from app.policy.engine import (
+    PolicyError,
+    check_policy_fast,
+    get_policy_table,
+    reload_policy_rules,
+)
+
+router = APIRouter(prefix="/policy", tags=["policy"])
+
+# Upper bound on pairs per /policy/check call
+MAX_CHECK_ITEMS = 1000
+# Upper bound on the /policy/check body
+MAX_CHECK_BODY_BYTES = 2 * 1024 * 1024
+# Bodies up to this size are checked on the event loop; bigger ones (and
+# every batch) in the threadpool, so a large scan never stalls the loop
+INLINE_CHECK_MAX_BYTES = 16 * 1024
+
+
+# TypedDicts (not BaseModels) so validation yields plain dicts: no per-item
+# model construction on this hot path.
+class PolicyCheckItem(TypedDict):
+    prompt: str
+    response: NotRequired[str]
+
+
+class PolicyCheckRequest(TypedDict):
+    prompt: NotRequired[str]
+    response: NotRequired[str]
+    items: NotRequired[List[PolicyCheckItem]]
+
+
+_check_request = TypeAdapter(PolicyCheckRequest)
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    # Streamed with a cap, so an oversized body is refused before it is
+    # buffered (a Content-Length may be absent or wrong)
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Body too large (max {limit} bytes)")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Body too large (max {limit} bytes)")
+    return bytes(body)
+
+
+def _check_items(items: List[PolicyCheckItem]) -> List[Dict[str, Any]]:
+    return [check_policy_fast(i["prompt"], i.get("response")) for i in items]
+
+
+@router.post(
+    "/check",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _check_request.json_schema()}},
+        }
+    },
+)
+async def check_policy(request: Request):
+    """
+    Dry-run policy check for upstream pre-screening. Never calls the LLM
+    and never touches the DB. Declared async: a small single-pair check is
+    a few microseconds of CPU, cheaper than a threadpool hop; batches and
+    bodies over INLINE_CHECK_MAX_BYTES run in the threadpool instead.
+    Bodies over MAX_CHECK_BODY_BYTES are refused with 413.
+
+    Single pair:  {"prompt": "...", "response": "..."}
+      -> {"decision", "reasons", "risk_flags", "risk_level", "rule_id"}
+    Batch:        {"items": [{"prompt": "...", "response": "..."}, ...]}
+      -> {"count": n, "results": [...]} in input order
+    """
+    body = await _read_body(request, MAX_CHECK_BODY_BYTES)
+    try:
+        data: PolicyCheckRequest = _check_request.validate_python(json.loads(body))
+    except ValueError as e:
+        # ValidationError is a ValueError too
+        errors = e.errors() if isinstance(e, ValidationError) else [
+            {"type": "json_invalid", "loc": ("body",), "msg": str(e), "input": None}
+        ]
+        raise RequestValidationError(errors)
+    inline = len(body) <= INLINE_CHECK_MAX_BYTES
+
+    items = data.get("items")
+    if items is None:
+        if "prompt" not in data:
+            raise HTTPException(status_code=422, detail="Provide 'prompt' or 'items'")
+        if inline:
+            return JSONResponse(check_policy_fast(data["prompt"], data.get("response")))
+        return JSONResponse(
+            await run_in_threadpool(check_policy_fast, data["prompt"], data.get("response"))
+        )
+
+    if len(items) > MAX_CHECK_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items (max {MAX_CHECK_ITEMS})",
+        )
+    results = await run_in_threadpool(_check_items, items)
+    # JSONResponse skips jsonable_encoder: the payload is already plain JSON
+    return JSONResponse({"count": len(results), "results": results})
+
+
+@router.get("/rules")
+def get_rules() -> Dict[str, Any]:
+    """
+    The active (compiled) rule set and its version.
+    """
+    table = get_policy_table()
+    return {
+        "version": table.version,
+        "source": table.source,
+        "flags": list(table.flag_order),
+        "spec": table.spec,
+    }
+
+
+@router.post("/reload", dependencies=[Depends(require_admin)])
+def reload_rules() -> Dict[str, Any]:
+    """
+    Recompile settings.POLICY_RULES_PATH and swap the decision table in
+    atomically. No restart needed; in-flight requests finish on the old
+    table. Admin only. This swaps the table of the worker that handles the
+    call; other workers pick the file change up on their own within
+    POLICY_RULES_CHECK_SECONDS.
+    """
+    try:
+        table = reload_policy_rules()
+    except PolicyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "version": table.version, "entries": len(table.entries)}
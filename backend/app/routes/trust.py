@@ -0,0 +1,51 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.trust.evaluator import evaluate_trust_and_risk_batch
+
+router = APIRouter(prefix="/trust", tags=["trust"])
+
+# Hard cap per request so one call can't pin every worker for minutes
+MAX_BATCH_ITEMS = 50_000
+
+
+class TrustEvaluateItem(BaseModel):
+    prompt: str
+    response: Optional[str] = None
+    error: Optional[str] = None
+
+
+class TrustBatchRequest(BaseModel):
+    items: List[TrustEvaluateItem]
+
+
+class TrustEvaluateResult(BaseModel):
+    trust_score: float
+    risk_level: str
+    risk_flags: List[str]
+    explanation: str
+
+
+class TrustBatchResponse(BaseModel):
+    count: int
+    results: List[TrustEvaluateResult]
+
+
+@router.post("/evaluate/batch", response_model=TrustBatchResponse)
+def evaluate_batch(payload: TrustBatchRequest):
+    """
+    Re-screen many prompt/response pairs in one call (e.g. exported
+    conversation logs). Results are returned in input order.
+    """
+    if len(payload.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {MAX_BATCH_ITEMS} items)",
+        )
+
+    results = evaluate_trust_and_risk_batch(
+        [(i.prompt, i.response, i.error) for i in payload.items]
+    )
+    return TrustBatchResponse(count=len(results), results=results)
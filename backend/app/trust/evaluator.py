@@ -1,20 +1,36 @@
-from typing import List, Dict, Any, Optional, Set
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    List,
+    Dict,
+    Any,
+    Callable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
+try:  # optional C automaton; we fall back to a compiled regex without it
+    import ahocorasick
+except ImportError:  # pragma: no cover - depends on the environment
+    ahocorasick = None
 
-def find_risk_flags(text: str) -> List[str]:
-    """
-    Very simple keyword-based risk flagging.
-
-    security_sensitive  → passwords, tokens, keys, OTP, CVV
-    privacy_sensitive   → personal/customer data (email, phone, address, ID)
-    financial_sensitive → salary, bank/card, transactions
-    destructive_actions → delete/wipe/drop/shutdown type operations
-    """
-    text_l = text.lower()
-    flags: Set[str] = set()
 
+# Keyword tables for risk flagging (matched as lowercase substrings).
+#
+# security_sensitive  → passwords, tokens, keys, OTP, CVV
+# privacy_sensitive   → personal/customer data (email, phone, address, ID)
+# financial_sensitive → salary, bank/card, transactions
+# destructive_actions → delete/wipe/drop/shutdown type operations
+RISK_KEYWORDS: Dict[str, List[str]] = {
     # Security-sensitive: creds, auth, secrets
-    security_keywords = [
+    "security_sensitive": [
         "password",
         "passcode",
         "login credentials",
@@ -28,12 +44,9 @@ def find_risk_flags(text: str) -> List[str]:
         "otp",
         "one-time password",
         "cvv",
-    ]
-    if any(k in text_l for k in security_keywords):
-        flags.add("security_sensitive")
-
+    ],
     # Privacy-sensitive: personal identifiable information
-    privacy_keywords = [
+    "privacy_sensitive": [
         "personal data",
         "personal information",
         "pii",
@@ -53,12 +66,9 @@ def find_risk_flags(text: str) -> List[str]:
         "pan card",
         "id number",
         "identity number",
-    ]
-    if any(k in text_l for k in privacy_keywords):
-        flags.add("privacy_sensitive")
-
+    ],
     # Financial-sensitive: money, bank, card, salary
-    financial_keywords = [
+    "financial_sensitive": [
         "salary",
         "salaries",
         "payroll",
@@ -72,12 +82,9 @@ def find_risk_flags(text: str) -> List[str]:
         "transactions",
         "iban",
         "ifsc",
-    ]
-    if any(k in text_l for k in financial_keywords):
-        flags.add("financial_sensitive")
-
+    ],
     # Destructive actions: dangerous operations
-    destructive_keywords = [
+    "destructive_actions": [
         "delete all",
         "delete everything",
         "wipe all data",
@@ -87,11 +94,178 @@ def find_risk_flags(text: str) -> List[str]:
         "truncate table",
         "shutdown server",
         "format disk",
-    ]
-    if any(k in text_l for k in destructive_keywords):
-        flags.add("destructive_actions")
+    ],
+}
+
+
+class RiskMatch(NamedTuple):
+    """
+    One keyword hit inside the (lowercased) scanned text.
+    end is exclusive, so text[start:end] == keyword.
+    """
+
+    start: int
+    end: int
+    keyword: str
+    flag: str
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Build a prefix-factored regex for the given literals, e.g.
+    ["token", "top"] -> "t(?:o(?:ken|p))". Longer alternatives win
+    at a given start, so the match is always the longest keyword there.
+    """
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + build(node[ch]) for ch in sorted(k for k in node if k)]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class RiskMatcher:
+    """
+    All risk keyword tables compiled into one automaton, so a text is
+    scanned once for every category instead of once per keyword.
+
+    Uses pyahocorasick when installed. Without it, spans come from a single
+    prefix-factored regex, and flags() keeps using plain substring checks
+    since CPython's re is slower than str.__contains__ for this job. Every
+    backend reports overlapping keywords too, so the flags are identical.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.keywords = {flag: list(words) for flag, words in keywords.items()}
+        self.flag_order: Tuple[str, ...] = tuple(self.keywords)
+        self.max_keyword_len = max(
+            (len(w) for words in self.keywords.values() for w in words), default=0
+        )
+
+        # keyword -> flags it belongs to (one keyword may sit in several tables)
+        owners: Dict[str, Set[str]] = {}
+        for flag, words in self.keywords.items():
+            for w in words:
+                owners.setdefault(w.lower(), set()).add(flag)
+        self._owners = owners
 
-    return list(flags)
+        self._automaton = None
+        self._regex: Optional[re.Pattern] = None
+        # regex backend only: keyword -> every (keyword, flag) that starts
+        # at the same position (its prefixes), since the regex only reports
+        # the longest keyword per start position.
+        self._prefix_hits: Dict[str, List[Tuple[str, str]]] = {}
+
+        if not owners:
+            return
+
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for word, flags in owners.items():
+                automaton.add_word(word, (word, tuple(sorted(flags))))
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            words = sorted(owners)
+            self._regex = re.compile(_trie_pattern(words))
+            for word in words:
+                self._prefix_hits[word] = [
+                    (other, flag)
+                    for other in words
+                    if word.startswith(other)
+                    for flag in sorted(owners[other])
+                ]
+
+    def iter_matches(self, text_l: str) -> Iterator[RiskMatch]:
+        """
+        Yield every keyword occurrence in an already-lowercased text.
+        Order follows the backend (end position for the automaton,
+        start position for the regex); use find_risk_matches() for a
+        sorted list.
+        """
+        if self._automaton is not None:
+            for end, (word, flags) in self._automaton.iter(text_l):
+                start = end - len(word) + 1
+                for flag in flags:
+                    yield RiskMatch(start, end + 1, word, flag)
+        elif self._regex is not None:
+            search = self._regex.search
+            pos = 0
+            while True:
+                m = search(text_l, pos)
+                if m is None:
+                    return
+                start = m.start()
+                for word, flag in self._prefix_hits[m.group()]:
+                    yield RiskMatch(start, start + len(word), word, flag)
+                pos = start + 1
+
+    def flags(self, text_l: str) -> List[str]:
+        """
+        Return the set of flags present in an already-lowercased text,
+        in table order. Stops scanning once every category has matched.
+        """
+        if self._automaton is None:
+            return [
+                flag
+                for flag, words in self.keywords.items()
+                if any(w.lower() in text_l for w in words)
+            ]
+
+        found: Set[str] = set()
+        total = len(self.flag_order)
+        for match in self.iter_matches(text_l):
+            found.add(match.flag)
+            if len(found) == total:
+                break
+        return [f for f in self.flag_order if f in found]
+
+
+_matcher = RiskMatcher(RISK_KEYWORDS)
+
+
+def get_risk_matcher() -> RiskMatcher:
+    return _matcher
+
+
+def set_risk_keywords(keywords: Dict[str, List[str]]) -> RiskMatcher:
+    """
+    Recompile the matcher after the keyword tables change.
+    The new matcher is built first and then swapped in, so concurrent
+    callers see either the old or the new tables, never a mix.
+    """
+    global _matcher, RISK_KEYWORDS
+    new_matcher = RiskMatcher(keywords)
+    RISK_KEYWORDS = new_matcher.keywords
+    _matcher = new_matcher
+    # batch workers were started with the old tables
+    shutdown_batch_pool()
+    return new_matcher
+
+
+def find_risk_matches(text: str) -> List[RiskMatch]:
+    """
+    Return every risk keyword hit in text with its span (positions are
+    in text.lower(), which equals text for ASCII input), sorted by start.
+    """
+    return sorted(_matcher.iter_matches(text.lower()))
+
+
+def find_risk_flags(text: str) -> List[str]:
+    """
+    Very simple keyword-based risk flagging (see RISK_KEYWORDS).
+    Single pass over the text through the compiled RiskMatcher.
+    """
+    return _matcher.flags(text.lower())
 
 
 def classify_risk_level(flags: List[str]) -> str:
@@ -116,10 +290,93 @@ def classify_risk_level(flags: List[str]) -> str:
     return "low"
 
 
+@dataclass
+class ScanContext:
+    """
+    Result of scanning one prompt/response pair, computed once per request
+    and shared by the trust evaluator, the policy engine and the routes.
+    """
+
+    text_l: str  # lowercased "prompt + ' ' + response"
+    matches: List[RiskMatch] = field(default_factory=list)
+    flags: List[str] = field(default_factory=list)
+    risk_level: str = "low"
+
+
+def build_scan_context(prompt: Optional[str], response: Optional[str]) -> ScanContext:
+    """
+    Lowercase the combined prompt/response once, collect every keyword
+    match in a single pass, and derive flags + risk level from it.
+    """
+    text_l = ((prompt or "") + " " + (response or "")).lower()
+    matches = sorted(_matcher.iter_matches(text_l))
+    seen = {m.flag for m in matches}
+    flags = [f for f in _matcher.flag_order if f in seen]
+    return ScanContext(
+        text_l=text_l,
+        matches=matches,
+        flags=flags,
+        risk_level=classify_risk_level(flags),
+    )
+
+
+def merge_scan_contexts(parts: Sequence[ScanContext]) -> ScanContext:
+    """
+    Combine scans of consecutive pieces of one text (e.g. chunks of a
+    large prompt scanned in parallel, plus the response) into the scan of
+    the whole: texts are concatenated, match offsets shifted, flags unioned.
+    """
+    offset = 0
+    matches: List[RiskMatch] = []
+    seen = set()
+    for part in parts:
+        matches.extend(m._replace(start=m.start + offset, end=m.end + offset) for m in part.matches)
+        seen.update(part.flags)
+        offset += len(part.text_l)
+    flags = [f for f in _matcher.flag_order if f in seen]
+    return ScanContext(
+        text_l="".join(part.text_l for part in parts),
+        matches=matches,
+        flags=flags,
+        risk_level=classify_risk_level(flags),
+    )
+
+
+class IncrementalRiskScanner:
+    """
+    Risk matching over text that arrives in pieces (an LLM token stream).
+    The last max_keyword_len - 1 characters are carried over into the next
+    scan, so a keyword split across pieces is still found; each match is
+    reported once, with offsets into the whole (lowercased) text.
+    """
+
+    def __init__(self, matcher: Optional[RiskMatcher] = None):
+        self.matcher = matcher or _matcher
+        self._keep = max(0, self.matcher.max_keyword_len - 1)
+        self._carry = ""
+        self._offset = 0  # position of _carry[0] in the whole text
+
+    def feed(self, text: str) -> List[RiskMatch]:
+        if not text:
+            return []
+        window = self._carry + text.lower()
+        seen = len(self._carry)  # matches ending in here were already reported
+        matches = sorted(
+            m._replace(start=m.start + self._offset, end=m.end + self._offset)
+            for m in self.matcher.iter_matches(window)
+            if m.end > seen
+        )
+        cut = max(0, len(window) - self._keep)
+        self._carry = window[cut:]
+        self._offset += cut
+        return matches
+
+
 def evaluate_trust_and_risk(
     prompt: str,
     response: Optional[str],
     llm_error: Optional[str] = None,
+    ctx: Optional[ScanContext] = None,
 ) -> Dict[str, Any]:
     """
     Evaluate trust and risk for a given prompt/response pair.
@@ -129,11 +386,13 @@ def evaluate_trust_and_risk(
       - risk_level ("low" | "medium" | "high")
       - risk_flags (list[str])
       - explanation (text)
+
+    Pass ctx to reuse an existing scan of the same prompt/response.
     """
-    # Combine prompt + response text for flagging
-    combined = (prompt or "") + " " + (response or "")
-    flags = find_risk_flags(combined)
-    risk_level = classify_risk_level(flags)
+    if ctx is None:
+        ctx = build_scan_context(prompt, response)
+    flags = list(ctx.flags)
+    risk_level = ctx.risk_level
 
     # Simple trust score heuristic:
     # start from 0.9, reduce for errors + risk
@@ -170,3 +429,124 @@ def evaluate_trust_and_risk(
         "risk_flags": flags,
         "explanation": explanation,
     }
+
+
+# ---------------------------------------------------------------------------
+# Batch evaluation
+# ---------------------------------------------------------------------------
+
+# Batches smaller than this are evaluated in-process: shipping them to
+# worker processes costs more than the scan itself.
+BATCH_PROCESS_THRESHOLD = 512
+# Items per task sent to a worker process
+BATCH_CHUNK_SIZE = 256
+
+BatchItem = Tuple[str, Optional[str], Optional[str]]
+
+_batch_pool: Optional[ProcessPoolExecutor] = None
+_batch_pool_lock = threading.Lock()
+
+
+def _init_batch_worker(
+    keywords: Dict[str, List[str]], policy: Tuple[Dict[str, Any], str, Optional[int]]
+) -> None:
+    """
+    Process-pool initializer: make sure the worker scans with the same
+    keyword tables and policy rules as the parent (both may have changed
+    at runtime, and a spawned worker would otherwise re-read the defaults).
+    """
+    global _matcher, RISK_KEYWORDS
+    _matcher = RiskMatcher(keywords)
+    RISK_KEYWORDS = _matcher.keywords
+
+    # imported here: the policy engine is built on this module
+    from app.policy.engine import PolicyTable, activate_policy_table
+
+    spec, source, mtime = policy
+    activate_policy_table(PolicyTable(spec, source=source, mtime=mtime))
+
+
+def _evaluate_chunk(items: List[BatchItem]) -> List[Dict[str, Any]]:
+    return [evaluate_trust_and_risk(p, r, e) for p, r, e in items]
+
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    from app.policy.engine import get_policy_table
+
+    global _batch_pool
+    # outside the lock: it may swap in a recompiled table, which retires
+    # the pool
+    table = get_policy_table()
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                initializer=_init_batch_worker,
+                initargs=(RISK_KEYWORDS, (table.spec, table.source, table.mtime)),
+            )
+        return _batch_pool
+
+
+def shutdown_batch_pool() -> None:
+    """
+    Retire the batch worker processes (called on app shutdown and whenever
+    the keyword tables or policy rules change). Work already submitted to
+    the old pool still finishes there; its workers exit once it is done.
+    The next large batch starts a fresh pool.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        pool, _batch_pool = _batch_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def map_batch_chunks(
+    fn: Callable[[List[Any]], List[Any]],
+    items: List[Any],
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> List[Any]:
+    """
+    Apply fn to items in chunks on the batch process pool and return the
+    flattened results in input order. fn must be a module-level function
+    (it is pickled by reference). Runs in-process on single-core hosts.
+    """
+    if (os.cpu_count() or 1) < 2 or len(items) <= chunk_size:
+        return fn(items)
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results: List[Any] = []
+    # Executor.map preserves input order
+    for chunk_result in _get_batch_pool().map(fn, chunks):
+        results.extend(chunk_result)
+    return results
+
+
+def _normalize_batch_item(item: Sequence[Optional[str]]) -> BatchItem:
+    if len(item) == 2:
+        prompt, response = item
+        return (prompt or "", response, None)
+    if len(item) == 3:
+        prompt, response, llm_error = item
+        return (prompt or "", response, llm_error)
+    raise ValueError(
+        "Batch items must be (prompt, response) or (prompt, response, error)"
+    )
+
+
+def evaluate_trust_and_risk_batch(
+    items: Sequence[Sequence[Optional[str]]],
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate many (prompt, response[, llm_error]) tuples at once.
+
+    Results are in input order and identical to calling
+    evaluate_trust_and_risk() on each item. Large batches are split into
+    chunks of BATCH_CHUNK_SIZE and fanned out over a process pool so the
+    scan is not limited to one core by the GIL.
+    """
+    normalized = [_normalize_batch_item(item) for item in items]
+
+    if len(normalized) < BATCH_PROCESS_THRESHOLD:
+        return _evaluate_chunk(normalized)
+    return map_batch_chunks(_evaluate_chunk, normalized)
@@ -0,0 +1,141 @@
+"""
+Runs/s of the /agent/run write path (AgentRun + Approval + Action rows)
+on a scratch SQLite file, from concurrent request threads:
+
+  1) rollback journal, synchronous=FULL, 3 commits per run (before)
+  2) WAL + synchronous=NORMAL, 3 commits per run
+  3) WAL + synchronous=NORMAL, 1 commit per run (_persist_run)
+  4) WAL + synchronous=NORMAL, batch writer (one commit per batch)
+
+Run from backend/:
+    python -m benchmarks.bench_db_writes --runs 2000 --threads 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.db import models  # noqa: F401  (registers the tables)
+from app.db.database import _sqlite_pragmas
+from app.db.models import Action, AgentRun, Approval
+from app.db.writer import BatchWriter
+from app.routes.agent import _persist_run, _write_run
+
+ACTIONS = [{"type": "email_suggestion", "payload": {"to": "ops@example.com"}}]
+
+
+def _run(i: int) -> AgentRun:
+    return AgentRun(
+        prompt=f"Summarise the incident report #{i} for the ops team",
+        response="Here is a short summary of the incident. " * 8,
+        model="bench",
+        trust_score=0.8,
+        risk_level="medium" if i % 3 == 0 else "low",
+        policy_decision="allow",
+        policy_risk_level="low",
+        risk_flags_json=json.dumps(["privacy_sensitive"] if i % 3 == 0 else []),
+        policy_reasons_json="[]",
+        actions_status="done",
+    )
+
+
+def _persist_three_commits(engine, i: int) -> None:
+    # the old _persist_run: run, approval and actions committed separately
+    with Session(engine) as session:
+        run = _run(i)
+        session.add(run)
+        session.commit()
+        session.refresh(run)
+        if i % 3 == 0:
+            session.add(Approval(agent_run_id=run.id, status="pending"))
+            session.commit()
+        for act in ACTIONS:
+            session.add(Action(agent_run_id=run.id, type=act["type"],
+                               payload_json=json.dumps(act["payload"]), status="pending"))
+        session.commit()
+
+
+def _persist_single_commit(engine, i: int) -> None:
+    with Session(engine) as session:
+        _persist_run(session, _run(i), i % 3 == 0, ACTIONS, {})
+
+
+def _make_engine(path: str, tuned: bool):
+    engine = create_engine(f"sqlite:///{path}")
+    if tuned:
+        event.listen(engine, "connect", _sqlite_pragmas)
+    else:
+        @event.listens_for(engine, "connect")
+        def _defaults(dbapi_connection, _record):
+            dbapi_connection.execute("PRAGMA journal_mode=DELETE")
+            dbapi_connection.execute("PRAGMA synchronous=FULL")
+            dbapi_connection.execute("PRAGMA busy_timeout=5000")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _measure(label: str, runs: int, threads: int, tuned: bool,
+             persist: Callable[[object, int], None]) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _make_engine(os.path.join(tmp, "bench.db"), tuned)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(partial(persist, engine), range(runs)))
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+    rate = runs / elapsed
+    print(f"{label:44} {elapsed:7.2f} s  {rate:8.0f} runs/s")
+    return rate
+
+
+def _measure_batched(runs: int, threads: int, max_delay_ms: float) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _make_engine(os.path.join(tmp, "bench.db"), tuned=True)
+        writer = BatchWriter(engine, max_size=256, max_delay_ms=max_delay_ms)
+        writer.start()
+
+        def persist(i: int) -> None:
+            writer.submit(
+                partial(_write_run, run=_run(i), needs_approval=i % 3 == 0,
+                        suggested_actions=ACTIONS, mapping={})
+            ).result()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(persist, range(runs)))
+        elapsed = time.perf_counter() - start
+        writer.stop()
+        stats = writer.stats()
+        engine.dispose()
+    rate = runs / elapsed
+    label = f"WAL, batch writer ({max_delay_ms:g} ms, avg batch {stats['avg_batch_size']:.0f})"
+    print(f"{label:44} {elapsed:7.2f} s  {rate:8.0f} runs/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent requests")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{args.runs} runs from {args.threads} threads")
+    base = _measure("rollback journal, sync FULL, 3 commits", args.runs, args.threads, False,
+                    _persist_three_commits)
+    _measure("WAL, sync NORMAL, 3 commits", args.runs, args.threads, True, _persist_three_commits)
+    single = _measure("WAL, sync NORMAL, 1 commit", args.runs, args.threads, True,
+                      _persist_single_commit)
+    batched = _measure_batched(args.runs, args.threads, args.max_delay_ms)
+    print(f"speed-up vs before: 1 commit x{single / base:.1f}, batched x{batched / base:.1f}")
+
+
+if __name__ == "__main__":
+    main()
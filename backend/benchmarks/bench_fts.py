@@ -0,0 +1,124 @@
+"""
+Latency of /logs/fulltext queries (app/db/fts.py) on a scratch database
+with --runs synthetic runs: a rare and a common term, ranked and
+newest-first, first page and a page deep into the results.
+
+Run from backend/:
+    python -m benchmarks.bench_fts --runs 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import Any, Callable, List
+
+WORDS = (
+    "summarise incident report invoice payroll export customer ticket deploy "
+    "rollback database backup migration schema outage latency alert policy "
+    "refund account password token email vendor contract audit review"
+).split()
+CUSTOMERS = [f"cust{i:05d}" for i in range(20000)]
+
+QUERIES = [
+    # (label, q, order)
+    ("rare term, ranked", "cust00042", "rank"),
+    ("rare term, newest", "cust00042", "recent"),
+    ("common term, newest", "invoice", "recent"),
+    ("common term, ranked", "invoice", "rank"),
+    ("two terms, newest", "payroll export", "recent"),
+    ("prefix, newest", "migrat*", "recent"),
+]
+
+
+def _text(rng: random.Random, n: int) -> str:
+    words = rng.choices(WORDS, k=n)
+    words.insert(rng.randrange(n), rng.choice(CUSTOMERS))
+    return " ".join(words)
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    workdir = tempfile.mkdtemp(prefix="bench-fts-")
+    os.makedirs(os.path.join(workdir, "data"))
+    os.chdir(workdir)  # the app's DB path is relative to the working dir
+
+    from sqlalchemy import text
+    from sqlmodel import Session
+
+    from app.db.database import engine, init_db
+    from app.db.fts import match_query, rebuild_fts, search_runs
+
+    init_db()
+    rng = random.Random(args.seed)
+    start = datetime.utcnow() - timedelta(days=365)
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        # bulk load with the sync triggers off, then index in one pass
+        conn.execute(text("DROP TRIGGER agentrun_fts_ai"))
+        batch = []
+        for i in range(args.runs):
+            batch.append({
+                "created_at": start + timedelta(seconds=i * 30), "prompt": _text(rng, 12),
+                "response": _text(rng, 60), "model": "bench",
+            })
+            if len(batch) == 10_000 or i == args.runs - 1:
+                conn.execute(
+                    text(
+                        "INSERT INTO agentrun (created_at, prompt, response, model, trust_score, "
+                        "risk_level, policy_decision, policy_risk_level, risk_flags_json, "
+                        "policy_reasons_json) VALUES (:created_at, :prompt, :response, :model, "
+                        "0.8, 'low', 'allow', 'low', '[]', '[]')"
+                    ),
+                    batch,
+                )
+                batch = []
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_fts(conn)  # also puts the insert trigger back
+    print(f"{args.runs} runs: load {load_s:.1f} s, index {time.perf_counter() - t0:.1f} s")
+
+    with Session(engine) as session:
+        print(f"{'query':24} {'page':>5} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, q, order in QUERIES:
+            match = match_query(q)
+            rows = search_runs(session, match, order, None, 20)
+            deep = None
+            for _ in range(50):  # walk 50 pages to a deep cursor
+                if len(rows) <= 20:
+                    break
+                last = rows[19]
+                deep = [last.score, last.id] if order == "rank" else [last.id]
+                rows = search_runs(session, match, order, deep, 20)
+            for page, after in (("1", None), ("51", deep)):
+                if page == "51" and after is None:
+                    continue
+                hits = len(search_runs(session, match, order, after, 20))
+                times = sorted(_time(lambda: search_runs(session, match, order, after, 20), args.repeat))
+                p95 = times[min(len(times) - 1, int(0.95 * len(times)))]
+                print(f"{label:24} {page:>5} {hits:5d} {statistics.median(times):8.2f} {p95:8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
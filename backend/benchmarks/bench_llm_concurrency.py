@@ -0,0 +1,84 @@
+"""
+Throughput of the blocking safe_generate() on a 40-thread pool (what a
+sync FastAPI route gets from Starlette's threadpool) versus
+safe_generate_async() on the shared pooled client.
+
+--backend server (default) starts benchmarks.fake_llm_server in a
+subprocess and goes through the real HTTP client; --backend stub uses an
+in-process stub backend with the same latency, which measures the
+concurrency limits alone (on small hosts the loopback network, not the
+client, caps the server run at a few dozen connections). Run from backend/:
+    python -m benchmarks.bench_llm_concurrency --calls 400 --latency-ms 200
+    python -m benchmarks.bench_llm_concurrency --backend stub --calls 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import fake_llm_server
+
+THREADPOOL_SIZE = 40  # Starlette / anyio default
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--in-flight", type=int, default=None,
+                        help="override LLM_MAX_IN_FLIGHT for the async run")
+    parser.add_argument("--backend", choices=("server", "stub"), default="server")
+    args = parser.parse_args()
+
+    server = None
+    if args.backend == "server":
+        server, base_url = fake_llm_server.spawn(["--latency-ms", str(args.latency_ms)])
+        os.environ["GROQ_API_KEY"] = "fake"
+        os.environ["GROQ_BASE_URL"] = base_url
+    else:
+        os.environ["LLM_PROVIDERS"] = json.dumps(
+            [{"name": "stub", "type": "stub", "latency": {"base_ms": args.latency_ms}}]
+        )
+        os.environ["LLM_HEDGE_DELAY_MS"] = "off"
+    try:
+        # measure the client, not the local rate limit
+        os.environ.setdefault("LLM_RATE_LIMIT_RPS", "0")
+        if args.in_flight:
+            os.environ["LLM_MAX_IN_FLIGHT"] = str(args.in_flight)
+
+        # import after the env is set: the client reads it at import time
+        from app.llm import client as llm_client
+
+        prompts = [f"prompt {i}" for i in range(args.calls)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+            results = list(pool.map(llm_client.safe_generate, prompts))
+        sync_s = time.perf_counter() - start
+        assert all(r["error"] is None for r in results), results[0]
+
+        async def run_async() -> float:
+            t0 = time.perf_counter()
+            res = await asyncio.gather(
+                *(llm_client.safe_generate_async(p) for p in prompts)
+            )
+            elapsed = time.perf_counter() - t0
+            assert all(r["error"] is None for r in res), res[0]
+            await llm_client.close_async_client()
+            return elapsed
+
+        async_s = asyncio.run(run_async())
+
+        print(f"{args.calls} calls, 2 LLM round trips each, {args.latency_ms:.0f} ms per round trip")
+        print(f"sync  ({THREADPOOL_SIZE} threads)  : {sync_s:6.2f} s  {args.calls / sync_s:8.1f} calls/s")
+        print(f"async ({llm_client.LLM_MAX_IN_FLIGHT} in flight): {async_s:6.2f} s  {args.calls / async_s:8.1f} calls/s")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Latency benchmark for POST /policy/check (dry-run pre-screening).
+
+Target: p99 under 5 ms per single-pair request through the in-process
+TestClient (about 1 ms of that is the test transport itself), so one
+worker comfortably covers the ~2k req/s the upstream gateway sends.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_policy_check
+"""
+import random
+import statistics
+import time
+from typing import List
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.policy.engine import check_policy_fast
+
+P99_TARGET_MS = 5.0
+
+PROMPTS = [
+    "Summarise last quarter's churn numbers for the board deck.",
+    "Reset the admin password for the billing service.",
+    "Export customer data with phone numbers for the CRM migration.",
+    "Drop table audit_log and start fresh.",
+    "Draft a polite reminder email about the team offsite.",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def report(name: str, samples_ms: List[float]) -> None:
+    print(
+        f"{name:<28} n={len(samples_ms):<6} "
+        f"p50={statistics.median(samples_ms):.3f} ms  "
+        f"p95={percentile(samples_ms, 95):.3f} ms  "
+        f"p99={percentile(samples_ms, 99):.3f} ms"
+    )
+
+
+def main() -> None:
+    rng = random.Random(1)
+    pairs = [(rng.choice(PROMPTS), rng.choice(PROMPTS) * 8) for _ in range(5000)]
+
+    samples = []
+    for prompt, response in pairs:
+        start = time.perf_counter()
+        check_policy_fast(prompt, response)
+        samples.append((time.perf_counter() - start) * 1000)
+    report("check_policy_fast()", samples)
+
+    with TestClient(app) as client:
+        samples = []
+        for prompt, response in pairs[:2000]:
+            body = {"prompt": prompt, "response": response}
+            start = time.perf_counter()
+            client.post("/policy/check", json=body)
+            samples.append((time.perf_counter() - start) * 1000)
+        report("POST /policy/check (1 pair)", samples)
+        p99 = percentile(samples, 99)
+
+        samples = []
+        for i in range(0, 2000, 100):
+            body = {"items": [{"prompt": p, "response": r} for p, r in pairs[i:i + 100]]}
+            start = time.perf_counter()
+            client.post("/policy/check", json=body)
+            samples.append((time.perf_counter() - start) * 1000)
+        report("POST /policy/check (100)", samples)
+
+    status = "OK" if p99 <= P99_TARGET_MS else "ABOVE TARGET"
+    print(f"single-pair p99 {p99:.3f} ms vs target {P99_TARGET_MS} ms: {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmark: compiled RiskMatcher vs the old per-keyword substring scan.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_risk_matcher
+"""
+import random
+import time
+from typing import Callable, Dict, List
+
+import app.trust.evaluator as evaluator
+from app.trust.evaluator import RISK_KEYWORDS, RiskMatcher, find_risk_flags
+
+SIZES = [1_000, 100_000, 10_000_000]
+
+FILLER_WORDS = [
+    "the", "quarterly", "report", "for", "our", "customer", "success", "team",
+    "shows", "account", "growth", "and", "server", "uptime", "numbers", "table",
+    "delete", "card", "review", "pending", "with", "data", "across", "regions",
+]
+
+
+def legacy_find_risk_flags(text: str) -> List[str]:
+    """The pre-matcher implementation: one substring scan per keyword."""
+    text_l = text.lower()
+    return [
+        flag
+        for flag, words in RISK_KEYWORDS.items()
+        if any(k in text_l for k in words)
+    ]
+
+
+def make_text(size: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    words: List[str] = []
+    length = 0
+    while length < size:
+        w = rng.choice(FILLER_WORDS)
+        words.append(w)
+        length += len(w) + 1
+    text = " ".join(words)[:size]
+    # one real hit near the end, so the scans cannot stop early
+    return text[:-20] + " phone number "
+
+
+def bench(fn: Callable[[str], List[str]], text: str) -> float:
+    reps = max(3, int(2_000_000 / len(text)))
+    start = time.perf_counter()
+    for _ in range(reps):
+        fn(text)
+    return (time.perf_counter() - start) / reps * 1000
+
+
+def main() -> None:
+    saved = evaluator.ahocorasick
+    evaluator.ahocorasick = None
+    regex_matcher = RiskMatcher(RISK_KEYWORDS)
+    evaluator.ahocorasick = saved
+
+    candidates: Dict[str, Callable[[str], List[str]]] = {
+        "legacy (per-keyword)": legacy_find_risk_flags,
+        "find_risk_flags": find_risk_flags,
+        "regex spans": lambda t: [m.flag for m in regex_matcher.iter_matches(t.lower())],
+    }
+    backend = "aho-corasick" if evaluator.ahocorasick is not None else "regex"
+    print(f"find_risk_flags backend: {backend}")
+    print(f"{'size':>10}  " + "  ".join(f"{name:>22}" for name in candidates) + "  speedup")
+
+    for size in SIZES:
+        text = make_text(size)
+        expected = set(legacy_find_risk_flags(text))
+        timings = []
+        for fn in candidates.values():
+            assert set(fn(text)) == expected
+            timings.append(bench(fn, text))
+        speedup = timings[0] / timings[1]
+        print(
+            f"{size:>10}  "
+            + "  ".join(f"{t:>19.3f} ms" for t in timings)
+            + f"  {speedup:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
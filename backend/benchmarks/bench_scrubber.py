@@ -0,0 +1,85 @@
+"""
+Benchmark: single-pass Scrubber vs the old chain of four re.sub calls.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_scrubber
+"""
+import random
+import re
+import time
+from typing import Callable, List
+
+from app.llm.scrubber import scrub_stream, scrub_text
+
+SIZES = [64, 1_000, 100_000, 5_000_000]
+
+WORDS = [
+    "please", "send", "the", "invoice", "to", "our", "finance", "team",
+    "before", "friday", "and", "copy", "account", "manager", "thanks",
+]
+PII = ["priya.k@example.com", "9876543210", "1234 5678 9012", "ABCDE1234F"]
+
+
+# Pattern strings as they were before the single-pass engine
+LEGACY_PATTERNS = [
+    r"\b\d{4}\s?\d{4}\s?\d{4}\b",
+    r"\b\d{10}\b",
+    r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    r"\b[A-Z]{5}\d{4}[A-Z]\b",
+]
+
+
+def legacy_scrub_text(text: str) -> str:
+    """The pre-engine implementation: one re.sub per pattern string."""
+    if not text:
+        return text
+    scrubbed = text
+    for pattern in LEGACY_PATTERNS:
+        scrubbed = re.sub(pattern, "[REDACTED]", scrubbed)
+    return scrubbed
+
+
+def make_text(size: int, pii_rate: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words: List[str] = []
+    length = 0
+    while length < size:
+        w = rng.choice(PII) if rng.random() < pii_rate else rng.choice(WORDS)
+        words.append(w)
+        length += len(w) + 1
+    return " ".join(words)[:size]
+
+
+def bench(fn: Callable[[str], str], text: str) -> float:
+    reps = max(3, int(5_000_000 / len(text)))
+    start = time.perf_counter()
+    for _ in range(reps):
+        fn(text)
+    return (time.perf_counter() - start) / reps * 1_000_000
+
+
+def streamed(text: str, chunk: int = 64 * 1024) -> str:
+    chunks = (text[i:i + chunk] for i in range(0, len(text), chunk))
+    return "".join(scrub_stream(chunks))
+
+
+def main() -> None:
+    print(
+        f"{'pii':>5}  {'size':>10}  {'legacy':>14}  {'scrub_text':>14}  "
+        f"{'scrub_stream':>14}  speedup"
+    )
+    for pii_rate in (0.0, 0.02):
+        for size in SIZES:
+            text = make_text(size, pii_rate)
+            assert scrub_text(text) == legacy_scrub_text(text)
+            legacy = bench(legacy_scrub_text, text)
+            single = bench(scrub_text, text)
+            stream = bench(streamed, text)
+            print(
+                f"{pii_rate:>5.0%}  {size:>10}  {legacy:>11.1f} us  {single:>11.1f} us  "
+                f"{stream:>11.1f} us  {legacy / single:6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
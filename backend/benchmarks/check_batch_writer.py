@@ -0,0 +1,97 @@
+"""
+Check that a failed batch of the batch writer loses none of its good
+writes: a batch of /agent/run writes with one bad write in the middle is
+rolled back and retried write by write, and every good run must then be
+stored exactly once, with its Approval, Action, flag rows and rollup
+count on its own id. Exits non-zero on a mismatch.
+
+Run from backend/:
+    python -m benchmarks.check_batch_writer
+"""
+import json
+import os
+import sys
+import tempfile
+from functools import partial
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.db.models import Action, AgentRun, AgentRunFlag, AgentRunRollup, Approval
+from app.db.rollups import GRANULARITIES
+from app.db.writer import BatchWriter
+from app.routes.agent import _write_run
+from benchmarks.bench_db_writes import ACTIONS, _make_engine, _run
+
+BATCH = 8
+BAD = 3  # index of the write that fails
+
+
+def _bad_write(session: Session) -> int:
+    raise RuntimeError("injected write failure")
+
+
+def main() -> int:
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _make_engine(os.path.join(tmp, "check.db"), tuned=True)
+        # a long delay so every write lands in one batch
+        writer = BatchWriter(engine, max_size=BATCH, max_delay_ms=500)
+        writer.start()
+        futures = [
+            writer.submit(_bad_write)
+            if i == BAD
+            else writer.submit(
+                partial(_write_run, run=_run(i), needs_approval=True,
+                        suggested_actions=ACTIONS, mapping={})
+            )
+            for i in range(BATCH)
+        ]
+        ids = {}
+        for i, future in enumerate(futures):
+            try:
+                ids[i] = future.result(timeout=10)
+            except RuntimeError:
+                if i != BAD:
+                    failures.append(f"write {i} failed")
+        writer.stop()
+
+        with Session(engine) as session:
+            for i, run_id in ids.items():
+                run = session.get(AgentRun, run_id)
+                if run is None or run.prompt != _run(i).prompt:
+                    failures.append(f"write {i}: run {run_id} missing or another run")
+                    continue
+                approvals = session.exec(
+                    select(func.count()).where(Approval.agent_run_id == run_id)
+                ).one()
+                actions = session.exec(
+                    select(func.count()).where(Action.agent_run_id == run_id)
+                ).one()
+                flags = session.exec(
+                    select(func.count()).where(AgentRunFlag.agent_run_id == run_id)
+                ).one()
+                expected_flags = len(json.loads(_run(i).risk_flags_json))
+                if (approvals, actions, flags) != (1, len(ACTIONS), expected_flags):
+                    failures.append(
+                        f"write {i}: {approvals} approvals, {actions} actions, {flags} flags"
+                    )
+            runs = session.exec(select(func.count()).select_from(AgentRun)).one()
+            counted = session.exec(
+                select(func.sum(AgentRunRollup.count)).where(
+                    AgentRunRollup.granularity == next(iter(GRANULARITIES))
+                )
+            ).one() or 0
+        engine.dispose()
+
+    print(f"{len(ids)} of {BATCH - 1} good writes acknowledged, {runs} runs stored, "
+          f"{counted} counted in the rollup; writer stats {writer.stats()}")
+    if runs != BATCH - 1 or counted != runs:
+        failures.append(f"expected {BATCH - 1} runs stored and counted")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Exercise the LLM call guard (retries, circuit breaker, rate limit) against
+the fake provider with injected 429s. Prints what happened in each phase
+and the /llm/health view; exits non-zero if the guard misbehaves.
+
+Run from backend/:
+    python -m benchmarks.check_llm_resilience
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks import fake_llm_server
+
+BREAKER_RESET_SECONDS = 2.0
+
+
+def main() -> int:
+    server, base_url = fake_llm_server.spawn(["--latency-ms", "20"])
+    try:
+        os.environ.update(
+            {
+                "GROQ_API_KEY": "fake",
+                "GROQ_BASE_URL": base_url,
+                "LLM_BACKOFF_BASE_SECONDS": "0.05",
+                "LLM_BACKOFF_MAX_SECONDS": "0.5",
+                "LLM_BREAKER_FAILURES": "5",
+                "LLM_BREAKER_RESET_SECONDS": str(BREAKER_RESET_SECONDS),
+                "LLM_RATE_LIMIT_RPS": "0",
+            }
+        )
+        # import after the env is set: the client reads it at import time
+        from app.llm import client as llm_client
+        from app.llm.resilience import CircuitBreaker, LLMCallGuard, LLMUnavailableError
+
+        guard = llm_client.router.providers[0].guard
+        fake = httpx.Client(base_url=base_url)
+        failures = []
+
+        def set_fake(**config):
+            fake.post("/_fake/config", json=config).raise_for_status()
+
+        # 1) 30% of calls get a 429: retries should hide nearly all of them
+        set_fake(error_rate=0.3, error_status=429)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(llm_client.safe_generate, [f"p{i}" for i in range(50)]))
+        errors = sum(r["error"] is not None for r in results)
+        print(f"30% 429s : {errors}/50 calls failed, {guard.retries} retries")
+        if errors > 2:
+            failures.append("retries did not absorb transient 429s")
+
+        # 2) provider fully down: breaker opens, later calls fail fast
+        set_fake(error_rate=1.0, error_status=503)
+        for i in range(3):
+            llm_client.safe_generate(f"down {i}")
+        state = guard.breaker.snapshot()["state"]
+        t0 = time.perf_counter()
+        fast = llm_client.safe_generate("while open")
+        fast_ms = (time.perf_counter() - t0) * 1000
+        print(f"down     : circuit {state}, next call failed in {fast_ms:.1f} ms: {fast['error']}")
+        if state != "open" or fast_ms > 50:
+            failures.append("breaker did not open / fail fast")
+
+        # 3) provider back: after the reset timeout one probe closes it
+        set_fake(error_rate=0.0)
+        time.sleep(BREAKER_RESET_SECONDS + 0.1)
+        ok = llm_client.safe_generate("probe")
+        state = guard.breaker.snapshot()["state"]
+        print(f"recovered: circuit {state}, error={ok['error']}")
+        if state != "closed" or ok["error"]:
+            failures.append("breaker did not close after recovery")
+
+        # 4) local token bucket
+        bucket_guard = LLMCallGuard(
+            max_in_flight=4, rate=20, burst=5, max_rate_wait=0.2,
+            max_retries=0, backoff_base=0.1, backoff_max=1,
+            breaker=CircuitBreaker(100, 1),
+        )
+        def one(_):
+            try:
+                bucket_guard.call(lambda: None)
+                return True
+            except LLMUnavailableError:
+                return False
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(20) as pool:
+            outcomes = list(pool.map(one, range(20)))
+        elapsed = time.perf_counter() - t0
+        sent, rejected = sum(outcomes), outcomes.count(False)
+        print(f"bucket   : 20 at once, 20/s burst 5, max wait 0.2 s -> "
+              f"{sent} sent, {rejected} rejected in {elapsed:.2f} s")
+        if rejected == 0:
+            failures.append("token bucket never pushed back")
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        print("health   :", TestClient(app).get("/llm/health").json())
+    finally:
+        server.terminate()
+        server.wait()
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
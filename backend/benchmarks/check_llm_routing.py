@@ -0,0 +1,134 @@
+"""
+Routing decisions of the LLM router against in-process stub providers
+with fixed latency profiles (no network, seeded, so runs are repeatable):
+
+  1) traffic goes to the fastest healthy backend
+  2) hedging cuts the tail of a backend with occasional slow calls
+  3) a failing backend is fallen back from and then routed around
+  4) once it recovers, it gets the traffic back
+
+Run from backend/:
+    python -m benchmarks.check_llm_routing
+"""
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+from app.llm.providers import LatencyProfile, StubProvider
+from app.llm.resilience import CircuitBreaker, LLMCallGuard
+from app.llm.router import LLMRouter
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def _guard(reset_timeout: float) -> LLMCallGuard:
+    return LLMCallGuard(
+        max_in_flight=100, rate=0, burst=1, max_rate_wait=0,
+        max_retries=0, backoff_base=0.01, backoff_max=0.01,
+        breaker=CircuitBreaker(failure_threshold=5, reset_timeout=reset_timeout),
+    )
+
+
+def _stub(
+    name: str, error_rate: float = 0.0, reset_timeout: float = 60, **latency
+) -> StubProvider:
+    return StubProvider(
+        name, _guard(reset_timeout), model=f"{name}-model",
+        latency=LatencyProfile(**latency), error_rate=error_rate, seed=7,
+    )
+
+
+async def _run(router: LLMRouter, calls: int, concurrency: int = 10) -> List[float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            await router.chat_async(MESSAGES)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main() -> int:
+    failures = []
+
+    # 1) fastest healthy backend wins
+    router = LLMRouter(
+        [_stub("slow", base_ms=120), _stub("fast", base_ms=20), _stub("medium", base_ms=60)],
+        hedging=False, min_samples=5,
+    )
+    asyncio.run(_run(router, 200))
+    print(f"ranking  : wins {router.wins}, order {[p.name for p in router.ranked()]}")
+    if router.wins["fast"] < 170:
+        failures.append("fastest backend did not get the traffic")
+
+    # 2) hedging: primary has a 10% tail of +300 ms
+    def tail_router(hedge_ms):
+        return LLMRouter(
+            [_stub("tail", base_ms=20, slow_ratio=0.1, slow_ms=300),
+             _stub("steady", base_ms=60)],
+            hedge_delay_ms=hedge_ms, hedging=hedge_ms is not None, min_samples=1000,
+        )
+
+    plain = asyncio.run(_run(tail_router(None), 300))
+    hedged_router = tail_router(80)
+    hedged = asyncio.run(_run(hedged_router, 300))
+    print(
+        f"hedging  : p50 {statistics.median(plain):.0f} -> {statistics.median(hedged):.0f} ms, "
+        f"p99 {_pct(plain, 0.99):.0f} -> {_pct(hedged, 0.99):.0f} ms, "
+        f"{hedged_router.hedges} hedges, {hedged_router.hedge_wins} won by the hedge"
+    )
+    if not _pct(hedged, 0.99) < _pct(plain, 0.99) / 2:
+        failures.append("hedging did not cut the tail")
+
+    # 3) fallback: the fast backend starts failing every call
+    router = LLMRouter(
+        [_stub("broken", base_ms=10, error_rate=1.0), _stub("backup", base_ms=40)],
+        hedging=False, min_samples=5,
+    )
+    asyncio.run(_run(router, 100))
+    broken = router.providers[0]
+    print(
+        f"fallback : 100/100 answered, {router.fallbacks} fallbacks, "
+        f"broken circuit {broken.guard.breaker.state}, order {[p.name for p in router.ranked()]}"
+    )
+    if router.fallbacks > 20 or router.ranked()[0].name != "backup":
+        failures.append("failing backend was not routed around")
+
+    # 4) recovery: the failing backend comes back after its stats and
+    # breaker timeout have run out
+    router = LLMRouter(
+        [_stub("flaky", base_ms=10, error_rate=1.0, reset_timeout=0.2),
+         _stub("backup", base_ms=40)],
+        hedging=False, min_samples=5, stats_max_age=0.5,
+    )
+    asyncio.run(_run(router, 100))
+    flaky = router.providers[0]
+    flaky.error_rate = 0.0
+    time.sleep(0.6)
+    before = router.wins["flaky"]
+    asyncio.run(_run(router, 200))
+    print(
+        f"recovery : flaky won {router.wins['flaky'] - before}/200 after recovering, "
+        f"circuit {flaky.guard.breaker.state}, order {[p.name for p in router.ranked()]}"
+    )
+    if router.wins["flaky"] - before < 150 or router.ranked()[0].name != "flaky":
+        failures.append("recovered backend did not get the traffic back")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Checks that the list routes are served from indexes: calls each route
+against a scratch database (migrated like a real one), captures the
+statements it runs and fails if SQLite's plan for any SELECT scans a
+table or sorts in a temp b-tree, or if the route runs more statements
+than expected (an N+1 creeping back in).
+
+Run from backend/:
+    python -m benchmarks.check_query_plans
+"""
+import json
+import os
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+# Routes whose queries must be index-only:
+# (method, path, name, max statements per call)
+ROUTES = [
+    ("GET", "/logs/recent?limit=20", "logs recent", 1),
+    ("GET", "/logs/recent?limit=20&cursor={older}", "logs recent older", 1),
+    ("GET", "/logs/recent?limit=20&cursor={newer}", "logs recent newer", 1),
+    ("GET", "/logs/search?flag=security_sensitive&limit=20", "search flag", 1),
+    ("GET", "/logs/search?flag=security_sensitive&flag=destructive_actions&start={since}&limit=20",
+     "search two flags", 1),
+    ("GET", "/logs/search?flag=security_sensitive&limit=20&cursor={older}", "search flag older", 1),
+    ("GET", "/logs/search?risk_level=high&limit=20", "search risk level", 1),
+    ("GET", "/logs/search?policy_decision=block&start={since}&limit=20", "search decision", 1),
+    ("GET", "/logs/search?model=m&limit=20&cursor={older}", "search model older", 1),
+    ("GET", "/logs/analytics", "analytics", 1),
+    ("GET", "/logs/analytics?granularity=hour&start={since}", "analytics range", 1),
+    ("GET", "/actions/all?limit=20", "actions all", 1),
+    ("GET", "/actions/all?status=pending&limit=20", "actions by status", 1),
+    ("GET", "/actions/all?status=pending&limit=20&cursor={older}", "actions by status older", 1),
+    ("GET", "/actions/by-run/{run_id}", "actions by run", 1),
+    ("GET", "/actions/by-run/{run_id}?limit=1&cursor={newer}", "actions by run newer", 1),
+    ("GET", "/approvals/pending?limit=20", "approvals pending", 1),
+    ("GET", "/approvals/all?limit=20", "approvals all", 1),
+    ("GET", "/approvals/all?status=approved&limit=20", "approvals by status", 1),
+    ("GET", "/approvals/all?limit=20&cursor={older}", "approvals all older", 1),
+    ("GET", "/approvals/all?status=approved&limit=20&cursor={newer}", "approvals status newer", 1),
+    # UPDATE + joined read-back
+    ("POST", "/approvals/{approval_id}/approve", "approve", 2),
+    ("POST", "/approvals/{approval_id}/reject", "reject", 2),
+]
+
+SEED_RUNS = 2000
+
+
+def _bad_plan(detail: str) -> bool:
+    # "SCAN t USING INDEX ix" walks an index in order: fine.
+    # "SCAN t" alone is a full table scan; a temp b-tree is a sort.
+    if "USE TEMP B-TREE" in detail:
+        return True
+    return detail.startswith("SCAN ") and "USING" not in detail
+
+
+def main() -> int:
+    warnings.filterwarnings("ignore")
+    workdir = tempfile.mkdtemp(prefix="query-plans-")
+    os.makedirs(os.path.join(workdir, "data"))
+    os.chdir(workdir)  # the app's DB path is relative to the working dir
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, text
+    from sqlmodel import Session, select
+
+    from app.db.database import engine
+    from app.db.models import Action, AgentRun, Approval
+    from app.db.flags import backfill_flags
+    from app.db.rollups import rebuild_rollups
+    from app.routes.pagination import encode_cursor
+    from app.main import app
+
+    captured: List[Tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    with TestClient(app) as client:  # startup: create_all + migrations
+        start = datetime.utcnow() - timedelta(days=30)
+        with Session(engine) as session:
+            for i in range(SEED_RUNS):
+                at = start + timedelta(minutes=i)
+                flags = ["security_sensitive"] if i % 5 == 0 else []
+                flags += ["destructive_actions"] if i % 10 == 0 else []
+                risky = bool(flags)
+                run = AgentRun(
+                    created_at=at, prompt=f"p{i}", response="r", model="m",
+                    trust_score=0.8, risk_level=("low", "high")[risky],
+                    policy_decision=("allow", "block")[risky], policy_risk_level="low",
+                    risk_flags_json=json.dumps(flags), policy_reasons_json="[]",
+                )
+                session.add(run)
+                session.flush()
+                session.add(Action(created_at=at, agent_run_id=run.id, type="t",
+                                   payload_json="{}", status=("pending", "executed")[i % 2]))
+                if i % 4 == 0:
+                    session.add(Approval(created_at=at, agent_run_id=run.id,
+                                         status=("pending", "approved")[i % 8 == 0]))
+            session.commit()
+            run_id = SEED_RUNS // 2
+            approval_id = session.exec(
+                select(Approval.id).where(Approval.status == "pending")
+            ).first()
+        with engine.begin() as conn:
+            backfill_flags(conn)
+            rebuild_rollups(conn)
+            conn.execute(text("ANALYZE"))
+        since = (datetime.utcnow() - timedelta(days=7)).isoformat(timespec="seconds")
+        # a page boundary half-way through the history
+        middle = start + timedelta(minutes=SEED_RUNS // 2)
+        older = encode_cursor("next", middle, SEED_RUNS // 2)
+        newer = encode_cursor("prev", middle, SEED_RUNS // 2)
+
+        failures = []
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            for method, path, name, max_statements in ROUTES:
+                captured.clear()
+                kwargs = {"json": {"reviewer": "check"}} if method == "POST" else {}
+                resp = client.request(
+                    method, path.format(run_id=run_id, approval_id=approval_id, since=since, older=older, newer=newer), **kwargs
+                )
+                if resp.status_code != 200:
+                    failures.append(f"{name}: HTTP {resp.status_code}")
+                    continue
+                statements = list(captured)
+                print(f"{'ok  ' if len(statements) <= max_statements else 'FAIL'} "
+                      f"{name:24} {len(statements)} statement(s), max {max_statements}")
+                if len(statements) > max_statements:
+                    failures.append(f"{name}: {len(statements)} statements, expected <= {max_statements}")
+                seen = set()
+                with engine.connect() as conn:
+                    for statement, params in statements:
+                        if statement in seen or not statement.lstrip().upper().startswith("SELECT"):
+                            continue
+                        seen.add(statement)
+                        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+                        details = [row[-1] for row in plan]
+                        ok = not any(_bad_plan(d) for d in details)
+                        print(f"{'ok  ' if ok else 'FAIL'} {name:24} {' | '.join(details)}")
+                        if not ok:
+                            failures.append(f"{name}: {' | '.join(details)}")
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Local stand-in for the Groq chat-completions API, for load tests and
+benchmarks that must not hit the real provider.
+
+    python -m benchmarks.fake_llm_server --port 8900 --latency-ms 200
+
+Latency is latency_ms +/- jitter_ms, plus slow_ms for a slow_ratio share
+of calls (a long tail); draws come from a seeded generator, so a run is
+repeatable. stream=true requests get SSE chunks: the first after the
+sampled latency, then one word per token_ms. Errors can be injected
+(--error-rate 0.3 --error-status 429), action extraction returns the
+canned actions (--actions-file), and the config can be changed at
+runtime with POST /_fake/config {"error_rate": 1.0}.
+
+Then point the backend at it:
+    GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:8900 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm.providers import LatencyProfile
+
+app = FastAPI(title="Fake LLM")
+
+# Set from the command line (or by tests that import the app directly)
+CONFIG: Dict[str, Any] = {
+    "latency_ms": 200.0,
+    "jitter_ms": 0.0,
+    "slow_ratio": 0.0,  # share of calls that get slow_ms on top
+    "slow_ms": 0.0,
+    "token_ms": 0.0,  # delay between streamed words
+    "model": "fake-llama-3.1-8b",
+    "error_rate": 0.0,  # fraction of calls that fail
+    "error_status": 429,
+    "retry_after": None,  # seconds, sent with injected 429s
+}
+
+_rng = random.Random(0)
+
+STATS: Dict[str, int] = {"requests": 0, "errors": 0}
+
+CANNED_ACTIONS: Dict[str, Any] = {
+    "actions": [
+        {
+            "type": "email_suggestion",
+            "payload": {"to": "ops@example.com", "subject": "Follow-up"},
+        }
+    ]
+}
+
+
+def _latency_seconds() -> float:
+    profile = LatencyProfile(
+        base_ms=CONFIG["latency_ms"],
+        jitter_ms=CONFIG["jitter_ms"],
+        slow_ratio=CONFIG["slow_ratio"],
+        slow_ms=CONFIG["slow_ms"],
+    )
+    return profile.sample(_rng) / 1000
+
+
+def _completion(model: str, content: str) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _chunk(model: str, completion_id: str, delta: Dict[str, Any], finish: Any = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def _stream(model: str, content: str) -> AsyncIterator[str]:
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    yield _chunk(model, completion_id, {"role": "assistant", "content": ""})
+    for word in re.findall(r"\S+\s*|\s+", content):
+        yield _chunk(model, completion_id, {"content": word})
+        await asyncio.sleep(CONFIG["token_ms"] / 1000)
+    yield _chunk(model, completion_id, {}, finish="stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request) -> Any:
+    body = await request.json()
+    messages = body.get("messages") or []
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+
+    STATS["requests"] += 1
+    await asyncio.sleep(_latency_seconds())
+
+    if CONFIG["error_rate"] and _rng.random() < CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        status = int(CONFIG["error_status"])
+        headers = {}
+        if status == 429 and CONFIG["retry_after"] is not None:
+            headers["retry-after"] = str(CONFIG["retry_after"])
+        return JSONResponse(
+            {"error": {"message": f"injected {status}", "type": "fake_error"}},
+            status_code=status,
+            headers=headers,
+        )
+
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    if json_mode and '"answer"' in system:
+        # single structured call: answer + actions
+        content = json.dumps({"answer": f"Fake answer to: {user[:200]}", **CANNED_ACTIONS})
+    elif "ACTION" in system:
+        content = json.dumps(CANNED_ACTIONS)
+    else:
+        content = f"Fake answer to: {user[:200]}"
+    if body.get("stream"):
+        return StreamingResponse(_stream(CONFIG["model"], content), media_type="text/event-stream")
+    return _completion(CONFIG["model"], content)
+
+
+@app.post("/_fake/config")
+async def update_config(request: Request) -> Dict[str, Any]:
+    updates = await request.json()
+    CONFIG.update({k: v for k, v in updates.items() if k in CONFIG})
+    return {"config": CONFIG, "stats": STATS}
+
+
+@app.get("/_fake/stats")
+async def get_stats() -> Dict[str, Any]:
+    return {"config": CONFIG, "stats": STATS}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("fake LLM server did not start")
+
+
+def spawn(args: List[str]) -> Tuple[subprocess.Popen, str]:
+    """
+    Start the server in a subprocess on a free port (for benchmarks).
+    Returns (process, base_url); terminate the process when done.
+    """
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_llm_server", "--port", str(port), *args]
+    )
+    try:
+        _wait_for_port(port)
+    except RuntimeError:
+        proc.terminate()
+        raise
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"])
+    parser.add_argument("--slow-ratio", type=float, default=CONFIG["slow_ratio"])
+    parser.add_argument("--slow-ms", type=float, default=CONFIG["slow_ms"])
+    parser.add_argument("--token-ms", type=float, default=CONFIG["token_ms"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--actions-file", default=None,
+                        help='JSON file with the extraction result, {"actions": [...]}')
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"])
+    parser.add_argument("--error-status", type=int, default=CONFIG["error_status"])
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    CONFIG["latency_ms"] = args.latency_ms
+    CONFIG["jitter_ms"] = args.jitter_ms
+    CONFIG["slow_ratio"] = args.slow_ratio
+    CONFIG["slow_ms"] = args.slow_ms
+    CONFIG["token_ms"] = args.token_ms
+    _rng.seed(args.seed)
+    if args.actions_file:
+        with open(args.actions_file) as f:
+            CANNED_ACTIONS.update(json.load(f))
+    CONFIG["error_rate"] = args.error_rate
+    CONFIG["error_status"] = args.error_status
+    CONFIG["retry_after"] = args.retry_after
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+End-to-end load test of the agent pipeline: drives /agent/run, the
+approval queue and the action endpoints at a fixed request rate and
+reports throughput, p50/p95/p99 per operation and where /agent/run spends
+its time (from the stage_timings_ms of every response).
+
+Without --base-url the backend is started in a subprocess, in a scratch
+directory (its own SQLite DB), against a fake LLM:
+  --llm stub    in-process StubProvider (LLM_PROVIDERS), no network
+  --llm server  benchmarks.fake_llm_server over HTTP, through the Groq SDK
+Both are seeded, so the LLM side of two runs is the same.
+
+Run from backend/:
+    python -m benchmarks.loadtest_agent --rps 20 --duration 30 --latency-ms 300
+    python -m benchmarks.loadtest_agent --rps 20 --compare benchmarks/results/<earlier>.json
+
+Results are written to --out (benchmarks/results/loadtest-<time>.json).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import fake_llm_server
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+PROMPTS = [
+    "Summarise last week's support tickets for the ops team #{i}",
+    "Draft a follow-up email to the customer about invoice {i}",
+    "List the open incidents and who owns them ({i})",
+    "Explain the payroll export failure from run {i}",
+    "Which customer data fields does report {i} expose?",
+    "Plan the database migration for shard {i}",
+    "Delete all temporary files of job {i} and report back",
+]
+
+# operation -> weight of the default mix
+DEFAULT_MIX = "agent_run=6,approvals=2,actions=2"
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.rejected: Dict[str, int] = defaultdict(int)  # 4xx
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.lag_ms: List[float] = []
+
+    def record(self, op: str, ms: float, status: Optional[int]) -> None:
+        if status is None or status >= 500:
+            self.errors[op] += 1
+        elif status >= 400:
+            self.rejected[op] += 1
+            self.latencies[op].append(ms)
+        else:
+            self.latencies[op].append(ms)
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, rec: Recorder, seed: int, stream: bool):
+        self.client = client
+        self.rec = rec
+        self.rng = random.Random(seed)
+        self.stream = stream
+        self.run_ids: List[int] = []
+        self.counter = 0
+
+    async def _call(self, op: str, method: str, url: str, **kwargs: Any) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.rec.record(op, (time.perf_counter() - start) * 1000, None)
+            return None
+        self.rec.record(op, (time.perf_counter() - start) * 1000, resp.status_code)
+        return resp
+
+    async def agent_run(self) -> None:
+        self.counter += 1
+        prompt = self.rng.choice(PROMPTS).format(i=self.counter)
+        if self.stream:
+            resp = await self._call("agent_run_stream", "POST", "/agent/run/stream", json={"prompt": prompt})
+            if resp is None or resp.status_code != 200:
+                return
+            done = resp.text.rsplit("event: done\ndata: ", 1)
+            if len(done) != 2:
+                return
+            body = json.loads(done[1])
+        else:
+            resp = await self._call("agent_run", "POST", "/agent/run", json={"prompt": prompt})
+            if resp is None or resp.status_code != 200:
+                return
+            body = resp.json()
+        if body.get("run_id"):
+            self.run_ids.append(body["run_id"])
+        for stage, ms in (body.get("stage_timings_ms") or {}).items():
+            self.rec.stages[stage].append(ms)
+
+    async def approvals(self) -> None:
+        resp = await self._call("approvals_pending", "GET", "/approvals/pending")
+        if resp is None or resp.status_code != 200 or not resp.json():
+            return
+        approval = self.rng.choice(resp.json()[:20])
+        decision = "approve" if self.rng.random() < 0.7 else "reject"
+        await self._call(
+            "approvals_decide", "POST", f"/approvals/{approval['id']}/{decision}",
+            json={"reviewer": "loadtest"},
+        )
+
+    async def actions(self) -> None:
+        if self.run_ids and self.rng.random() < 0.5:
+            run_id = self.rng.choice(self.run_ids[-50:])
+            resp = await self._call("actions_by_run", "GET", f"/actions/by-run/{run_id}")
+        else:
+            resp = await self._call("actions_all", "GET", "/actions/all")
+        if resp is None or resp.status_code != 200:
+            return
+        pending = [a for a in resp.json() if a["status"] in ("pending", "simulated")]
+        if pending:
+            # 403 while the run's approval is open: counted as rejected
+            await self._call("actions_execute", "POST", f"/actions/{self.rng.choice(pending)['id']}/execute")
+
+
+def _parse_mix(mix: str) -> List[Tuple[str, int]]:
+    out = []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        out.append((name.strip(), int(weight or 1)))
+    return out
+
+
+async def _drive(base_url: str, args: argparse.Namespace) -> Tuple[Recorder, float, int]:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        test = LoadTest(client, rec, args.seed, args.stream)
+        ops = _parse_mix(args.mix)
+        names = [name for name, _ in ops]
+        weights = [weight for _, weight in ops]
+        total = int(args.rps * args.duration)
+        interval = 1.0 / args.rps
+        tasks: List[asyncio.Task] = []
+
+        start = time.perf_counter()
+        for n in range(total):
+            # open loop: request n is due at start + n * interval, however
+            # long the earlier ones take
+            due = start + n * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            rec.lag_ms.append(max(0.0, -delay) * 1000)
+            op = test.rng.choices(names, weights)[0]
+            tasks.append(asyncio.ensure_future(getattr(test, op)()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return rec, elapsed, total
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary(rec: Recorder, elapsed: float, scheduled: int) -> Dict[str, Any]:
+    ops = {}
+    completed = 0
+    for op in sorted(set(rec.latencies) | set(rec.errors)):
+        lat = rec.latencies.get(op, [])
+        completed += len(lat) + rec.errors.get(op, 0)
+        ops[op] = {
+            "count": len(lat) + rec.errors.get(op, 0),
+            "errors": rec.errors.get(op, 0),
+            "rejected_4xx": rec.rejected.get(op, 0),
+            "p50_ms": round(_pct(lat, 0.50), 2) if lat else None,
+            "p95_ms": round(_pct(lat, 0.95), 2) if lat else None,
+            "p99_ms": round(_pct(lat, 0.99), 2) if lat else None,
+            "mean_ms": round(statistics.fmean(lat), 2) if lat else None,
+        }
+    stage_total = sum(sum(v) for v in rec.stages.values()) or 1.0
+    stages = {
+        stage: {
+            "mean_ms": round(statistics.fmean(v), 3),
+            "p95_ms": round(_pct(v, 0.95), 3),
+            "share": round(sum(v) / stage_total, 4),
+        }
+        for stage, v in sorted(rec.stages.items(), key=lambda kv: -sum(kv[1]))
+    }
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "scheduled": scheduled,
+        "requests_completed": completed,
+        "throughput_rps": round(completed / elapsed, 2),
+        "schedule_lag_p99_ms": round(_pct(rec.lag_ms, 0.99), 2) if rec.lag_ms else 0.0,
+        "operations": ops,
+        "agent_run_stages": stages,
+    }
+
+
+def _print_summary(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    def delta(new: Optional[float], old: Optional[float]) -> str:
+        if baseline is None or new is None or not old:
+            return ""
+        return f" ({(new - old) / old * 100:+.0f}%)"
+
+    base_ops = (baseline or {}).get("operations", {})
+    old_tp = (baseline or {}).get("throughput_rps")
+    print(
+        f"{summary['requests_completed']} requests in {summary['elapsed_s']:.1f} s: "
+        f"{summary['throughput_rps']:.1f} req/s{delta(summary['throughput_rps'], old_tp)}, "
+        f"schedule lag p99 {summary['schedule_lag_p99_ms']:.0f} ms"
+    )
+    print(f"{'operation':20} {'count':>6} {'err':>4} {'4xx':>4} {'p50 ms':>14} {'p95 ms':>14} {'p99 ms':>14}")
+    for op, s in summary["operations"].items():
+        old = base_ops.get(op, {})
+        cols = []
+        for q in ("p50_ms", "p95_ms", "p99_ms"):
+            value = s[q]
+            cols.append(f"{value:.1f}{delta(value, old.get(q))}" if value is not None else "-")
+        print(f"{op:20} {s['count']:6d} {s['errors']:4d} {s['rejected_4xx']:4d} {cols[0]:>14} {cols[1]:>14} {cols[2]:>14}")
+    if summary["agent_run_stages"]:
+        print("agent run stages (server side):")
+        for stage, s in summary["agent_run_stages"].items():
+            print(f"  {stage:16} mean {s['mean_ms']:9.2f} ms  p95 {s['p95_ms']:9.2f} ms  {s['share'] * 100:5.1f}%")
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_backend(args: argparse.Namespace, workdir: str) -> Tuple[List[subprocess.Popen], str]:
+    """
+    Start the app (and the fake LLM server for --llm server) in
+    subprocesses. The app runs in workdir, so it gets a fresh DB.
+    """
+    procs: List[subprocess.Popen] = []
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR), "LLM_RATE_LIMIT_RPS": "0"}
+    latency = {
+        "base_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+        "slow_ratio": args.slow_ratio, "slow_ms": args.slow_ms,
+    }
+    if args.llm == "server":
+        server, llm_url = fake_llm_server.spawn([
+            "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--slow-ratio", str(args.slow_ratio), "--slow-ms", str(args.slow_ms),
+            "--error-rate", str(args.error_rate), "--token-ms", str(args.token_ms),
+            "--seed", str(args.seed),
+        ])
+        procs.append(server)
+        env.update(GROQ_API_KEY="fake", GROQ_BASE_URL=llm_url)
+        env.pop("LLM_PROVIDERS", None)
+    else:
+        env["LLM_PROVIDERS"] = json.dumps([{
+            "name": "stub", "type": "stub", "latency": latency,
+            "error_rate": args.error_rate, "seed": args.seed, "token_ms": args.token_ms,
+        }])
+
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    port = fake_llm_server._free_port()
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    procs.append(app)
+    fake_llm_server._wait_for_port(port, timeout=30)
+    return procs, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test /agent/run, /approvals and /actions")
+    parser.add_argument("--rps", type=float, default=10.0, help="target operations per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weights, e.g. agent_run=6,approvals=2,actions=2")
+    parser.add_argument("--stream", action="store_true", help="use /agent/run/stream for agent runs")
+    parser.add_argument("--base-url", default=None, help="test a running backend instead of starting one")
+    parser.add_argument("--llm", choices=["stub", "server"], default="stub")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.02)
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", default=str(RESULTS_DIR), help="directory for the results JSON")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    procs: List[subprocess.Popen] = []
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    try:
+        base_url = args.base_url
+        if base_url is None:
+            procs, base_url = _start_backend(args, workdir)
+        rec, elapsed, scheduled = asyncio.run(_drive(base_url, args))
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            proc.wait()
+
+    summary = _summary(rec, elapsed, scheduled)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["summary"]
+    _print_summary(summary, baseline)
+
+    os.makedirs(args.out, exist_ok=True)
+    started = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(args.out, f"loadtest-{started}.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "created_at": started,
+                "git_rev": _git_rev(),
+                "config": vars(args),
+                "summary": summary,
+            },
+            f,
+            indent=2,
+        )
+    print(f"results: {path}")
+
+
+if __name__ == "__main__":
+    main()